@@ -1,14 +1,15 @@
 from fastapi import HTTPException, Security
 from fastapi.security.api_key import APIKeyHeader
 from typing import Optional
-import os
 import logging
 
+from config import get_settings
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
-API_KEY = os.environ.get("API_KEY")
+API_KEY = get_settings().api_key
 if not API_KEY:
     logger.error("API_KEY environment variable is not set")
     raise EnvironmentError("API_KEY environment variable is not set. Please set it in Replit Secrets.")
@@ -0,0 +1,102 @@
+"""Benchmark: event normalization with tools/timeutil versus the previous pytz/dateutil path.
+
+Converts pages of Graph calendarView events to local busy times, the way
+check_availability does, and formats event times for create/update requests:
+
+    python benchmarks/datetime_bench.py --events 500
+
+The legacy path needs pytz and python-dateutil installed
+(pip install pytz python-dateutil); without them only the new path is timed.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.timeutil import format_graph_utc, get_zone, localize_events  # noqa: E402
+
+try:
+    import dateutil.parser
+    import pytz
+except ImportError:
+    pytz = None
+
+
+def synthetic_events(count: int, seed: int):
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 1)
+    events = []
+    for i in range(count):
+        start = base + timedelta(minutes=15 * rng.randrange(0, 90 * 96))
+        end = start + timedelta(minutes=rng.choice((30, 45, 60, 90)))
+        events.append({
+            "id": f"event-{i}",
+            "subject": f"Meeting {i}",
+            "start": {"dateTime": start.strftime("%Y-%m-%dT%H:%M:%S.0000000"), "timeZone": "UTC"},
+            "end": {"dateTime": end.strftime("%Y-%m-%dT%H:%M:%S.0000000"), "timeZone": "UTC"},
+        })
+    return events
+
+
+def legacy_localize(events, timezone):
+    # The per-event chain check_availability used before tools/timeutil
+    tz = pytz.timezone(timezone)
+    busy_times = []
+    for event in events:
+        start_dt_utc = dateutil.parser.isoparse(event['start']['dateTime'])
+        end_dt_utc = dateutil.parser.isoparse(event['end']['dateTime'])
+        if start_dt_utc.tzinfo is None:
+            start_dt_utc = pytz.UTC.localize(start_dt_utc)
+        if end_dt_utc.tzinfo is None:
+            end_dt_utc = pytz.UTC.localize(end_dt_utc)
+        start_local = start_dt_utc.astimezone(tz).replace(tzinfo=None)
+        end_local = end_dt_utc.astimezone(tz).replace(tzinfo=None)
+        busy_times.append({
+            "start": start_local.isoformat(),
+            "end": end_local.isoformat(),
+            "subject": event.get('subject', '')
+        })
+    return busy_times
+
+
+def legacy_format(value):
+    # The parse-and-format chain add_event/update_event used before tools/timeutil
+    return dateutil.parser.isoparse(value).astimezone(pytz.UTC).isoformat().replace('+00:00', 'Z')
+
+
+def best(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main(count: int, timezone: str, number: int):
+    events = synthetic_events(count, seed=7)
+    inputs = ["2025-05-10T14:00:00Z", "2025-05-10T10:00:00-04:00"]
+
+    new_page = best(lambda: localize_events(events, get_zone(timezone)), number)
+    new_format = best(lambda: [format_graph_utc(v) for v in inputs], number * 100) / len(inputs)
+    print(f"{count} events, timezone {timezone}")
+    print(f"timeutil page conversion:   {new_page * 1e6:9.1f} us  ({new_page / count * 1e9:7.0f} ns/event)")
+    print(f"timeutil format_graph_utc:  {new_format * 1e9:9.0f} ns")
+
+    if pytz is None:
+        print("pytz/python-dateutil not installed; skipping the legacy comparison")
+        return
+    assert legacy_localize(events, timezone) == localize_events(events, get_zone(timezone))
+    old_page = best(lambda: legacy_localize(events, timezone), number)
+    old_format = best(lambda: [legacy_format(v) for v in inputs], number * 100) / len(inputs)
+    print(f"legacy page conversion:     {old_page * 1e6:9.1f} us  ({old_page / count * 1e9:7.0f} ns/event)")
+    print(f"legacy format:              {old_format * 1e9:9.0f} ns")
+    print(f"speedup:                    {old_page / new_page:9.1f}x page, {old_format / new_format:.1f}x format")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--timezone", default="America/New_York")
+    parser.add_argument("--number", type=int, default=20, help="calls per timing run")
+    args = parser.parse_args()
+    main(args.events, args.timezone, args.number)
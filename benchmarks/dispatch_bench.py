@@ -0,0 +1,98 @@
+"""Benchmark: per-call overhead of tool validation and dispatch, without Graph.
+
+Runs each tool through main.execute_tool (lookup, parameter validation,
+handler, result serialization) with Graph replaced by canned in-memory
+responses, so what is timed is the server's own work per call:
+
+    python benchmarks/dispatch_bench.py --calls 20000
+
+Run it on two revisions to compare them; tools that fail are reported as such.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Offline placeholders; nothing leaves the process
+for name, value in [("API_KEY", "bench"), ("MS_CLIENT_ID", "bench"), ("MS_CLIENT_SECRET", "bench"),
+                    ("MS_TENANT_ID", "bench"), ("MS_USER_ID", "bench@example.com")]:
+    os.environ.setdefault(name, value)
+# Keep per-call INFO logging out of the measurement
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import main  # noqa: E402
+from tools.microsoft_calendar import MicrosoftCalendarClient  # noqa: E402
+
+CALLS = {
+    "check_availability": {"start_time": "2025-05-19T09:00:00Z", "end_time": "2025-05-19T17:00:00Z",
+                           "timezone": "America/New_York"},
+    "find_meetings_near_time": {"date": "2025-05-19", "time": "12:00", "timezone": "America/New_York",
+                                "window_minutes": 30},
+    "create_meeting": {"title": "Planning", "start_time": "2025-05-19T14:00:00Z", "end_time": "2025-05-19T15:00:00Z",
+                       "description": "Quarterly planning"},
+    "update_meeting": {"event_id": "AAMkAD-event", "title": "Planning (moved)", "start_time": "2025-05-19T15:00:00Z",
+                       "end_time": "2025-05-19T16:00:00Z", "location": "Room 4"},
+    "delete_meeting": {"event_id": "AAMkAD-event"},
+}
+
+EVENTS = {"value": [
+    {"id": f"e{i}", "subject": f"Meeting {i}", "showAs": "busy",
+     "start": {"dateTime": f"2025-05-19T{10 + i}:00:00.0000000", "timeZone": "UTC"},
+     "end": {"dateTime": f"2025-05-19T{10 + i}:30:00.0000000", "timeZone": "UTC"},
+     "location": {"displayName": "Room"}} for i in range(3)
+]}
+
+
+class CannedResponse:
+    def __init__(self, status_code: int, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = {}
+        self.text = ""
+
+    def json(self):
+        return self._payload
+
+
+RESPONSES = {
+    "GET": CannedResponse(200, EVENTS),
+    "POST": CannedResponse(201, {"id": "AAMkAD-new", "onlineMeeting": {"joinUrl": "https://teams.example/join"}}),
+    "PATCH": CannedResponse(200, {}),
+    "DELETE": CannedResponse(204),
+}
+
+
+async def canned_graph_request(self, method: str, path: str, **kwargs):
+    return RESPONSES[method]
+
+
+async def time_tool(name: str, params: dict, calls: int) -> float:
+    """Seconds per call, or nan if the tool fails."""
+    try:
+        await main.execute_tool(name, dict(params))
+    except Exception as e:
+        print(f"{name:<26} fails: {getattr(e, 'detail', e)}")
+        return float("nan")
+    started = time.perf_counter()
+    for _ in range(calls):
+        await main.execute_tool(name, dict(params))
+    return (time.perf_counter() - started) / calls
+
+
+async def run(calls: int):
+    MicrosoftCalendarClient._graph_request = canned_graph_request
+    print(f"{'tool':<26} {'us/call':>8}")
+    for name, params in CALLS.items():
+        seconds = await time_tool(name, params, calls)
+        if seconds == seconds:
+            print(f"{name:<26} {seconds * 1e6:8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000, help="calls per tool")
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
@@ -0,0 +1,439 @@
+"""Local stand-in for Microsoft Graph, for offline load tests.
+
+Serves the endpoints this server calls, from a synthetic calendar:
+
+    POST /{tenant}/oauth2/v2.0/token               client-credentials token
+    GET  /v1.0/users/{user}/calendarView           paged with @odata.nextLink
+    GET  /v1.0/users/{user}/calendarView/delta     one round, then the changes since the last one
+    POST /v1.0/users/{user}/calendar/events        create
+    GET|PATCH|DELETE /v1.0/users/{user}/[calendar/]events/{id}
+    POST /v1.0/users/{user}/calendar/getSchedule
+    POST /v1.0/$batch                              up to 20 of the above
+    POST /v1.0/subscriptions                       validates notificationUrl like Graph, then creates
+    PATCH|DELETE /v1.0/subscriptions/{id}          renew, delete
+    GET  /_stats                                   request counters for the harness
+    GET  /_subscriptions                           live subscriptions, clientState included
+
+The fake sends no notifications itself; benchmarks/notification_sender.py does.
+
+Run it on its own and point GRAPH_BASE_URL at http://127.0.0.1:8900/v1.0:
+
+    python benchmarks/fake_graph.py --port 8900 --latency-ms 40 --events 5000 --throttle-rate 0.01 --mailbox-rate 16
+
+benchmarks/load_test.py starts it automatically.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+GRAPH_BATCH_LIMIT = 20
+
+
+@dataclass
+class FakeGraphConfig:
+    latency_ms: float = 30.0
+    jitter_ms: float = 10.0
+    # Extra latency for event creates, updates and deletes (Teams provisioning is the slow part of add_event)
+    write_latency_ms: float = 0.0
+    # Events per page when the client sends no Prefer: odata.maxpagesize; also the upper bound
+    page_size: int = 50
+    # Events in each mailbox, spread over days_back..days_ahead around today
+    events: int = 2000
+    days_back: int = 7
+    days_ahead: int = 60
+    # Fraction of requests (and $batch sub-requests) answered with 429 Too Many Requests
+    throttle_rate: float = 0.0
+    # Requests per second each mailbox accepts before answering 429 (0 disables the cap)
+    mailbox_rate: float = 0.0
+    retry_after: int = 1
+    token_lifetime: int = 3600
+    seed: int = 1
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.0000000")
+
+
+def _epoch(value: str) -> float:
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class Mailbox:
+    """Synthetic calendar: events sorted by start, with bisect range lookups."""
+
+    def __init__(self, name: str, config: FakeGraphConfig):
+        seed = int(hashlib.sha1(f"{config.seed}:{name}".encode()).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        first = (today - timedelta(days=config.days_back)).timestamp()
+        span_quarters = (config.days_back + config.days_ahead) * 96
+        self.events: Dict[str, dict] = {}
+        # Ids of created, updated and deleted events in order; a delta token is an offset into it
+        self.changes: List[str] = []
+        for i in range(config.events):
+            start = first + 900 * rng.randrange(span_quarters)
+            end = start + rng.choice((1800, 2700, 3600, 5400))
+            event_id = f"AAMk{seed:08x}{i:06d}"
+            self.events[event_id] = self._event(event_id, f"Meeting {i}", start, end,
+                                                rng.choice(("busy", "busy", "busy", "tentative", "free")))
+        self._rebuild()
+
+    @staticmethod
+    def _event(event_id: str, subject: str, start: float, end: float, show_as: str = "busy") -> dict:
+        return {
+            "id": event_id,
+            "subject": subject,
+            "showAs": show_as,
+            "start": {"dateTime": _iso(start), "timeZone": "UTC"},
+            "end": {"dateTime": _iso(end), "timeZone": "UTC"},
+            "organizer": {"emailAddress": {"name": "Organizer", "address": "organizer@example.com"}},
+            "_span": (start, end)
+        }
+
+    def _rebuild(self):
+        self._sorted = sorted(self.events.values(), key=lambda e: e["_span"][0])
+        self._starts = [e["_span"][0] for e in self._sorted]
+        self._max_len = max((e["_span"][1] - e["_span"][0] for e in self._sorted), default=0)
+
+    def overlapping(self, start: float, end: float) -> List[dict]:
+        lo = bisect_left(self._starts, start - self._max_len)
+        hi = bisect_left(self._starts, end)
+        return [e for e in self._sorted[lo:hi] if e["_span"][1] > start]
+
+    def add(self, subject: str, start: float, end: float) -> dict:
+        event = self._event(f"AAMk{uuid.uuid4().hex}", subject, start, end)
+        self.events[event["id"]] = event
+        self.changes.append(event["id"])
+        self._rebuild()
+        return event
+
+    def remove(self, event_id: str) -> bool:
+        if self.events.pop(event_id, None) is None:
+            return False
+        self.changes.append(event_id)
+        self._rebuild()
+        return True
+
+
+def _public(event: dict) -> dict:
+    return {k: v for k, v in event.items() if not k.startswith("_")}
+
+
+def _error(status: int, code: str, message: str, headers: Optional[dict] = None) -> Tuple[int, dict, dict]:
+    return status, headers or {}, {"error": {"code": code, "message": message}}
+
+
+class FakeGraph:
+    def __init__(self, config: FakeGraphConfig):
+        self.config = config
+        self.mailboxes: Dict[str, Mailbox] = {}
+        self.rng = random.Random(config.seed)
+        # Absolute URL prefix for nextLink/deltaLink, taken from the first request
+        self.base_url = ""
+        # Per-mailbox timestamps of accepted requests in the last second, for mailbox_rate
+        self.windows: Dict[str, deque] = defaultdict(deque)
+        self.stats = {"requests": 0, "batches": 0, "batched_requests": 0, "throttled": 0, "tokens": 0}
+        self.subscriptions: Dict[str, dict] = {}
+        self.routes = [
+            ("GET", re.compile(r"^/users/([^/]+)/calendarView$"), self.calendar_view),
+            ("GET", re.compile(r"^/users/([^/]+)/calendarView/delta$"), self.calendar_view_delta),
+            ("POST", re.compile(r"^/users/([^/]+)/calendar/events$"), self.create_event),
+            ("GET", re.compile(r"^/users/([^/]+)/(?:calendar/)?events/([^/]+)$"), self.get_event),
+            ("PATCH", re.compile(r"^/users/([^/]+)/(?:calendar/)?events/([^/]+)$"), self.update_event),
+            ("DELETE", re.compile(r"^/users/([^/]+)/(?:calendar/)?events/([^/]+)$"), self.delete_event),
+            ("POST", re.compile(r"^/users/([^/]+)/calendar/getSchedule$"), self.get_schedule),
+            ("PATCH", re.compile(r"^/subscriptions/([^/]+)$"), self.renew_subscription),
+            ("DELETE", re.compile(r"^/subscriptions/([^/]+)$"), self.delete_subscription),
+        ]
+
+    def mailbox(self, name: str) -> Mailbox:
+        box = self.mailboxes.get(name.lower())
+        if box is None:
+            box = self.mailboxes[name.lower()] = Mailbox(name.lower(), self.config)
+        return box
+
+    def throttled(self, path: str) -> bool:
+        if self.config.throttle_rate and self.rng.random() < self.config.throttle_rate:
+            self.stats["throttled"] += 1
+            return True
+        if self.config.mailbox_rate:
+            match = re.match(r"^/users/([^/]+)", path)
+            window = self.windows[match.group(1).lower() if match else ""]
+            now = time.monotonic()
+            while window and window[0] <= now - 1.0:
+                window.popleft()
+            if len(window) >= self.config.mailbox_rate:
+                self.stats["throttled"] += 1
+                return True
+            window.append(now)
+        return False
+
+    def dispatch(self, method: str, url: str, headers: dict, body) -> Tuple[int, dict, Optional[dict]]:
+        """Route one Graph request (top-level or from a $batch) to its handler."""
+        parts = urlsplit(url)
+        path = parts.path
+        if path.startswith("/v1.0"):
+            path = path[len("/v1.0"):]
+        if self.throttled(path):
+            return _error(429, "TooManyRequests", "Simulated throttling",
+                          {"Retry-After": str(self.config.retry_after)})
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                return handler(*match.groups(), query=query, headers=headers, body=body)
+        return _error(404, "ResourceNotFound", f"No fake route for {method} {path}")
+
+    def _page_size(self, headers: dict) -> int:
+        prefer = headers.get("prefer") or headers.get("Prefer") or ""
+        match = re.search(r"odata\.maxpagesize=(\d+)", prefer)
+        requested = int(match.group(1)) if match else self.config.page_size
+        return max(1, min(requested, self.config.page_size))
+
+    def _paged(self, path: str, items: List[dict], query: dict, headers: dict, final: Optional[dict] = None):
+        size = self._page_size(headers)
+        skip = int(query.get("$skip", 0))
+        page = {"value": [_public(e) for e in items[skip:skip + size]]}
+        if skip + size < len(items):
+            next_query = dict(query, **{"$skip": str(skip + size)})
+            page["@odata.nextLink"] = f"{self.base_url}{path}?{urlencode(next_query)}"
+        elif final:
+            page.update(final)
+        return 200, {}, page
+
+    def calendar_view(self, user, query, headers, body):
+        if "startDateTime" not in query or "endDateTime" not in query:
+            return _error(400, "ErrorInvalidParameter", "startDateTime and endDateTime are required")
+        items = self.mailbox(user).overlapping(_epoch(query["startDateTime"]), _epoch(query["endDateTime"]))
+        return self._paged(f"/users/{user}/calendarView", items, query, headers)
+
+    def calendar_view_delta(self, user, query, headers, body):
+        path = f"/users/{user}/calendarView/delta"
+        if "startDateTime" not in query or "endDateTime" not in query:
+            return _error(400, "ErrorInvalidParameter", "startDateTime and endDateTime are required")
+        box = self.mailbox(user)
+        start, end = _epoch(query["startDateTime"]), _epoch(query["endDateTime"])
+        window = {"startDateTime": query["startDateTime"], "endDateTime": query["endDateTime"]}
+        final = {"@odata.deltaLink": f"{self.base_url}{path}?{urlencode(dict(window, **{'$deltatoken': len(box.changes)}))}"}
+        if "$deltatoken" in query:
+            # Events changed since the token: current versions in the window, the rest removed
+            items = []
+            for event_id in dict.fromkeys(box.changes[int(query["$deltatoken"]):]):
+                event = box.events.get(event_id)
+                if event is not None and event["_span"][0] < end and event["_span"][1] > start:
+                    items.append(event)
+                else:
+                    items.append({"id": event_id, "@removed": {"reason": "deleted"}})
+            return 200, {}, dict({"value": [_public(e) for e in items]}, **final)
+        return self._paged(path, box.overlapping(start, end), query, headers, final)
+
+    def create_event(self, user, query, headers, body):
+        try:
+            start = _epoch(body["start"]["dateTime"])
+            end = _epoch(body["end"]["dateTime"])
+        except (KeyError, TypeError, ValueError):
+            return _error(400, "ErrorInvalidRequest", "start and end are required")
+        event = self.mailbox(user).add(body.get("subject", ""), start, end)
+        created = _public(event)
+        if body.get("isOnlineMeeting"):
+            created["onlineMeeting"] = {"joinUrl": f"https://teams.example.com/l/meetup-join/{event['id']}"}
+        return 201, {}, created
+
+    def get_event(self, user, event_id, query, headers, body):
+        event = self.mailbox(user).events.get(event_id)
+        if event is None:
+            return _error(404, "ErrorItemNotFound", "The specified object was not found in the store.")
+        return 200, {}, _public(event)
+
+    def update_event(self, user, event_id, query, headers, body):
+        box = self.mailbox(user)
+        event = box.events.get(event_id)
+        if event is None:
+            return _error(404, "ErrorItemNotFound", "The specified object was not found in the store.")
+        start, end = event["_span"]
+        if body.get("start"):
+            start = _epoch(body["start"]["dateTime"])
+        if body.get("end"):
+            end = _epoch(body["end"]["dateTime"])
+        box.events[event_id] = box._event(event_id, body.get("subject", event["subject"]), start, end, event["showAs"])
+        box.changes.append(event_id)
+        box._rebuild()
+        return 200, {}, _public(box.events[event_id])
+
+    def delete_event(self, user, event_id, query, headers, body):
+        if not self.mailbox(user).remove(event_id):
+            return _error(404, "ErrorItemNotFound", "The specified object was not found in the store.")
+        return 204, {}, None
+
+    def get_schedule(self, user, query, headers, body):
+        try:
+            start = _epoch(body["startTime"]["dateTime"])
+            end = _epoch(body["endTime"]["dateTime"])
+            schedules = body["schedules"]
+        except (KeyError, TypeError, ValueError):
+            return _error(400, "ErrorInvalidRequest", "schedules, startTime and endTime are required")
+        value = []
+        for address in schedules:
+            items = [
+                {"status": e["showAs"], "subject": e["subject"], "start": e["start"], "end": e["end"]}
+                for e in self.mailbox(address).overlapping(start, end)
+            ]
+            value.append({"scheduleId": address, "availabilityView": "", "scheduleItems": items})
+        return 200, {}, {"value": value}
+
+    async def create_subscription(self, body) -> Tuple[int, dict, dict]:
+        """Like Graph, call notificationUrl with a validationToken and only subscribe if it is echoed."""
+        try:
+            url, resource = body["notificationUrl"], body["resource"]
+        except (KeyError, TypeError):
+            return _error(400, "InvalidRequest", "notificationUrl and resource are required")
+        token = uuid.uuid4().hex
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.post(url, params={"validationToken": token})
+        except httpx.HTTPError as e:
+            return _error(400, "InvalidRequest", f"Subscription validation request failed: {e!r}")
+        if response.status_code != 200 or response.text != token:
+            return _error(400, "InvalidRequest", "Subscription validation request failed. Must respond with 200 OK.")
+        subscription = dict(body, id=str(uuid.uuid4()))
+        self.subscriptions[subscription["id"]] = subscription
+        self.stats["subscriptions"] = self.stats.get("subscriptions", 0) + 1
+        return 201, {}, subscription
+
+    def renew_subscription(self, subscription_id, query, headers, body):
+        subscription = self.subscriptions.get(subscription_id)
+        if subscription is None:
+            return _error(404, "ResourceNotFound", "The object was not found.")
+        subscription["expirationDateTime"] = body["expirationDateTime"]
+        return 200, {}, subscription
+
+    def delete_subscription(self, subscription_id, query, headers, body):
+        if self.subscriptions.pop(subscription_id, None) is None:
+            return _error(404, "ResourceNotFound", "The object was not found.")
+        return 204, {}, None
+
+    def batch(self, body) -> Tuple[int, dict, dict]:
+        requests = (body or {}).get("requests") or []
+        if len(requests) > GRAPH_BATCH_LIMIT:
+            return _error(400, "BadRequest", f"A batch holds at most {GRAPH_BATCH_LIMIT} requests")
+        self.stats["batches"] += 1
+        self.stats["batched_requests"] += len(requests)
+        responses = []
+        for item in requests:
+            status, headers, payload = self.dispatch(item["method"].upper(), item["url"], item.get("headers") or {},
+                                                     item.get("body"))
+            entry = {"id": item["id"], "status": status, "headers": headers}
+            if payload is not None:
+                entry["body"] = payload
+            responses.append(entry)
+        return 200, {}, {"responses": responses}
+
+
+def create_app(config: FakeGraphConfig) -> FastAPI:
+    app = FastAPI(title="Fake Microsoft Graph")
+    graph = FakeGraph(config)
+    app.state.graph = graph
+
+    async def delay():
+        if config.latency_ms or config.jitter_ms:
+            jitter = random.uniform(-config.jitter_ms, config.jitter_ms)
+            await asyncio.sleep(max(config.latency_ms + jitter, 0.0) / 1000)
+
+    @app.post("/{tenant}/oauth2/v2.0/token")
+    async def token(tenant: str):
+        await delay()
+        graph.stats["tokens"] += 1
+        return {
+            "token_type": "Bearer",
+            "expires_in": config.token_lifetime,
+            "access_token": f"fake-{uuid.uuid4().hex}"
+        }
+
+    @app.get("/_stats")
+    async def stats():
+        return graph.stats
+
+    @app.get("/_subscriptions")
+    async def subscriptions():
+        return list(graph.subscriptions.values())
+
+    @app.api_route("/v1.0/{path:path}", methods=["GET", "POST", "PATCH", "DELETE"])
+    async def graph_call(path: str, request: Request):
+        if not graph.base_url:
+            graph.base_url = str(request.base_url).rstrip("/") + "/v1.0"
+        graph.stats["requests"] += 1
+        await delay()
+        if config.write_latency_ms and request.method != "GET" and path != "$batch" and "getSchedule" not in path:
+            await asyncio.sleep(config.write_latency_ms / 1000)
+        body = await request.json() if request.method in ("POST", "PATCH") else None
+        if path == "$batch" and request.method == "POST":
+            status, headers, payload = graph.batch(body)
+        elif path == "subscriptions" and request.method == "POST":
+            status, headers, payload = await graph.create_subscription(body)
+        else:
+            url = f"/{path}?{request.url.query}" if request.url.query else f"/{path}"
+            status, headers, payload = graph.dispatch(request.method, url, dict(request.headers), body)
+        if payload is None:
+            return Response(status_code=status, headers=headers)
+        return JSONResponse(payload, status_code=status, headers=headers)
+
+    return app
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=FakeGraphConfig.latency_ms, help="mean Graph latency")
+    parser.add_argument("--jitter-ms", type=float, default=FakeGraphConfig.jitter_ms)
+    parser.add_argument("--write-latency-ms", type=float, default=FakeGraphConfig.write_latency_ms,
+                        help="extra latency for event creates, updates and deletes")
+    parser.add_argument("--page-size", type=int, default=FakeGraphConfig.page_size, help="maximum events per page")
+    parser.add_argument("--events", type=int, default=FakeGraphConfig.events, help="events per mailbox")
+    parser.add_argument("--days-back", type=int, default=FakeGraphConfig.days_back)
+    parser.add_argument("--days-ahead", type=int, default=FakeGraphConfig.days_ahead)
+    parser.add_argument("--throttle-rate", type=float, default=FakeGraphConfig.throttle_rate,
+                        help="fraction of requests answered with 429")
+    parser.add_argument("--mailbox-rate", type=float, default=FakeGraphConfig.mailbox_rate,
+                        help="requests/second per mailbox before 429s (0: unlimited)")
+    parser.add_argument("--retry-after", type=int, default=FakeGraphConfig.retry_after)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeGraphConfig:
+    return FakeGraphConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        write_latency_ms=args.write_latency_ms,
+        page_size=args.page_size,
+        events=args.events,
+        days_back=args.days_back,
+        days_ahead=args.days_ahead,
+        throttle_rate=args.throttle_rate,
+        mailbox_rate=args.mailbox_rate,
+        retry_after=args.retry_after
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
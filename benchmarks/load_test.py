@@ -0,0 +1,404 @@
+"""Offline load test: drive /mcp/message and /mcp-events against a local fake Graph.
+
+Starts benchmarks/fake_graph.py and this server (each in its own process), then
+runs a weighted mix of tool calls at a fixed concurrency while SSE clients stay
+connected, and reports throughput and p50/p95/p99 latency per tool:
+
+    python benchmarks/load_test.py --concurrency 50 --duration 30 --latency-ms 40 --throttle-rate 0.01
+
+Server settings come from the environment as usual (e.g. CALENDAR_MIRROR=true,
+GRAPH_READ_CACHE_TTL=5); Graph and credentials are pointed at the fake. Use
+--server-url to drive a server you started yourself instead.
+
+--workers N serves with N uvicorn worker processes sharing tokens and cached
+reads; compare the fake Graph's request and token counts with a single worker
+run to see that Graph traffic doesn't grow with the worker count.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_graph import add_config_arguments  # noqa: E402
+
+API_KEY = "load-test-key"
+DEFAULT_MIX = ("check_availability=40,find_meetings_near_time=15,find_free_slots=15,"
+               "check_group_availability=10,create_meeting=10,update_meeting=5,delete_meeting=5")
+ATTENDEE_POOL = [f"person{i}@example.com" for i in range(25)]
+
+
+class LocalTokenCredential:
+    """Client-credentials token source that asks the fake Graph token endpoint."""
+
+    def __init__(self, token_url: str):
+        self.token_url = token_url
+
+    def get_token(self, *scopes, **kwargs):
+        from azure.core.credentials import AccessToken
+
+        response = httpx.post(self.token_url, data={"grant_type": "client_credentials", "scope": " ".join(scopes)})
+        response.raise_for_status()
+        payload = response.json()
+        return AccessToken(payload["access_token"], int(time.time()) + int(payload["expires_in"]))
+
+
+def use_local_credential(token_url: str):
+    from tools.microsoft_calendar import calendar_client
+
+    credential = LocalTokenCredential(token_url)
+    calendar_client.credential = credential
+    calendar_client.token_manager.credential = credential
+
+
+def worker_app():
+    """App factory for --workers: each worker process points its own credential at the fake."""
+    sys.path.insert(0, REPO_DIR)
+    import main
+
+    use_local_credential(os.environ["LOAD_TEST_TOKEN_URL"])
+    return main.app
+
+
+def serve(port: int, token_url: str, workers: int = 1):
+    """Run main.app with its credential pointed at the fake token endpoint (child process)."""
+    import uvicorn
+
+    sys.path.insert(0, REPO_DIR)
+    import main
+
+    if workers <= 1:
+        use_local_credential(token_url)
+        uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", log_config=None)
+        return
+    os.environ["LOAD_TEST_TOKEN_URL"] = token_url
+    # Workers split the Graph throttle budget by this count, as under python main.py
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    created = main.shared_files(workers)
+    try:
+        uvicorn.run("load_test:worker_app", factory=True, app_dir=BENCH_DIR, workers=workers,
+                    host="127.0.0.1", port=port, log_level="warning", log_config=None)
+    finally:
+        for path in created:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+            await asyncio.sleep(0.2)
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip():
+            mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Workload:
+    """Builds tool-call parameters over the fake calendar's date range."""
+
+    def __init__(self, days_ahead: int, seed: int, mailboxes: int = 0):
+        self.rng = random.Random(seed)
+        # Spread calls over this many mailboxes (0: the server's default mailbox only)
+        self.mailboxes = [f"user{i}@example.com" for i in range(mailboxes)]
+        self.today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.days_ahead = max(days_ahead - 7, 1)
+        # Events created during the run, with their mailbox, for update_meeting/delete_meeting to act on
+        self.created: List[tuple] = []
+
+    def _day(self) -> datetime:
+        return self.today + timedelta(days=self.rng.randrange(self.days_ahead))
+
+    @staticmethod
+    def _z(dt: datetime) -> str:
+        return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    def _slot(self):
+        start = self._day() + timedelta(minutes=15 * self.rng.randrange(36, 72))
+        return self._z(start), self._z(start + timedelta(minutes=30))
+
+    def params(self, tool: str) -> Optional[dict]:
+        params = self._params(tool)
+        if params is not None and self.mailboxes and "mailbox" not in params:
+            params["mailbox"] = self.rng.choice(self.mailboxes)
+        return params
+
+    def _params(self, tool: str) -> Optional[dict]:
+        day = self._day()
+        if tool == "check_availability":
+            return {"start_time": self._z(day), "end_time": self._z(day + timedelta(days=1))}
+        if tool == "find_meetings_near_time":
+            return {"date": day.strftime("%Y-%m-%d"), "time": f"{self.rng.randrange(8, 18):02d}:{self.rng.choice((0, 15, 30, 45)):02d}",
+                    "timezone": "America/New_York", "window_minutes": 30}
+        if tool == "find_free_slots":
+            return {"start_time": self._z(day), "end_time": self._z(day + timedelta(days=5)), "duration_minutes": 60,
+                    "attendees": self.rng.sample(ATTENDEE_POOL, 3)}
+        if tool == "check_group_availability":
+            return {"attendees": self.rng.sample(ATTENDEE_POOL, 5), "start_time": self._z(day),
+                    "end_time": self._z(day + timedelta(days=1))}
+        if tool == "create_meeting":
+            start, end = self._slot()
+            return {"title": "Load test meeting", "start_time": start, "end_time": end}
+        if tool == "update_meeting":
+            if not self.created:
+                return None
+            start, end = self._slot()
+            mailbox, event_id = self.rng.choice(self.created)
+            params = {"event_id": event_id, "title": "Moved", "start_time": start, "end_time": end}
+            if mailbox:
+                params["mailbox"] = mailbox
+            return params
+        if tool == "delete_meeting":
+            if not self.created:
+                return None
+            mailbox, event_id = self.created.pop(self.rng.randrange(len(self.created)))
+            return {"event_id": event_id, "mailbox": mailbox} if mailbox else {"event_id": event_id}
+        raise ValueError(f"Unknown tool in mix: {tool}")
+
+
+WRITE_TOOLS = {"create_meeting", "update_meeting", "delete_meeting"}
+# 202: a queued write was accepted
+OK_STATUSES = {200, 202}
+
+
+async def follow_job(client: httpx.AsyncClient, tool: str, params: dict, job_id: str, started: float,
+                     workload: Workload, results: dict):
+    """Wait for a queued write and record when it actually finished, as '<tool>:done'."""
+    try:
+        response = await client.get(f"/mcp/jobs/{job_id}", params={"wait": 30})
+        job = response.json()
+        status = job["error"]["status"] if job.get("status") == "failed" else response.status_code
+        if job.get("status") == "succeeded" and tool == "create_meeting":
+            workload.created.append((params.get("mailbox"), job["result"]["event_id"]))
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results[f"{tool}:done"].append((time.perf_counter() - started, status))
+
+
+async def call_tool(client: httpx.AsyncClient, tool: str, params: dict, workload: Workload, results: dict,
+                    jobs: Optional[list] = None):
+    started = time.perf_counter()
+    tool_call = {"toolName": tool, "parameters": params}
+    if jobs is not None and tool in WRITE_TOOLS:
+        tool_call["async"] = True
+    try:
+        response = await client.post("/mcp/message", json={"toolCall": tool_call})
+        status = response.status_code
+        if status == 202:
+            job_id = response.json()["toolResponse"]["output"]["job_id"]
+            jobs.append(asyncio.create_task(follow_job(client, tool, params, job_id, started, workload, results)))
+        elif status == 200 and tool == "create_meeting":
+            event_id = response.json()["toolResponse"]["output"].get("event_id")
+            if event_id:
+                workload.created.append((params.get("mailbox"), event_id))
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results[tool].append((time.perf_counter() - started, status))
+
+
+async def worker(client: httpx.AsyncClient, mix: Dict[str, float], workload: Workload, deadline: float, results: dict,
+                 jobs: Optional[list] = None):
+    tools, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        tool = workload.rng.choices(tools, weights)[0]
+        params = workload.params(tool)
+        if params is None:
+            # Nothing created yet to update or delete
+            tool, params = "create_meeting", workload.params("create_meeting")
+        await call_tool(client, tool, params, workload, results, jobs)
+
+
+async def sse_client(client: httpx.AsyncClient, stats: dict):
+    started = time.perf_counter()
+    try:
+        async with client.stream("GET", "/mcp-events") as response:
+            async for line in response.aiter_lines():
+                if line.startswith("event: tools"):
+                    if stats["first_tools"] is None:
+                        stats["first_tools"] = time.perf_counter() - started
+                    stats["tools"] += 1
+                elif line.startswith("event: ping"):
+                    stats["pings"] += 1
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        stats["errors"] += 1
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def report(results: dict, elapsed: float, sse_stats: List[dict], graph_stats: Optional[dict]):
+    print(f"\n{'tool':<26} {'calls':>7} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    everything = []
+    for tool in sorted(results):
+        samples = results[tool]
+        latencies = sorted(s[0] for s in samples)
+        everything.extend(latencies)
+        errors = sum(1 for s in samples if s[1] not in OK_STATUSES)
+        print(f"{tool:<26} {len(samples):>7} {errors:>7} {len(samples) / elapsed:>8.1f} "
+              f"{percentile(latencies, 50) * 1e3:>8.1f} {percentile(latencies, 95) * 1e3:>8.1f} "
+              f"{percentile(latencies, 99) * 1e3:>8.1f}")
+    everything.sort()
+    print(f"{'all':<26} {len(everything):>7} {'':>7} {len(everything) / elapsed:>8.1f} "
+          f"{percentile(everything, 50) * 1e3:>8.1f} {percentile(everything, 95) * 1e3:>8.1f} "
+          f"{percentile(everything, 99) * 1e3:>8.1f}")
+
+    statuses = Counter(s[1] for samples in results.values() for s in samples if s[1] not in OK_STATUSES)
+    if statuses:
+        print("non-200 responses:        " + ", ".join(f"{k}: {v}" for k, v in statuses.most_common()))
+    if sse_stats:
+        firsts = sorted(s["first_tools"] for s in sse_stats if s["first_tools"] is not None)
+        print(f"SSE clients:              {len(sse_stats)} ({sum(s['errors'] for s in sse_stats)} errors), "
+              f"tools events {sum(s['tools'] for s in sse_stats)}, pings {sum(s['pings'] for s in sse_stats)}, "
+              f"first tools event p50 {percentile(firsts, 50) * 1e3:.1f} ms / p99 {percentile(firsts, 99) * 1e3:.1f} ms")
+    if graph_stats:
+        print("fake Graph:               " + ", ".join(f"{k} {v}" for k, v in graph_stats.items()))
+
+
+async def run_load(args, server_url: str, graph_url: Optional[str]):
+    mix = parse_mix(args.mix)
+    workload = Workload(args.days_ahead, args.seed, args.mailboxes)
+    results: Dict[str, list] = defaultdict(list)
+    # Follow-up polls for queued writes, when --async-writes is on
+    jobs = [] if args.async_writes else None
+    # Job polls hold connections of their own while callers keep going
+    limits = httpx.Limits(max_connections=None if args.async_writes else args.concurrency + args.sse_clients + 10)
+    headers = {"X-API-Key": args.api_key}
+    async with httpx.AsyncClient(base_url=server_url, headers=headers, limits=limits,
+                                 timeout=httpx.Timeout(args.timeout, read=None)) as client:
+        sse_stats = [{"tools": 0, "pings": 0, "errors": 0, "first_tools": None} for _ in range(args.sse_clients)]
+        sse_tasks = [asyncio.create_task(sse_client(client, stats)) for stats in sse_stats]
+
+        if args.warmup:
+            warm_deadline = time.perf_counter() + args.warmup
+            warm_jobs = [] if args.async_writes else None
+            await asyncio.gather(*(worker(client, mix, workload, warm_deadline, defaultdict(list), warm_jobs)
+                                   for _ in range(args.concurrency)))
+            await asyncio.gather(*(warm_jobs or []))
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker(client, mix, workload, deadline, results, jobs) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        # Queued writes still finishing count towards their ':done' latency
+        await asyncio.gather(*(jobs or []))
+
+        for task in sse_tasks:
+            task.cancel()
+        await asyncio.gather(*sse_tasks, return_exceptions=True)
+
+    graph_stats = None
+    if graph_url:
+        async with httpx.AsyncClient() as client:
+            graph_stats = (await client.get(f"{graph_url}/_stats")).json()
+    workers = f" ({args.workers} workers)" if args.workers > 1 else ""
+    print(f"{args.concurrency} concurrent callers for {elapsed:.1f}s against {server_url}{workers}")
+    report(results, elapsed, sse_stats, graph_stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent /mcp/message callers")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before the run")
+    parser.add_argument("--sse-clients", type=int, default=50, help="/mcp-events connections held during the run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="tool=weight list")
+    parser.add_argument("--mailboxes", type=int, default=0, help="spread calls over this many mailboxes")
+    parser.add_argument("--async-writes", action="store_true",
+                        help="queue create/update/delete calls and also report when each job finished")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--server-url", help="drive an already running server instead of starting one")
+    parser.add_argument("--api-key", default=API_KEY)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    if args.async_writes and args.workers > 1:
+        parser.error("--async-writes needs a single worker: queued jobs stay in the worker that queued them")
+
+    processes = []
+    graph_url = None
+    try:
+        server_url = args.server_url
+        if server_url is None:
+            graph_port, server_port = free_port(), free_port()
+            graph_url = f"http://127.0.0.1:{graph_port}"
+            graph_cmd = [sys.executable, os.path.join(BENCH_DIR, "fake_graph.py"), "--port", str(graph_port),
+                         "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                         "--write-latency-ms", str(args.write_latency_ms),
+                         "--page-size", str(args.page_size), "--events", str(args.events),
+                         "--days-back", str(args.days_back), "--days-ahead", str(args.days_ahead),
+                         "--throttle-rate", str(args.throttle_rate), "--mailbox-rate", str(args.mailbox_rate),
+                         "--retry-after", str(args.retry_after)]
+            processes.append(subprocess.Popen(graph_cmd))
+
+            env = dict(os.environ)
+            env.update({
+                "API_KEY": args.api_key,
+                "MS_CLIENT_ID": env.get("MS_CLIENT_ID", "load-test-client"),
+                "MS_CLIENT_SECRET": env.get("MS_CLIENT_SECRET", "load-test-secret"),
+                "MS_TENANT_ID": env.get("MS_TENANT_ID", "load-test-tenant"),
+                "MS_USER_ID": env.get("MS_USER_ID", "organizer@example.com"),
+                # --mailboxes spreads calls over user<n>@example.com
+                "MS_ALLOWED_MAILBOXES": env.get("MS_ALLOWED_MAILBOXES", "user*@example.com"),
+                "GRAPH_BASE_URL": f"{graph_url}/v1.0",
+                "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING")
+            })
+            token_url = f"{graph_url}/{env['MS_TENANT_ID']}/oauth2/v2.0/token"
+            processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", str(server_port), token_url,
+                                               str(args.workers)], env=env, cwd=REPO_DIR))
+            server_url = f"http://127.0.0.1:{server_port}"
+            asyncio.run(wait_ready(f"{graph_url}/_stats"))
+            asyncio.run(wait_ready(f"{server_url}/"))
+        asyncio.run(run_load(args, server_url, graph_url))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(int(sys.argv[2]), sys.argv[3], int(sys.argv[4]) if len(sys.argv) > 4 else 1)
+    else:
+        main()
@@ -0,0 +1,249 @@
+"""Local Graph notification sender: exercises /graph/notifications end to end, offline.
+
+Starts benchmarks/fake_graph.py and this server with GRAPH_NOTIFICATION_URL
+pointing at itself and a long GRAPH_READ_CACHE_TTL, waits until the fake has
+validated the server's subscription, then:
+
+1. checks the validation handshake;
+2. creates, moves and deletes an event in the fake calendar behind the
+   server's back, sends the notification Graph would send for each, and
+   times how long check_availability takes to reflect it (the cached answer
+   must still be stale before the notification goes out);
+3. posts --count notifications, --per-post in each request, and reports how
+   fast the receiver answers.
+
+    python benchmarks/notification_sender.py --count 2000 --per-post 10
+
+With CALENDAR_MIRROR=true, give the mirror --settle seconds to seed first.
+With --workers N, most notifications land on a worker that relays them to the
+leader, so the times include the relay.
+Use --server-url and --graph-url to drive processes you started yourself.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import API_KEY, free_port, wait_ready  # noqa: E402
+
+MAILBOX = "organizer@example.com"
+
+
+def _z(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Sender:
+    def __init__(self, server: httpx.AsyncClient, graph: httpx.AsyncClient, mailbox: str, subscription: dict):
+        self.server = server
+        self.graph = graph
+        self.mailbox = mailbox
+        self.subscription = subscription
+
+    def notification(self, change_type: str, event_id: str) -> dict:
+        """One change notification as Graph shapes it for an event subscription."""
+        resource = f"Users/{self.mailbox}/Events/{event_id}"
+        return {
+            "subscriptionId": self.subscription["id"],
+            "subscriptionExpirationDateTime": self.subscription["expirationDateTime"],
+            "changeType": change_type,
+            "resource": resource,
+            "resourceData": {"@odata.type": "#Microsoft.Graph.Event", "@odata.id": resource, "id": event_id},
+            "clientState": self.subscription["clientState"],
+            "tenantId": "fake-tenant"
+        }
+
+    async def post(self, notifications: list) -> httpx.Response:
+        return await self.server.post("/graph/notifications", json={"value": notifications})
+
+    async def busy_count(self, start: datetime, end: datetime) -> int:
+        tool_call = {"toolName": "check_availability", "parameters": {"start_time": _z(start), "end_time": _z(end)}}
+        response = await self.server.post("/mcp/message", json={"toolCall": tool_call})
+        response.raise_for_status()
+        return len(response.json()["toolResponse"]["output"]["busy_times"])
+
+    async def graph_call(self, method: str, path: str, body: Optional[dict] = None) -> Optional[dict]:
+        response = await self.graph.request(method, f"/v1.0/users/{self.mailbox}{path}", json=body)
+        response.raise_for_status()
+        return response.json() if response.content else None
+
+
+async def check_handshake(sender: Sender):
+    response = await sender.server.post("/graph/notifications", params={"validationToken": "local check <&>"})
+    ok = response.status_code == 200 and response.text == "local check <&>" and \
+        response.headers["content-type"].startswith("text/plain")
+    print(f"validation handshake:     {'ok' if ok else f'FAILED ({response.status_code} {response.text!r})'}")
+    return ok
+
+
+async def check_invalidation(sender: Sender, timeout: float) -> bool:
+    """Change the fake calendar, notify, and time until the server's cached answer reflects it."""
+    day = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=3)
+    start, end = day + timedelta(hours=2), day + timedelta(hours=3)
+    outside = day + timedelta(hours=20)
+    baseline = await sender.busy_count(start, end)
+    created = await sender.graph_call("POST", "/calendar/events", {
+        "subject": "notification check",
+        "start": {"dateTime": _z(start + timedelta(minutes=15)), "timeZone": "UTC"},
+        "end": {"dateTime": _z(start + timedelta(minutes=45)), "timeZone": "UTC"}
+    })
+    event_id = created["id"]
+    steps = [
+        ("created", None, baseline + 1),
+        ("updated", {"start": {"dateTime": _z(outside), "timeZone": "UTC"},
+                     "end": {"dateTime": _z(outside + timedelta(minutes=30)), "timeZone": "UTC"}}, baseline),
+        ("updated", {"start": {"dateTime": _z(start), "timeZone": "UTC"},
+                     "end": {"dateTime": _z(start + timedelta(minutes=30)), "timeZone": "UTC"}}, baseline + 1),
+        ("deleted", None, baseline)
+    ]
+    ok = True
+    for change_type, patch, expected in steps:
+        if patch is not None:
+            await sender.graph_call("PATCH", f"/events/{event_id}", patch)
+        elif change_type == "deleted":
+            await sender.graph_call("DELETE", f"/events/{event_id}")
+        stale = await sender.busy_count(start, end) != expected
+        sent = time.perf_counter()
+        await sender.post([sender.notification(change_type, event_id)])
+        while True:
+            fresh = await sender.busy_count(start, end) == expected
+            elapsed = time.perf_counter() - sent
+            if fresh or elapsed > timeout:
+                break
+            await asyncio.sleep(0.005)
+        ok = ok and stale and fresh
+        result = f"fresh after {elapsed * 1e3:6.1f} ms" if fresh else f"STILL STALE after {timeout:.0f}s"
+        print(f"{change_type:<8} {'(cached answer was stale)' if stale else '(cache was not holding it!)':<28} {result}")
+    return ok
+
+
+async def send_load(sender: Sender, count: int, per_post: int, concurrency: int):
+    page = await sender.graph_call("GET", "/calendarView?startDateTime={}&endDateTime={}".format(
+        _z(datetime.now(timezone.utc)), _z(datetime.now(timezone.utc) + timedelta(days=30))))
+    event_ids = [event["id"] for event in page["value"]] or ["unknown-event"]
+    rng = random.Random(7)
+    posts = [[sender.notification("updated", rng.choice(event_ids)) for _ in range(per_post)]
+             for _ in range(max(count // per_post, 1))]
+    latencies = []
+    failures = 0
+    queue = asyncio.Queue()
+    for notifications in posts:
+        queue.put_nowait(notifications)
+
+    async def worker():
+        nonlocal failures
+        while not queue.empty():
+            notifications = queue.get_nowait()
+            started = time.perf_counter()
+            response = await sender.post(notifications)
+            latencies.append(time.perf_counter() - started)
+            failures += response.status_code != 202
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    sent = len(posts) * per_post
+    print(f"{sent} notifications in {len(posts)} POSTs over {elapsed:.2f}s ({sent / elapsed:.0f}/s), "
+          f"{failures} not answered 202")
+    print(f"receiver latency:         p50 {statistics.median(latencies) * 1e3:6.2f} ms   "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e3:6.2f} ms")
+
+
+async def run(args, server_url: str, graph_url: str) -> bool:
+    headers = {"X-API-Key": args.api_key}
+    async with httpx.AsyncClient(base_url=server_url, headers=headers, timeout=30) as server, \
+            httpx.AsyncClient(base_url=graph_url, timeout=30) as graph:
+        resource = f"/users/{args.mailbox}/events"
+        deadline = time.monotonic() + 30
+        while True:
+            subscriptions = [s for s in (await graph.get("/_subscriptions")).json()
+                             if s["resource"].lower() == resource.lower()]
+            if subscriptions:
+                break
+            if time.monotonic() > deadline:
+                print(f"no subscription for {resource} reached the fake Graph; is GRAPH_NOTIFICATION_URL set?")
+                return False
+            await asyncio.sleep(0.2)
+        print(f"subscription:             {subscriptions[-1]['id']} on {resource}")
+        sender = Sender(server, graph, args.mailbox, subscriptions[-1])
+        await asyncio.sleep(args.settle)
+        ok = await check_handshake(sender)
+        ok = await check_invalidation(sender, args.timeout) and ok
+        if args.count:
+            await send_load(sender, args.count, args.per_post, args.concurrency)
+        stats = (await graph.get("/_stats")).json()
+        print("fake Graph:               " + ", ".join(f"{k} {v}" for k, v in stats.items()))
+        return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1000, help="notifications to send after the checks (0: none)")
+    parser.add_argument("--per-post", type=int, default=10, help="notifications per POST, as Graph batches them")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent POSTs")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds to wait for a change to show up")
+    parser.add_argument("--settle", type=float, default=0.0, help="seconds to wait before the checks")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--mailbox", default=MAILBOX, help="the server's default mailbox (MS_USER_ID)")
+    parser.add_argument("--server-url", help="drive an already running server instead of starting one")
+    parser.add_argument("--graph-url", help="its fake Graph, e.g. http://127.0.0.1:8900")
+    parser.add_argument("--api-key", default=API_KEY)
+    args = parser.parse_args()
+    if bool(args.server_url) != bool(args.graph_url):
+        parser.error("--server-url and --graph-url go together")
+
+    processes = []
+    try:
+        server_url, graph_url = args.server_url, args.graph_url
+        if server_url is None:
+            graph_port, server_port = free_port(), free_port()
+            graph_url = f"http://127.0.0.1:{graph_port}"
+            server_url = f"http://127.0.0.1:{server_port}"
+            processes.append(subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, "fake_graph.py"),
+                                               "--port", str(graph_port), "--latency-ms", "5", "--jitter-ms", "1"]))
+            env = dict(os.environ)
+            env.update({
+                "API_KEY": args.api_key,
+                "MS_CLIENT_ID": "notification-client",
+                "MS_CLIENT_SECRET": "notification-secret",
+                "MS_TENANT_ID": "notification-tenant",
+                "MS_USER_ID": args.mailbox,
+                "GRAPH_BASE_URL": f"{graph_url}/v1.0",
+                "GRAPH_NOTIFICATION_URL": f"{server_url}/graph/notifications",
+                "GRAPH_READ_CACHE_TTL": env.get("GRAPH_READ_CACHE_TTL", "600"),
+                "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING")
+            })
+            token_url = f"{graph_url}/{env['MS_TENANT_ID']}/oauth2/v2.0/token"
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(BENCH_DIR, "load_test.py"), "serve", str(server_port), token_url,
+                 str(args.workers)],
+                env=env, cwd=REPO_DIR))
+            asyncio.run(wait_ready(f"{graph_url}/_stats"))
+            asyncio.run(wait_ready(f"{server_url}/"))
+        ok = asyncio.run(run(args, server_url, graph_url))
+    finally:
+        # The server first, so it can still delete its subscription on the fake
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
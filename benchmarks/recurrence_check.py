@@ -0,0 +1,115 @@
+"""Check: local recurrence expansion (tools/recurrence.py) against Graph's own expansion.
+
+Each fixture in benchmarks/fixtures/recurrence/ holds a seriesMaster (with its
+exceptionOccurrences and cancelledOccurrences), a query window, and the
+instances Graph returned for that window. The check expands the master locally
+and compares start, end, subject and type of every instance, then times the
+expansion (offline):
+
+    python benchmarks/recurrence_check.py
+
+To record a new fixture from a real series, with the MS_* credentials set:
+
+    python benchmarks/recurrence_check.py --record <series master id> \\
+        --start 2025-05-01T00:00:00Z --end 2025-07-01T00:00:00Z --out benchmarks/fixtures/recurrence/name.json
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.recurrence import Series, expand  # noqa: E402
+from tools.timeutil import to_utc  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "recurrence")
+
+
+def summary(event: dict) -> tuple:
+    return (event["start"]["dateTime"][:19], event["end"]["dateTime"][:19],
+            event.get("subject", ""), event.get("type", ""))
+
+
+def check(path: str) -> bool:
+    with open(path) as f:
+        fixture = json.load(f)
+    window = fixture["window"]
+    start, end = to_utc(window["startDateTime"]), to_utc(window["endDateTime"])
+    series = Series(fixture["seriesMaster"])
+    local = [summary(event) for event in expand([series], start, end)]
+    graph = sorted(summary(event) for event in fixture["instances"])
+    name = os.path.basename(path)[:-5]
+    if local == graph:
+        print(f"ok    {name:<42} {len(graph):>3} instances")
+        return True
+    print(f"FAIL  {name}: {fixture['description']}")
+    for line in sorted(set(local) - set(graph)):
+        print(f"      only local: {line}")
+    for line in sorted(set(graph) - set(local)):
+        print(f"      only Graph: {line}")
+    return False
+
+
+def time_expansion(paths, repeat: int):
+    """Microseconds per expanded occurrence over each fixture's window."""
+    fixtures = [json.load(open(path)) for path in paths]
+    series = [Series(fixture["seriesMaster"]) for fixture in fixtures]
+    windows = [(to_utc(f["window"]["startDateTime"]), to_utc(f["window"]["endDateTime"])) for f in fixtures]
+    produced = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for s, (start, end) in zip(series, windows):
+            produced += sum(1 for _ in expand([s], start, end))
+    elapsed = time.perf_counter() - started
+    print(f"expanded {produced} occurrences in {elapsed * 1e3:.1f} ms ({elapsed / max(produced, 1) * 1e6:.2f} us each)")
+
+
+async def record(master_id: str, start: str, end: str, out: str):
+    from tools.microsoft_calendar import MicrosoftCalendarClient, SERIES_MASTER_FIELDS
+
+    client = MicrosoftCalendarClient()
+    await client.start()
+    try:
+        base = f"/users/{client.user_id}/events/{master_id}"
+        response = await client._graph_request(
+            "GET", base, params={"$select": SERIES_MASTER_FIELDS, "$expand": "exceptionOccurrences"})
+        response.raise_for_status()
+        master = response.json()
+        instances = []
+        async for page in client._iter_pages(f"{base}/instances", {"startDateTime": start, "endDateTime": end}):
+            instances.extend(page.get("value", []))
+    finally:
+        await client.aclose()
+    fixture = {
+        "description": master.get("subject", ""),
+        "window": {"startDateTime": start, "endDateTime": end},
+        "seriesMaster": master,
+        "instances": instances
+    }
+    with open(out, "w") as f:
+        json.dump(fixture, f, indent=2)
+    print(f"Recorded {len(instances)} instances to {out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", nargs="*", help="fixture files (default: all in benchmarks/fixtures/recurrence)")
+    parser.add_argument("--repeat", type=int, default=200, help="expansion passes to time")
+    parser.add_argument("--record", metavar="MASTER_ID", help="record a fixture for this series master from Graph")
+    parser.add_argument("--start", help="window start when recording (ISO 8601)")
+    parser.add_argument("--end", help="window end when recording (ISO 8601)")
+    parser.add_argument("--out", help="fixture file to write when recording")
+    args = parser.parse_args()
+    if args.record:
+        if not (args.start and args.end and args.out):
+            parser.error("--record needs --start, --end and --out")
+        asyncio.run(record(args.record, args.start, args.end, args.out))
+        sys.exit(0)
+    paths = args.fixtures or sorted(glob.glob(os.path.join(FIXTURES, "*.json")))
+    results = [check(path) for path in paths]
+    time_expansion(paths, args.repeat)
+    sys.exit(0 if all(results) else 1)
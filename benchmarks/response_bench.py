@@ -0,0 +1,81 @@
+"""Benchmark: encoding a tool response, FastAPI's default path versus fast_json.
+
+Builds a check_availability response with many busy times and times
+turning it into response bytes: the previous path (recursive
+to_serializable, FastAPI's jsonable_encoder, then json.dumps) against
+FastJSONResponse's single orjson pass:
+
+    python benchmarks/response_bench.py --busy-times 500
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from fast_json import FastJSONResponse, orjson  # noqa: E402
+from schemas.calendar_schemas import EventResponse  # noqa: E402
+
+
+def legacy_to_serializable(obj):
+    """main.to_serializable as it was: a full recursive copy."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    elif isinstance(obj, dict):
+        return {k: legacy_to_serializable(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [legacy_to_serializable(i) for i in obj]
+    return obj
+
+
+def legacy_render(response: dict) -> bytes:
+    # What FastAPI did with a returned dict: jsonable_encoder, then JSONResponse's json.dumps
+    return JSONResponse(jsonable_encoder(legacy_to_serializable(response))).body
+
+
+def fast_render(response: dict) -> bytes:
+    return FastJSONResponse(response).body
+
+
+def availability_response(count: int) -> dict:
+    busy_times = [{"start": f"2025-05-{1 + i // 96 % 28:02d}T{i % 24:02d}:00:00",
+                   "end": f"2025-05-{1 + i // 96 % 28:02d}T{i % 24:02d}:30:00",
+                   "subject": f"Meeting {i} with the team"} for i in range(count)]
+    return {"toolResponse": {"toolName": "check_availability",
+                             "output": {"available": not busy_times, "busy_times": busy_times}}}
+
+
+def event_response() -> dict:
+    return {"toolResponse": {"toolName": "create_meeting",
+                             "output": EventResponse(event_id="AAMkAD-new", status="created",
+                                                     virtual_meeting_link="https://teams.example/join")}}
+
+
+def best(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number
+
+
+def main(count: int, number: int):
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    for label, response in [(f"check_availability, {count} busy times", availability_response(count)),
+                            ("create_meeting (EventResponse model)", event_response())]:
+        assert json.loads(legacy_render(response)) == json.loads(fast_render(response))
+        old = best(lambda: legacy_render(response), number)
+        new = best(lambda: fast_render(response), number)
+        print(f"{label}")
+        print(f"  previous path:  {old * 1e6:9.1f} us")
+        print(f"  fast_json:      {new * 1e6:9.1f} us   ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--busy-times", type=int, default=500)
+    parser.add_argument("--number", type=int, default=200, help="encodings per timing run")
+    args = parser.parse_args()
+    main(args.busy_times, args.number)
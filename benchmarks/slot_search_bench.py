@@ -0,0 +1,75 @@
+"""Micro-benchmark for the find_free_slots search engine.
+
+Searches a quarter (90 days) at 15-minute granularity across several synthetic
+calendars and reports the CPU time of each step, and of the whole search, for
+the active backend (NumPy, or the pure-Python fallback when NumPy is not
+installed):
+
+    python benchmarks/slot_search_bench.py --calendars 6 --events-per-day 5
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import slot_search  # noqa: E402
+from tools.timeutil import get_zone  # noqa: E402
+
+
+def synthetic_busy(start: float, days: int, calendars: int, events_per_day: int, seed: int):
+    rng = random.Random(seed)
+    busy = []
+    for _ in range(calendars):
+        for day in range(days):
+            day_start = start + day * 86400
+            for _ in range(events_per_day):
+                s = day_start + rng.randrange(8 * 3600, 19 * 3600, 900)
+                busy.append((s, s + rng.choice((1800, 2700, 3600, 5400))))
+    return busy
+
+
+def main(days: int, calendars: int, events_per_day: int, duration: int, number: int):
+    tz = get_zone("America/New_York")
+    start = datetime(2025, 1, 6, tzinfo=tz).timestamp()
+    end = start + days * 86400
+    busy = synthetic_busy(start, days, calendars, events_per_day, seed=42)
+
+    merge_time = min(timeit.repeat(
+        lambda: slot_search.merge_busy(busy, start, end), number=number, repeat=5
+    )) / number
+    merged = slot_search.merge_busy(busy, start, end)
+    windows = slot_search.working_windows(start, end, tz, time(9), time(17), set(range(5)))
+    windows_time = min(timeit.repeat(
+        lambda: slot_search.working_windows(start, end, tz, time(9), time(17), set(range(5))),
+        number=number, repeat=5
+    )) / number
+    search_time = min(timeit.repeat(
+        lambda: slot_search.find_slots(merged, windows, duration * 60, 900, 10),
+        number=number, repeat=5
+    )) / number
+    slots = slot_search.find_slots(merged, windows, duration * 60, 900, 10)
+
+    backend = "numpy" if slot_search._numpy() is not None else "pure-Python fallback"
+    print(f"backend:            {backend}")
+    print(f"range:              {days} days, {calendars} calendars, {len(busy)} busy events ({len(merged)} merged)")
+    print(f"search grid:        {int((end - start) // 900)} quarter-hours")
+    print(f"merge_busy:         {merge_time * 1e6:9.1f} us")
+    print(f"working_windows:    {windows_time * 1e6:9.1f} us")
+    print(f"find_slots:         {search_time * 1e6:9.1f} us")
+    print(f"total:              {(merge_time + windows_time + search_time) * 1e6:9.1f} us")
+    print(f"slots found:        {len(slots)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--calendars", type=int, default=6)
+    parser.add_argument("--events-per-day", type=int, default=5)
+    parser.add_argument("--duration", type=int, default=60, help="meeting length in minutes")
+    parser.add_argument("--number", type=int, default=20, help="calls per timing run")
+    args = parser.parse_args()
+    main(args.days, args.calendars, args.events_per_day, args.duration, args.number)
@@ -0,0 +1,74 @@
+"""Benchmark: cost of the calendar snapshot store (tools/snapshot.py) at startup and per sync round.
+
+Saves a mirror of --events synthetic events, then times what a restarted
+process pays to restore it and what one delta round of --changes events
+costs to persist (offline):
+
+    python benchmarks/snapshot_bench.py --events 20000 --changes 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools.snapshot import SnapshotStore  # noqa: E402
+
+MAILBOX = "bench-tenant/bench@example.com"
+DAY = 1747612800.0  # 2025-05-19T00:00:00Z
+
+
+def make_event(i: int, shift: int = 0) -> tuple:
+    start = DAY + (i % 60) * 86400 + (i % 9) * 3600 + shift
+    event = {
+        "id": f"AAMkAD-{i}", "subject": f"Meeting {i}", "showAs": "busy",
+        "start": {"dateTime": time.strftime("%Y-%m-%dT%H:%M:%S.0000000", time.gmtime(start)), "timeZone": "UTC"},
+        "end": {"dateTime": time.strftime("%Y-%m-%dT%H:%M:%S.0000000", time.gmtime(start + 1800)), "timeZone": "UTC"},
+        "location": {"displayName": "Room 4"}, "organizer": {"emailAddress": {"name": "Bench", "address": "bench@example.com"}}
+    }
+    return start, start + 1800, event
+
+
+async def run(count: int, changes: int):
+    with tempfile.TemporaryDirectory() as directory:
+        store = SnapshotStore(os.path.join(directory, "snapshot.db"))
+        events = {f"AAMkAD-{i}": make_event(i) for i in range(count)}
+        state = {"delta_link": "https://graph.microsoft.com/v1.0/delta?token=1", "anchor": DAY,
+                 "window_start": DAY - 7 * 86400, "window_end": DAY + 60 * 86400, "synced_at": time.time()}
+
+        started = time.perf_counter()
+        await store.save_mirror(MAILBOX, state, events)
+        print(f"full save of {count} events:        {(time.perf_counter() - started) * 1e3:8.1f} ms")
+
+        # A delta round: some events moved, some deleted
+        changed = set()
+        for i in range(changes):
+            event_id = f"AAMkAD-{i}"
+            if i % 5:
+                events[event_id] = make_event(i, 3600)
+            else:
+                events.pop(event_id)
+            changed.add(event_id)
+        started = time.perf_counter()
+        await store.save_mirror(MAILBOX, dict(state, synced_at=time.time()), events, changed)
+        print(f"incremental save of {changes} changes:   {(time.perf_counter() - started) * 1e3:8.1f} ms")
+
+        store.close()
+        store = SnapshotStore(store.path)
+        started = time.perf_counter()
+        restored = await store.load_mirror(MAILBOX)
+        print(f"restore at startup:                {(time.perf_counter() - started) * 1e3:8.1f} ms "
+              f"({len(restored['events'])} events)")
+        assert restored["events"] == events
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000, help="events in the mirrored window")
+    parser.add_argument("--changes", type=int, default=50, help="events changed by one delta round")
+    args = parser.parse_args()
+    asyncio.run(run(args.events, args.changes))
@@ -0,0 +1,74 @@
+"""Load test: hold thousands of idle /mcp-events connections against one running server.
+
+Start the server with a single worker, then run for example:
+
+    python benchmarks/sse_idle_clients.py --url http://localhost:5000 --clients 5000 --hold 60
+
+Each client waits for the initial tools event and then counts pings until the
+hold period ends. Raise the open-file limit first (ulimit -n) on both sides.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def hold_client(client: httpx.AsyncClient, url: str, stats: dict, ready: asyncio.Event, total: int):
+    try:
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("event: tools"):
+                    stats["tools"] += 1
+                    if stats["tools"] >= total:
+                        ready.set()
+                elif line.startswith("event: ping"):
+                    stats["pings"] += 1
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        stats["errors"] += 1
+        stats["last_error"] = repr(e)
+
+
+async def main(url: str, clients: int, hold: float, ramp: float):
+    stats = {"tools": 0, "pings": 0, "errors": 0, "last_error": None}
+    ready = asyncio.Event()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(10.0, read=None)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        tasks = []
+        for i in range(clients):
+            tasks.append(asyncio.create_task(hold_client(client, f"{url}/mcp-events", stats, ready, clients)))
+            if ramp:
+                await asyncio.sleep(ramp / clients)
+        try:
+            await asyncio.wait_for(ready.wait(), timeout=max(hold, 30))
+        except asyncio.TimeoutError:
+            pass
+        connected_after = time.perf_counter() - started
+        server_stats = (await client.get(f"{url}/mcp-events/clients")).json()
+        await asyncio.sleep(hold)
+        server_stats_end = (await client.get(f"{url}/mcp-events/clients")).json()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(f"clients requested:        {clients}")
+    print(f"received tools event:     {stats['tools']} (after {connected_after:.2f}s)")
+    print(f"server connected (start): {server_stats['connected']}")
+    print(f"server connected (end):   {server_stats_end['connected']}  dropped: {server_stats_end['dropped']}")
+    print(f"pings received:           {stats['pings']} ({stats['pings'] / max(stats['tools'], 1):.1f} per client over {hold:.0f}s)")
+    print(f"client errors:            {stats['errors']}" + (f" (last: {stats['last_error']})" if stats["errors"] else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--hold", type=float, default=60, help="seconds to keep all clients connected")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which to open the connections")
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.clients, args.hold, args.ramp))
@@ -0,0 +1,82 @@
+"""Benchmark: cold-start cost of importing main and running its lifespan startup.
+
+Each run is a fresh interpreter, as on a newly scaled-out instance. Reports the
+median and best import time and the slowest top-level imports (from
+python -X importtime), plus the time the app's startup hook takes (offline):
+
+    python benchmarks/startup_bench.py --runs 10 --budget-ms 400
+
+With --budget-ms the script exits non-zero when the median import exceeds it.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Offline placeholders; nothing leaves the process
+ENV = dict(os.environ, API_KEY="bench", MS_CLIENT_ID="bench", MS_CLIENT_SECRET="bench",
+           MS_TENANT_ID="bench", MS_USER_ID="bench@example.com", LOG_LEVEL="WARNING")
+
+IMPORT = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+# Startup without Graph: the token refresher and mirror only start background tasks
+STARTUP = """
+import asyncio, time
+import main
+async def run():
+    t = time.perf_counter()
+    await main.startup()
+    elapsed = time.perf_counter() - t
+    await main.shutdown()
+    return elapsed
+print(asyncio.run(run()))
+"""
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=REPO_DIR, env=ENV,
+                          capture_output=True, text=True, check=True)
+
+
+def slowest_imports(limit: int):
+    """Modules main imports directly, by cumulative import time."""
+    stderr = run_python("import main", "-X", "importtime").stderr
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        # Imports are reported after their children: collect depth-1 lines until main itself shows up
+        if depth == 0:
+            if name.strip() == "main":
+                break
+            children = []
+        elif depth == 1:
+            children.append((int(cumulative_us), name.strip()))
+    return sorted(children, reverse=True)[:limit]
+
+
+def main(runs: int, budget_ms: float, top: int):
+    imports = [float(run_python(IMPORT).stdout) * 1e3 for _ in range(runs)]
+    startups = [float(run_python(STARTUP).stdout.strip().splitlines()[-1]) * 1e3 for _ in range(min(runs, 3))]
+    median = statistics.median(imports)
+    print(f"import main:    median {median:7.1f} ms   best {min(imports):7.1f} ms   ({runs} runs)")
+    print(f"startup hook:   median {statistics.median(startups):7.1f} ms")
+    print("slowest imports (cumulative):")
+    for cumulative_us, name in slowest_imports(top):
+        print(f"  {cumulative_us / 1e3:7.1f} ms  {name}")
+    if budget_ms and median > budget_ms:
+        print(f"over budget: {median:.1f} ms > {budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters to time")
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail when the median import exceeds this")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    args = parser.parse_args()
+    main(args.runs, args.budget_ms, args.top)
@@ -0,0 +1,41 @@
+import os
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+REQUIRED_ENV_VARS = [
+    ("API_KEY", "API key for authentication"),
+    ("MS_CLIENT_ID", "Microsoft Graph API Client ID"),
+    ("MS_CLIENT_SECRET", "Microsoft Graph API Client Secret"),
+    ("MS_TENANT_ID", "Microsoft Graph API Tenant ID"),
+    ("MS_USER_ID", "Microsoft Graph API User ID")
+]
+
+
+class Settings(NamedTuple):
+    """Credentials the server can't run without, in REQUIRED_ENV_VARS order."""
+
+    api_key: Optional[str]
+    client_id: Optional[str]
+    client_secret: Optional[str]
+    tenant_id: Optional[str]
+    user_id: Optional[str]
+
+    @property
+    def missing(self) -> List[str]:
+        """Names of required variables that are unset or empty."""
+        return [name for (name, _), value in zip(REQUIRED_ENV_VARS, self) if not value]
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Required settings, read from the environment once per process."""
+    return Settings(*(os.environ.get(name) for name, _ in REQUIRED_ENV_VARS))
+
+
+def missing_settings_message(missing: List[str]) -> str:
+    env_keys = [k for k in os.environ.keys() if k.startswith('MS_') or k == 'API_KEY']
+    return (
+        f"Missing required environment variables: {', '.join(missing)}\n"
+        f"Set them in the Replit Secrets tab.\nCurrent env: {env_keys}"
+    )
@@ -0,0 +1,50 @@
+import json
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt; the stdlib encoder still works
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Encode what the JSON encoder doesn't know natively: pydantic models, via their own serializer."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _lenient_default(obj: Any) -> Any:
+    try:
+        return _default(obj)
+    except TypeError:
+        return str(obj)
+
+
+if orjson is not None:
+    def dumps(obj: Any, lenient: bool = False) -> bytes:
+        """Compact UTF-8 JSON in one pass; lenient renders unknown objects with str() instead of failing."""
+        return orjson.dumps(obj, default=_lenient_default if lenient else _default)
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any, lenient: bool = False) -> bytes:
+        """Compact UTF-8 JSON in one pass; lenient renders unknown objects with str() instead of failing."""
+        return json.dumps(obj, default=_lenient_default if lenient else _default,
+                          ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded straight from handler results, models included.
+
+    Returning it from an endpoint also skips FastAPI's jsonable_encoder copy
+    of the content, which dominates for large busy_times lists.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
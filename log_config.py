@@ -0,0 +1,118 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Any, Dict
+
+from fast_json import dumps
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# "text" keeps the classic one-line records; "json" emits one compact JSON object per record
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+# Format and write records on a background thread instead of the event loop
+LOG_ASYNC = os.environ.get("LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+# Per-category sampling rates, e.g. "payload=0.01,graph=0.1"; unlisted categories are always logged
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")
+
+# Standard LogRecord attributes; anything else on a record came from `extra=` and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_configured = False
+
+
+def _parse_rates(spec: str) -> Dict[str, float]:
+    rates: Dict[str, float] = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, _, value = item.partition("=")
+        try:
+            rates[name.strip()] = min(max(float(value), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+_sample_rates = _parse_rates(LOG_SAMPLE_RATES)
+
+
+def sampled(category: str, log: logging.Logger, level: int = logging.INFO) -> bool:
+    """Whether to log this occurrence of a payload category: the level is enabled and it falls in the sample."""
+    if not log.isEnabledFor(level):
+        return False
+    rate = _sample_rates.get(category, 1.0)
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+class LazyJSON:
+    """Log argument that serializes its value only if the record is actually formatted."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return dumps(self.value, lenient=True).decode("utf-8")
+
+
+class JSONFormatter(logging.Formatter):
+    """One compact JSON object per record, with `extra=` fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return dumps(entry, lenient=True).decode("utf-8")
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats every record before enqueueing it, which is the
+    work we want off the event loop. Log arguments are therefore rendered
+    later, so they must not be mutated after the logging call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging():
+    """Install the root handler once: compact or text records, optionally via a background thread."""
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+
+    handler = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    if LOG_ASYNC:
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(_DeferredQueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        listener.start()
+        # Drain records still queued at interpreter exit
+        atexit.register(listener.stop)
+    else:
+        root.addHandler(handler)
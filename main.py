@@ -3,42 +3,31 @@ import logging
 # Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
 import json
 import asyncio
-from datetime import datetime
-from typing import Dict, Any
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Any, Optional, Tuple
 import sys
 from pydantic import BaseModel
 
 from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi.responses import PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sse_starlette.sse import EventSourceResponse
 
+from log_config import LazyJSON, configure_logging, sampled
+from fast_json import FastJSONResponse
+from config import get_settings, missing_settings_message
+
 # Configure logging first
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Get environment variables
-API_KEY = os.environ.get("API_KEY")
-MS_CLIENT_ID = os.environ.get("MS_CLIENT_ID")
-MS_CLIENT_SECRET = os.environ.get("MS_CLIENT_SECRET")
-MS_TENANT_ID = os.environ.get("MS_TENANT_ID")
-MS_USER_ID = os.environ.get("MS_USER_ID")
-
-# Check for missing environment variables
-missing_vars = []
-for var_name, var_value in [
-    ("API_KEY", API_KEY),
-    ("MS_CLIENT_ID", MS_CLIENT_ID),
-    ("MS_CLIENT_SECRET", MS_CLIENT_SECRET),
-    ("MS_TENANT_ID", MS_TENANT_ID),
-    ("MS_USER_ID", MS_USER_ID)
-]:
-    if not var_value:
-        missing_vars.append(var_name)
-
-if missing_vars:
-    env_keys = [k for k in os.environ.keys() if k.startswith('MS_') or k == 'API_KEY']
-    error_msg = f"Missing required environment variables: {', '.join(missing_vars)}\nCurrent env: {env_keys}"
-    logger.error(error_msg)
+# Check for missing environment variables; the settings are read once and shared with the other modules
+settings = get_settings()
+if settings.missing:
+    error_msg = missing_settings_message(settings.missing)
+    logger.critical(error_msg)
     raise EnvironmentError(error_msg)
 
 logger.info("All required environment variables are set")
@@ -46,11 +35,76 @@ logger.info("All required environment variables are set")
 try:
     from auth import get_api_key
     from tools.tool_registry import tool_registry
+    from tools.calendar_tools import register_calendar_tools
+    from tools.microsoft_calendar import calendar_client, calendar_pool
+    from tools.graph_throttle import find_throttle_error
+    from tools.write_queue import FAILED, WriteQueueFull, write_queue
+    from tools.idempotency import IdempotencyConflict, idempotent_writes
+    from tools.snapshot import snapshot_store
+    from tools.graph_subscriptions import subscription_manager
+    from tools.shared_state import leadership, shared_state
+    from sse_hub import SSEBroadcaster
+    from metrics import metrics, tool_requests, tool_errors, tool_duration, tool_validation
 except Exception as e:
     logger.error(f"Error importing modules: {str(e)}")
     raise Exception(f"Error importing modules: {str(e)}")
 
-app = FastAPI(title="MCP Calendar Tool Server")
+register_calendar_tools(tool_registry)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared resources once the server is up rather than at import, and stop them on exit."""
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+app = FastAPI(title="MCP Calendar Tool Server", lifespan=lifespan)
+
+# Upper bound on toolCalls accepted by /mcp/batch
+MAX_BATCH_TOOL_CALLS = 100
+# Queue create/update/delete calls and answer with a job ID; a toolCall's "async" field overrides this
+ASYNC_WRITES = os.environ.get("ASYNC_WRITES", "false").lower() in ("1", "true", "yes")
+# Worker processes serving the app; queued jobs live in the worker that queued them, so they need just one
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+QUEUED_WRITES_NEED_ONE_WORKER = ("Queued writes need a single worker process (WEB_CONCURRENCY=1): "
+                                 "jobs are kept by the worker that queued them, so polls and retries "
+                                 "reaching another worker would not find them")
+if ASYNC_WRITES and WEB_CONCURRENCY > 1:
+    logger.critical(QUEUED_WRITES_NEED_ONE_WORKER)
+    raise EnvironmentError(QUEUED_WRITES_NEED_ONE_WORKER)
+
+# One broadcaster feeds every /mcp-events connection
+sse_hub = SSEBroadcaster(tools_payload=tool_registry.get_catalog_json)
+
+# Values owned by other components, read when /metrics is scraped
+metrics.callback("mcp_sse_clients", "Connected /mcp-events clients", lambda: sse_hub.client_count)
+metrics.callback(
+    "mcp_sse_dropped_clients_total", "SSE clients disconnected for falling behind",
+    lambda: sse_hub.dropped_clients, kind="counter"
+)
+metrics.callback(
+    "graph_token_cache_total", "Access token lookups by result (hits, misses, background refreshes)",
+    lambda: {(result,): count for result, count in calendar_client.token_manager.stats().items()},
+    kind="counter", labelnames=["result"]
+)
+metrics.callback(
+    "graph_read_cache_total", "Availability lookups by result (cache hits, shared in-flight calls, misses)",
+    lambda: {(result,): count for result, count in calendar_client.reads.stats().items()},
+    kind="counter", labelnames=["result"]
+)
+metrics.callback(
+    "mcp_idempotency_total", "Writes carrying an idempotency key, by result (replayed hits, shared in-flight calls, misses)",
+    lambda: {(result,): count for result, count in idempotent_writes.stats().items()},
+    kind="counter", labelnames=["result"]
+)
+metrics.callback("mcp_mailbox_clients", "Mailbox clients held by the pool, besides the default one",
+                 lambda: calendar_pool.stats()["clients"])
+if subscription_manager is not None:
+    metrics.callback("graph_subscriptions", "Graph change-notification subscriptions currently active",
+                     lambda: subscription_manager.stats()["subscriptions"])
+metrics.callback("mcp_event_loop_lag_last_seconds", "Most recent event-loop lag probe", lambda: metrics.last_loop_lag)
 
 # Add CORS middleware
 app.add_middleware(
@@ -61,77 +115,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-async def event_generator():
-    """Generate SSE events for tool availability and keep connection alive with pings."""
-    ping_interval = 10
-    tools_interval = 30
-    last_tools_sent = 0
-    while True:
-        now = datetime.utcnow().timestamp()
-        try:
-            # Send tools event every tools_interval seconds
-            if now - last_tools_sent > tools_interval:
-                tools = tool_registry._tools  # get all tool objects
-                tool_info = []
-                for name, tool in tools.items():
-                    # Extract parameter schema from Pydantic model
-                    schema = tool["input_schema"].model_json_schema()
-                    # Build a complete parameters dict with all schema information
-                    params = {}
-                    for prop, prop_info in schema.get("properties", {}).items():
-                        param_info = {
-                            "type": prop_info.get("type", "string"),
-                            "description": prop_info.get("description", ""),
-                            "required": prop in schema.get("required", []),
-                        }
-                        # Add format if specified (e.g., for datetime fields)
-                        if "format" in prop_info:
-                            param_info["format"] = prop_info["format"]
-                        # Add enum values if present
-                        if "enum" in prop_info:
-                            param_info["enum"] = prop_info["enum"]
-                        # Add default value if present
-                        if "default" in prop_info:
-                            param_info["default"] = prop_info["default"]
-                        params[prop] = param_info
-                    
-                    tool_info.append({
-                        "name": name,
-                        "description": tool.get("description", ""),
-                        "parameters": params
-                    })
-                logger.info(f"Sending tools event: {[t['name'] for t in tool_info]}")
-                # Format tools event according to n8n-nodes-mcp requirements
-                tools_data = json.dumps({"tools": tool_info})
-                yield {
-                    "event": "tools",
-                    "data": tools_data,
-                    "retry": 30000,
-                    "id": str(int(now * 1000))
-                }
-                # Add an extra newline after tools event
-                yield {"data": ""}
-                last_tools_sent = now
-            # Always send a ping event every ping_interval seconds
-            logger.info("Sending ping event")
-            yield {
-                "event": "ping",
-                "data": datetime.utcnow().isoformat(),
-                "retry": 30000,
-                "id": str(int(now * 1000))
-            }
-            # Add an extra newline after ping event
-            yield {"data": ""}
-            await asyncio.sleep(ping_interval)
-        except Exception as e:
-            logger.error(f"Error in event generator: {str(e)}")
-            await asyncio.sleep(5)  # Wait a bit before retrying
+def restore_catalog():
+    """Reuse the tool catalog compiled by an earlier run of the same code, or save this run's for the next."""
+    try:
+        fingerprint = tool_registry.catalog_fingerprint()
+        catalog_json = snapshot_store.load_catalog(fingerprint)
+        if catalog_json is None:
+            snapshot_store.save_catalog(fingerprint, tool_registry.get_catalog_json())
+        else:
+            tool_registry.restore_catalog_json(catalog_json)
+    except Exception as e:
+        logger.warning(f"Tool catalog snapshot unavailable: {str(e)}")
+
+async def startup():
+    """Restore the snapshot, open the shared Graph connection pool, warm the token cache and start the SSE broadcaster and write workers."""
+    if snapshot_store is not None:
+        restore_catalog()
+    # Settle which worker leads before the mirror and subscriptions start
+    await leadership.start()
+    await calendar_pool.start()
+    await write_queue.start()
+    await sse_hub.start()
+    await metrics.start()
+
+async def shutdown():
+    """Stop the SSE broadcaster, finish queued writes and close the shared Graph connection pool."""
+    await metrics.aclose()
+    await sse_hub.aclose()
+    await write_queue.aclose()
+    await calendar_pool.aclose()
+    await leadership.aclose()
+    if snapshot_store is not None:
+        snapshot_store.close()
+    if shared_state is not None:
+        shared_state.close()
 
 @app.get("/mcp-events")
 async def mcp_events():
     """SSE endpoint for tool discovery."""
     return EventSourceResponse(
-        event_generator(),
+        sse_hub.subscribe(),
         headers={
             "Content-Type": "text/event-stream",
             "Cache-Control": "no-cache, no-transform",
@@ -141,23 +164,186 @@ async def mcp_events():
         }
     )
 
-def to_serializable(obj):
-    if isinstance(obj, BaseModel):
-        return obj.dict()
-    elif isinstance(obj, dict):
-        return {k: to_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [to_serializable(i) for i in obj]
-    else:
-        return obj
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics in the text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/graph/notifications")
+async def graph_notifications(request: Request, validationToken: Optional[str] = None):
+    """Graph change and lifecycle notifications. Authenticated by the clientState each one carries,
+    since Graph can't send an API key; answered before the changes are processed, as Graph expects."""
+    if subscription_manager is None:
+        raise HTTPException(status_code=404, detail="Change notifications are not enabled")
+    if validationToken is not None:
+        # Graph checks the URL by having it echo the token, as plain text, when a subscription is created
+        return PlainTextResponse(validationToken)
+    try:
+        accepted = subscription_manager.accept(await request.json())
+    except (json.JSONDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid notification payload: {str(e)}")
+    if accepted == 0:
+        logger.warning("Graph notification POST carried no notification for a known subscription")
+    return Response(status_code=202)
+
+@app.get("/mcp-events/clients")
+async def mcp_events_clients():
+    """Connected SSE client counts."""
+    return sse_hub.stats()
+
+def validate_tool_call(tool_name: str, parameters: Dict[str, Any]) -> Tuple[Dict[str, Any], BaseModel]:
+    """Look up a tool and parse its parameters into the tool's typed input; raises 404/400 HTTPExceptions."""
+    label = tool_name if tool_registry.has_tool(tool_name) else "unknown"
+    try:
+        # Get and validate the tool
+        tool = tool_registry.get_tool(tool_name)
+        tool_requests.inc(label)
+        logger.info("🔧 Executing tool: %s", tool_name)
+        logger.debug("Tool parameters: %s", LazyJSON(parameters))
+
+        # Validate and parse input in one pass with the tool's compiled schema
+        return tool, tool["validate"](parameters)
+
+    except KeyError as e:
+        logger.error("❌ Tool not found: %s", str(e))
+        tool_errors.inc(label, "404")
+        raise HTTPException(status_code=404, detail=f"Tool not found: {str(e)}")
+    except ValueError as e:
+        logger.error("❌ Invalid parameters: %s", str(e))
+        tool_errors.inc(label, "400")
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def run_tool(tool_name: str, tool: Dict[str, Any], params: BaseModel) -> Any:
+    """Run a validated tool call and return its result (a response model or JSON-ready data); failures become HTTPExceptions."""
+    try:
+        return await tool["handler"](params)
+    except HTTPException as e:
+        tool_errors.inc(tool_name, str(e.status_code))
+        raise
+    except ValueError as e:
+        # Raised for parameters only the handler can check, such as a mailbox outside the allowlist
+        logger.error("❌ Invalid parameters: %s", str(e))
+        tool_errors.inc(tool_name, "400")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        throttled = find_throttle_error(e)
+        if throttled is not None:
+            # Pass Graph's pushback on so callers wait instead of retrying immediately
+            logger.warning("⏳ Tool throttled by Graph: %s", str(e))
+            tool_errors.inc(tool_name, str(throttled.status_code))
+            headers = {"Retry-After": str(math.ceil(throttled.retry_after))} if throttled.retry_after else None
+            raise HTTPException(status_code=throttled.status_code,
+                                detail="Microsoft Graph is throttling requests; retry after the Retry-After delay",
+                                headers=headers)
+        logger.error("❌ Tool failed: %s", str(e))
+        tool_errors.inc(tool_name, "500")
+        raise HTTPException(status_code=500, detail=f"Tool execution failed: {str(e)}")
+
+def mailbox_scope(params: BaseModel) -> Tuple[str, str]:
+    """(tenant, lower-cased mailbox) a call targets, defaults filled in: omitting them and naming them are the same."""
+    return (params.tenant_id or calendar_client.tenant_id, (params.mailbox or calendar_client.user_id).lower())
+
+def idempotency_scope(params: BaseModel) -> Optional[Tuple[str, str, str]]:
+    """Keys are per mailbox; None when the call carries no idempotency key."""
+    key = getattr(params, "idempotency_key", None)
+    return (*mailbox_scope(params), key) if key else None
+
+async def run_once(tool_name: str, params: BaseModel, call: Callable[[], Awaitable[Any]]) -> Any:
+    """Run a write at most once per idempotency key; retries and concurrent duplicates get the first call's result."""
+    scope = idempotency_scope(params)
+    if scope is None:
+        return await call()
+    # The tool is part of the fingerprint, so reusing a key for another change is a conflict
+    fingerprint = dict(params.model_dump(mode="json"), tool=tool_name, tenant_id=scope[0], mailbox=scope[1])
+    try:
+        return await idempotent_writes.run(scope, fingerprint, call)
+    except IdempotencyConflict as e:
+        logger.error("❌ Idempotency conflict: %s", str(e))
+        tool_errors.inc(tool_name, "422")
+        raise HTTPException(status_code=422, detail=str(e))
+
+async def execute_tool(tool_name: str, parameters: Dict[str, Any]) -> Any:
+    """Validate parameters with the tool's schema, run the tool and return a serializable result."""
+    started = time.perf_counter()
+    # Unknown names share one label so they cannot grow the metrics without bound
+    label = tool_name if tool_registry.has_tool(tool_name) else "unknown"
+    try:
+        tool, params = validate_tool_call(tool_name, parameters)
+        tool_validation.observe(time.perf_counter() - started, label)
+        if tool["mutates"]:
+            return await run_once(tool_name, params, lambda: run_tool(tool_name, tool, params))
+        return await run_tool(tool_name, tool, params)
+    finally:
+        tool_duration.observe(time.perf_counter() - started, label)
+
+def write_ordering_key(params: BaseModel) -> Optional[Tuple[str, str, str]]:
+    """Writes to the same event run in submission order; creates have no event yet and run freely."""
+    event_id = getattr(params, "event_id", None)
+    if not event_id:
+        return None
+    return (*mailbox_scope(params), event_id)
+
+async def enqueue_tool(tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a write now and queue its execution, returning the job to poll with get_job_status."""
+    tool, params = validate_tool_call(tool_name, parameters)
+    scope = idempotency_scope(params)
+
+    async def run() -> Any:
+        try:
+            return await run_tool(tool_name, tool, params)
+        except BaseException:
+            # Retries would otherwise be handed this failed job until the key expires
+            if scope is not None:
+                idempotent_writes.forget(scope)
+            raise
+
+    async def submit() -> Dict[str, Any]:
+        try:
+            job = write_queue.submit(tool_name, run, key=write_ordering_key(params))
+        except WriteQueueFull as e:
+            logger.warning("⏳ Write queue full: %s", str(e))
+            tool_errors.inc(tool_name, "503")
+            raise HTTPException(status_code=503, detail="Too many writes pending; retry shortly",
+                                headers={"Retry-After": "1"})
+        return {"job_id": job.job_id}
+
+    # A retried submission gets the job queued the first time (or the result, if that call ran synchronously)
+    output = await run_once(tool_name, params, submit)
+    if not isinstance(output, dict) or "job_id" not in output:
+        return output
+    job = write_queue.get(output["job_id"])
+    if job is None:
+        return {"job_id": output["job_id"], "status": "not_found"}
+    if job.status == FAILED and scope is not None:
+        # It may have failed before its job id was stored
+        idempotent_writes.forget(scope)
+    return job.to_dict()
+
+def should_enqueue(tool_name: str, tool_call: Dict[str, Any]) -> bool:
+    """Queue writes when the call asks for it ("async": true) or ASYNC_WRITES is on and the call does not opt out."""
+    if not tool_registry.has_tool(tool_name) or not tool_registry.get_tool(tool_name)["mutates"]:
+        return False
+    enqueue = tool_call.get("async")
+    if enqueue is None:
+        enqueue = ASYNC_WRITES
+    elif not isinstance(enqueue, bool):
+        # A string such as "false" would otherwise read as true
+        tool_errors.inc(tool_name, "400")
+        raise HTTPException(status_code=400, detail='"async" must be true or false')
+    if enqueue and WEB_CONCURRENCY > 1:
+        tool_errors.inc(tool_name, "400")
+        raise HTTPException(status_code=400, detail=QUEUED_WRITES_NEED_ONE_WORKER)
+    return enqueue
 
 @app.post("/mcp/message")
 async def handle_message(request: Request, api_key: str = Depends(get_api_key)):
     """Handle tool execution requests."""
     try:
-        # Log the incoming request
+        # Log a sampled fraction of requests and their responses in full
         body = await request.json()
-        logger.info("📥 Received toolCall: %s", json.dumps(body, indent=2))
+        trace = sampled("payload", logger)
+        if trace:
+            logger.info("📥 Received toolCall: %s", LazyJSON(body))
         
         tool_call = body.get("toolCall", {})
         tool_name = tool_call.get("toolName")
@@ -167,38 +353,33 @@ async def handle_message(request: Request, api_key: str = Depends(get_api_key)):
             logger.error("❌ No tool name provided in request")
             raise HTTPException(status_code=400, detail="No tool name provided")
 
-        try:
-            # Get and validate the tool
-            tool = tool_registry.get_tool(tool_name)
-            logger.info("🔧 Executing tool: %s with parameters: %s", tool_name, json.dumps(parameters, indent=2))
-            
-            # Validate input using the tool's schema
-            input_schema = tool["input_schema"]
-            validated_params = input_schema(**parameters)
-            validated_params.validate_times()  # Additional validation for datetime fields
-            
-            # Execute the tool with validated parameters
-            result = await tool["handler"](validated_params.dict())
-            result = to_serializable(result)
-            response = {
-                "toolResponse": {
-                    "toolName": tool_name,
-                    "output": result
-                }
+        # HTTP clients may send the key as a header instead of a tool parameter
+        idempotency_header = request.headers.get("Idempotency-Key")
+        if idempotency_header and isinstance(parameters, dict) and "idempotency_key" not in parameters \
+                and tool_registry.has_tool(tool_name) and tool_registry.get_tool(tool_name)["mutates"]:
+            parameters = dict(parameters, idempotency_key=idempotency_header)
+
+        if should_enqueue(tool_name, tool_call):
+            # Answer with the job right away; the write runs on the write queue
+            job = await enqueue_tool(tool_name, parameters)
+            if trace:
+                logger.info("📤 Queued write job: %s", LazyJSON(job))
+            return FastJSONResponse({"toolResponse": {"toolName": tool_name, "output": job}}, status_code=202)
+
+        result = await execute_tool(tool_name, parameters)
+        response = {
+            "toolResponse": {
+                "toolName": tool_name,
+                "output": result
             }
-            logger.info("✅ Tool executed: %s", json.dumps(response, indent=2))
-            return response
-            
-        except KeyError as e:
-            logger.error("❌ Tool not found: %s", str(e))
-            raise HTTPException(status_code=404, detail=f"Tool not found: {str(e)}")
-        except ValueError as e:
-            logger.error("❌ Invalid parameters: %s", str(e))
-            raise HTTPException(status_code=400, detail=str(e))
-        except Exception as e:
-            logger.error("❌ Tool failed: %s", str(e))
-            raise HTTPException(status_code=500, detail=f"Tool execution failed: {str(e)}")
+        }
+        if trace:
+            logger.info("✅ Tool executed: %s", LazyJSON(response))
+        # Encoded in one pass, models included, without FastAPI's jsonable_encoder copy
+        return FastJSONResponse(response)
         
+    except HTTPException:
+        raise
     except json.JSONDecodeError as e:
         logger.error("❌ Invalid JSON in request: %s", str(e))
         raise HTTPException(status_code=400, detail="Invalid JSON in request")
@@ -206,6 +387,45 @@ async def handle_message(request: Request, api_key: str = Depends(get_api_key)):
         logger.error("❌ Error processing message: %s", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/mcp/jobs/{job_id}")
+async def job_status(job_id: str, wait: float = 0, api_key: str = Depends(get_api_key)):
+    """State of a queued write; with ?wait=N, waits up to N seconds (max 30) for it to finish."""
+    job = await write_queue.wait(job_id, min(max(wait, 0), 30))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return FastJSONResponse(job.to_dict())
+
+async def execute_batch_item(tool_call: Any) -> Dict[str, Any]:
+    """Run one entry of a batch, reporting failures in the entry instead of failing the batch."""
+    tool_name = tool_call.get("toolName") if isinstance(tool_call, dict) else None
+    if not tool_name:
+        return {"toolName": tool_name, "error": {"status": 400, "detail": "No tool name provided"}}
+    try:
+        output = await execute_tool(tool_name, tool_call.get("parameters", {}))
+        return {"toolName": tool_name, "output": output}
+    except HTTPException as e:
+        return {"toolName": tool_name, "error": {"status": e.status_code, "detail": e.detail}}
+
+@app.post("/mcp/batch")
+async def handle_batch(request: Request, api_key: str = Depends(get_api_key)):
+    """Execute several tool calls at once, packing their Graph requests into $batch calls."""
+    try:
+        body = await request.json()
+    except json.JSONDecodeError as e:
+        logger.error("❌ Invalid JSON in request: %s", str(e))
+        raise HTTPException(status_code=400, detail="Invalid JSON in request")
+
+    tool_calls = body.get("toolCalls") if isinstance(body, dict) else None
+    if not isinstance(tool_calls, list):
+        raise HTTPException(status_code=400, detail="toolCalls must be a list")
+    if len(tool_calls) > MAX_BATCH_TOOL_CALLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_TOOL_CALLS} toolCalls per batch")
+
+    logger.info("📥 Received batch of %d toolCalls", len(tool_calls))
+    async with calendar_client.batch():
+        results = await asyncio.gather(*(execute_batch_item(call) for call in tool_calls))
+    return FastJSONResponse({"toolResponses": results})
+
 @app.get("/")
 def root():
     return {"message": "MCP Server is running 🚀"}
@@ -214,38 +434,55 @@ def root():
 def test():
     return {"test": True}
 
-# Startup check for required environment variables
-REQUIRED_ENV_VARS = [
-    ("API_KEY", "API key for authentication"),
-    ("MS_CLIENT_ID", "Microsoft Graph API Client ID"),
-    ("MS_CLIENT_SECRET", "Microsoft Graph API Client Secret"),
-    ("MS_TENANT_ID", "Microsoft Graph API Tenant ID"),
-    ("MS_USER_ID", "Microsoft Graph API User ID")
-]
-missing_vars = [name for name, desc in REQUIRED_ENV_VARS if not os.environ.get(name)]
-if missing_vars:
-    env_keys = [k for k in os.environ.keys() if k.startswith('MS_') or k == 'API_KEY']
-    error_msg = (
-        f"\n\nERROR: The following required environment variables are missing: {', '.join(missing_vars)}\n"
-        f"Set them in the Replit Secrets tab.\nCurrent env: {env_keys}\n\n"
-    )
-    logger.critical(error_msg)
-    sys.exit(1)
+def shared_files(workers: int) -> list:
+    """Point worker processes at per-server state files, and a common notification clientState, unless
+    configured; returns the files to remove on exit."""
+    if workers <= 1:
+        return []
+    import secrets
+    import tempfile
+    # Every worker checks notifications against it, whichever worker created the subscription
+    os.environ.setdefault("GRAPH_NOTIFICATION_CLIENT_STATE", secrets.token_urlsafe(32))
+    created = []
+    defaults = [("SHARED_STATE_PATH", "state")]
+    if os.environ.get("CALENDAR_MIRROR", "false").lower() == "true":
+        # Followers replicate the leader's mirror from the snapshot
+        defaults.append(("CALENDAR_SNAPSHOT_PATH", "snapshot"))
+    for name, kind in defaults:
+        if not os.environ.get(name):
+            os.environ[name] = os.path.join(tempfile.gettempdir(), f"mcp-calendar-{os.getpid()}-{kind}.db")
+            created.append(os.environ[name])
+    return created
 
 if __name__ == "__main__":
     import uvicorn
+    created = []
     try:
         port = int(os.environ.get('PORT', 5000))
         host = os.environ.get('HOST', '0.0.0.0')
         log_level = os.environ.get('LOG_LEVEL', 'info').lower()
-        logger.info(f"Starting server on {host}:{port}")
+        workers = WEB_CONCURRENCY
+        created = shared_files(workers)
+        logger.info(f"Starting server on {host}:{port}" + (f" with {workers} workers" if workers > 1 else ""))
         logger.info("Environment variables loaded successfully")
         uvicorn.run(
-            app,
+            # Worker processes import the app themselves
+            "main:app" if workers > 1 else app,
             host=host,
             port=port,
-            log_level=log_level
+            workers=workers,
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+            log_level=log_level,
+            # Route uvicorn's loggers through the root handler configured above
+            log_config=None
         )
     except Exception as e:
         logger.error(f"Failed to start server: {str(e)}")
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
+    finally:
+        for path in created:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(path + suffix)
+                except FileNotFoundError:
+                    pass 
\ No newline at end of file
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+# Seconds between event-loop lag probes
+LOOP_LAG_INTERVAL = float(os.environ.get("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+# Latency buckets in seconds, from sub-millisecond handler work up to slow Graph pages
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+Labels = Tuple[str, ...]
+Sample = Union[float, Dict[Labels, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_label_str(self.labelnames, labels)} {_number(value)}"
+                for labels, value in self._values.items()]
+
+
+class Histogram:
+    """Bucketed observations per label set; buckets are cumulated only when rendered."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Value read from another component when /metrics is scraped."""
+
+    def __init__(self, name: str, documentation: str, kind: str, read: Callable[[], Sample],
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.read = read
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception as e:
+            logger.error(f"Error reading metric {self.name}: {str(e)}")
+            return []
+        if isinstance(value, dict):
+            return [f"{self.name}{_label_str(self.labelnames, labels)} {_number(v)}" for labels, v in value.items()]
+        return [f"{self.name} {_number(value)}"]
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format.
+
+    Updates are plain dict operations on the event loop, so instrumentation
+    stays cheap enough to leave on; all formatting happens at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lag_task: Optional[asyncio.Task] = None
+        self.last_loop_lag = 0.0
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, read: Callable[[], Sample], kind: str = "gauge",
+                 labelnames: Sequence[str] = ()) -> CallbackMetric:
+        """Register a value computed at scrape time: a number, or {label values: number}."""
+        return self._add(CallbackMetric(name, documentation, kind, read, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    async def _probe_loop_lag(self):
+        """Measure how late the loop wakes a sleeping task, i.e. how long callbacks wait to run."""
+        while True:
+            expected = time.perf_counter() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(time.perf_counter() - expected, 0.0)
+            event_loop_lag.observe(lag)
+            self.last_loop_lag = lag
+
+    async def start(self):
+        if self._lag_task is None or self._lag_task.done():
+            self._lag_task = asyncio.create_task(self._probe_loop_lag())
+
+    async def aclose(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            try:
+                await self._lag_task
+            except asyncio.CancelledError:
+                pass
+            self._lag_task = None
+
+
+# Create a singleton instance
+metrics = MetricsRegistry()
+
+tool_requests = metrics.counter("mcp_tool_requests_total", "Tool calls received", ["tool"])
+tool_errors = metrics.counter("mcp_tool_errors_total", "Tool calls that failed, by HTTP status", ["tool", "status"])
+tool_duration = metrics.histogram("mcp_tool_duration_seconds", "Tool call latency, validation included", ["tool"])
+tool_validation = metrics.histogram("mcp_tool_validation_seconds", "Parameter validation time per tool call", ["tool"])
+graph_duration = metrics.histogram(
+    "graph_request_duration_seconds", "Microsoft Graph HTTP call latency", ["method", "endpoint", "status"]
+)
+token_wait = metrics.histogram("graph_token_wait_seconds", "Time spent obtaining an access token per Graph call")
+event_loop_lag = metrics.histogram("mcp_event_loop_lag_seconds", "Event-loop scheduling delay", buckets=LAG_BUCKETS)
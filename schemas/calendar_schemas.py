@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import datetime
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, List, Optional
+from datetime import datetime, date as Date, time as Time
+
+from tools.timeutil import get_zone
 
 class TimeRange(BaseModel):
     start_time: datetime = Field(..., description="Start time of the range")
@@ -34,12 +36,79 @@ class EventResponse(BaseModel):
     status: str = Field(..., description="Status of the operation")
     virtual_meeting_link: Optional[str] = Field(None, description="Link for virtual meeting (e.g., Zoom, Teams)")
 
-class CheckMeetingAtTimeInput(BaseModel):
-    date: str = Field(..., description="The date to check, in YYYY-MM-DD format.")
-    time: str = Field(..., description="The time to check, in HH:MM 24-hour format.")
-    timezone: Optional[str] = Field("UTC", description="User's timezone for accurate calendar matching. Default is UTC.")
+def _check_timezone(name: str) -> str:
+    try:
+        get_zone(name)
+    except Exception:
+        raise ValueError(f"Unknown timezone: {name}")
+    return name
+
+# IANA zone name, checked once when the call is validated
+TimeZoneName = Annotated[str, AfterValidator(_check_timezone)]
+
+class MailboxSelection(BaseModel):
+    mailbox: Optional[str] = Field(None, description="Mailbox to use, as a user principal name (e.g., jane@contoso.com) or user id. Default is the server's configured calendar.")
+    tenant_id: Optional[str] = Field(None, description="Azure AD tenant of the mailbox, for multi-tenant deployments. Default is the server's tenant.")
+
+class IdempotentWrite(MailboxSelection):
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=255, description="Optional unique key for this change (e.g., a UUID). Retrying with the same key returns the original result instead of applying the change again.")
+
+# Tool inputs. Times are parsed once, when the call is validated, and handlers receive the typed model.
+
+class AvailabilityInput(MailboxSelection):
+    start_time: datetime = Field(..., description="Start time in ISO format (e.g., 2025-05-10T14:00:00Z)")
+    end_time: datetime = Field(..., description="End time in ISO format (e.g., 2025-05-10T15:00:00Z)")
+    timezone: TimeZoneName = Field("America/New_York", description="Timezone for the returned busy times (IANA name, e.g., 'America/New_York'). Default is Eastern Time.")
+
+class GroupAvailabilityInput(MailboxSelection):
+    attendees: List[str] = Field(..., description="Email addresses of the people whose calendars to check")
+    start_time: datetime = Field(..., description="Start time in ISO format (e.g., 2025-05-10T14:00:00Z)")
+    end_time: datetime = Field(..., description="End time in ISO format (e.g., 2025-05-10T15:00:00Z)")
+    timezone: TimeZoneName = Field("America/New_York", description="Timezone for the returned busy and free times (IANA name, e.g., 'America/New_York'). Default is Eastern Time.")
+    include_tentative: bool = Field(True, description="Treat tentatively accepted meetings as busy. Default is true.")
+
+class FindFreeSlotsInput(MailboxSelection):
+    start_time: datetime = Field(..., description="Start of the search range in ISO format (e.g., 2025-05-12T00:00:00Z)")
+    end_time: datetime = Field(..., description="End of the search range in ISO format (e.g., 2025-05-17T00:00:00Z)")
+    duration_minutes: int = Field(..., gt=0, description="Length of the meeting in minutes")
+    timezone: TimeZoneName = Field("America/New_York", description="Timezone for working hours and the returned slots (IANA name). Default is Eastern Time.")
+    working_hours_start: Time = Field(Time(9, 0), description="Start of the working day, HH:MM 24-hour format")
+    working_hours_end: Time = Field(Time(17, 0), description="End of the working day, HH:MM 24-hour format")
+    include_weekends: bool = Field(False, description="Also search Saturdays and Sundays")
+    granularity_minutes: int = Field(15, gt=0, description="Slots start this many minutes apart, counted from the start of working hours")
+    attendees: List[str] = Field(default_factory=list, description="Optional email addresses whose calendars must all be free; defaults to your own calendar")
+    max_results: int = Field(10, gt=0, le=50, description="Maximum number of slots to return")
+
+class CreateMeetingInput(IdempotentWrite):
+    title: str = Field(..., description="Title of the meeting")
+    start_time: datetime = Field(..., description="Start time in ISO format (e.g., 2025-05-10T14:00:00Z)")
+    end_time: datetime = Field(..., description="End time in ISO format (e.g., 2025-05-10T15:00:00Z)")
+    description: str = Field("", description="Optional description of the meeting")
+    location: str = Field("", description="Optional location of the meeting")
+    body: str = Field("", description="Optional additional message or invitation content")
+
+class UpdateMeetingInput(IdempotentWrite):
+    event_id: str = Field(..., description="ID of the event to update")
+    title: str = Field(..., description="New title of the meeting")
+    start_time: datetime = Field(..., description="New start time in ISO format")
+    end_time: datetime = Field(..., description="New end time in ISO format")
+    description: str = Field("", description="New description of the meeting")
+    location: str = Field("", description="New location of the meeting")
+    body: str = Field("", description="New additional message or invitation content")
+
+class DeleteMeetingInput(IdempotentWrite):
+    event_id: str = Field(..., description="ID of the event to delete")
+
+class CheckMeetingAtTimeInput(MailboxSelection):
+    date: Date = Field(..., description="The date to check, in YYYY-MM-DD format.")
+    time: Time = Field(..., description="The time to check, in HH:MM 24-hour format.")
+    timezone: Optional[TimeZoneName] = Field("UTC", description="User's timezone for accurate calendar matching. Default is UTC.")
     window_minutes: Optional[int] = Field(15, description="Time window (in minutes) before and after the specified time to check for overlapping meetings. Default is 15.")
 
+class JobStatusInput(BaseModel):
+    job_id: str = Field(..., description="Job ID returned when a write was queued")
+    wait_seconds: float = Field(0, ge=0, le=30, description="Wait up to this many seconds for the job to finish before answering. Default is 0 (answer immediately).")
+
 class MeetingEvent(BaseModel):
     subject: str
     start: str
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+SSE_PING_INTERVAL = int(os.environ.get("SSE_PING_INTERVAL", 10))
+SSE_TOOLS_INTERVAL = int(os.environ.get("SSE_TOOLS_INTERVAL", 30))
+SSE_CLIENT_QUEUE_SIZE = int(os.environ.get("SSE_CLIENT_QUEUE_SIZE", 16))
+
+Frame = List[Dict[str, Any]]
+
+
+class SSEBroadcaster:
+    """Produces ping and tools frames once per tick and fans them out to every /mcp-events client.
+
+    Each client reads from its own bounded queue; a client whose queue is full
+    is disconnected rather than allowed to buffer without limit.
+    """
+
+    def __init__(self, tools_payload: Callable[[], str]):
+        self.tools_payload = tools_payload
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._tools_frame: Optional[Frame] = None
+        self._task: Optional[asyncio.Task] = None
+        self.dropped_clients = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.client_count,
+            "dropped": self.dropped_clients
+        }
+
+    def _build_tools_frame(self, now: float) -> Frame:
+        # Format tools event according to n8n-nodes-mcp requirements
+        return [
+            {
+                "event": "tools",
+                "data": self.tools_payload(),
+                "retry": 30000,
+                "id": str(int(now * 1000))
+            },
+            # Add an extra newline after tools event
+            {"data": ""}
+        ]
+
+    def _build_ping_frame(self, now: float) -> Frame:
+        return [
+            {
+                "event": "ping",
+                "data": datetime.utcfromtimestamp(now).isoformat(),
+                "retry": 30000,
+                "id": str(int(now * 1000))
+            },
+            # Add an extra newline after ping event
+            {"data": ""}
+        ]
+
+    def _publish(self, frame: Frame):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self._disconnect(queue)
+                self.dropped_clients += 1
+                logger.warning("Disconnected slow SSE client (queue full)")
+
+    def _disconnect(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        # Replace whatever is buffered with the end-of-stream marker
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def _run(self):
+        last_tools_sent = 0.0
+        while True:
+            try:
+                now = datetime.utcnow().timestamp()
+                if now - last_tools_sent >= SSE_TOOLS_INTERVAL:
+                    self._tools_frame = self._build_tools_frame(now)
+                    self._publish(self._tools_frame)
+                    last_tools_sent = now
+                self._publish(self._build_ping_frame(now))
+                logger.debug("Broadcast SSE ping to %d clients", self.client_count)
+            except Exception as e:
+                logger.error(f"Error in SSE broadcaster: {str(e)}")
+            await asyncio.sleep(SSE_PING_INTERVAL)
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        """Yield SSE events for one client until it disconnects or is dropped."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_CLIENT_QUEUE_SIZE)
+        # New clients get the tool catalog right away instead of waiting for the next broadcast
+        if self._tools_frame is None:
+            self._tools_frame = self._build_tools_frame(datetime.utcnow().timestamp())
+        queue.put_nowait(self._tools_frame)
+        self._subscribers.add(queue)
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    return
+                for event in frame:
+                    yield event
+        finally:
+            self._subscribers.discard(queue)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for queue in list(self._subscribers):
+            self._disconnect(queue)
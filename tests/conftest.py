@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Tests import the server's modules the way main.py does, from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Placeholder settings so modules that build clients at import time load; tests never reach Graph
+for name, value in {
+    "API_KEY": "test-key",
+    "MS_CLIENT_ID": "test-client",
+    "MS_CLIENT_SECRET": "test-secret",
+    "MS_TENANT_ID": "test-tenant",
+    "MS_USER_ID": "organizer@example.com"
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,184 @@
+import asyncio
+
+import pytest
+
+from tools.coalesce import SingleFlight
+from tools.shared_state import SharedStateStore
+
+
+def counting(value="result", delay=0.01):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return value
+    return fn, calls
+
+
+def test_concurrent_calls_share_one_run():
+    async def main():
+        flight = SingleFlight()
+        fn, calls = counting()
+        results = await asyncio.gather(*(flight.run("k", fn) for _ in range(5)))
+        assert results == ["result"] * 5
+        assert len(calls) == 1
+        assert flight.stats() == {"hits": 0, "shared": 4, "misses": 1}
+        # Without a ttl nothing is kept once the call is done
+        await flight.run("k", fn)
+        assert len(calls) == 2
+    asyncio.run(main())
+
+
+def test_ttl_keeps_results_until_expiry():
+    async def main():
+        flight = SingleFlight(ttl=0.05)
+        fn, calls = counting(delay=0)
+        await flight.run("k", fn)
+        await flight.run("k", fn)
+        assert len(calls) == 1
+        await asyncio.sleep(0.06)
+        await flight.run("k", fn)
+        assert len(calls) == 2
+    asyncio.run(main())
+
+
+def test_failures_are_not_cached():
+    async def main():
+        flight = SingleFlight(ttl=60)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("boom")
+            return "ok"
+        try:
+            await flight.run("k", flaky)
+        except RuntimeError:
+            pass
+        assert await flight.run("k", flaky) == "ok"
+        assert len(attempts) == 2
+    asyncio.run(main())
+
+
+def test_max_entries_evicts_oldest():
+    async def main():
+        flight = SingleFlight(ttl=60, max_entries=2)
+        fn, calls = counting(delay=0)
+        for key in ("a", "b", "c"):
+            await flight.run(key, fn)
+        await flight.run("a", fn)
+        assert len(calls) == 4
+        await flight.run("c", fn)
+        assert len(calls) == 4
+    asyncio.run(main())
+
+
+def test_invalidate_drops_results_and_in_flight_caching():
+    async def main():
+        flight = SingleFlight(ttl=60)
+        fn, calls = counting(delay=0.02)
+        await flight.run("k", fn)
+        flight.invalidate()
+        await flight.run("k", fn)
+        assert len(calls) == 2
+        # A call already running when invalidated returns its result but doesn't cache it
+        running = asyncio.ensure_future(flight.run("k2", fn))
+        await asyncio.sleep(0)
+        flight.invalidate()
+        await running
+        await flight.run("k2", fn)
+        assert len(calls) == 4
+    asyncio.run(main())
+
+
+
+@pytest.mark.parametrize("evict", [
+    lambda flight: flight.invalidate(),
+    lambda flight: flight.invalidate(lambda key: key == "k"),
+    lambda flight: flight.forget("k"),
+], ids=["all", "predicate", "forget"])
+def test_calls_after_an_eviction_do_not_join_earlier_ones(evict):
+    async def main():
+        flight = SingleFlight(ttl=60)
+        state = {"value": "before-write"}
+        calls = []
+
+        async def read():
+            calls.append(1)
+            value = state["value"]
+            await asyncio.sleep(0.02)
+            return value
+        first = asyncio.ensure_future(flight.run("k", read))
+        await asyncio.sleep(0.005)
+        state["value"] = "after-write"
+        evict(flight)
+        assert await flight.run("k", read) == "after-write"
+        assert len(calls) == 2
+        assert await first == "before-write"
+        # Only the fresh result was cached
+        assert await flight.run("k", read) == "after-write"
+        assert len(calls) == 2
+    asyncio.run(main())
+
+def test_invalidate_predicate_only_touches_matching_keys():
+    async def main():
+        flight = SingleFlight(ttl=60)
+        fn, calls = counting(delay=0.02)
+        await flight.run(("a", 1), fn)
+        await flight.run(("b", 1), fn)
+        running = asyncio.ensure_future(flight.run(("a", 2), fn))
+        await asyncio.sleep(0)
+        flight.invalidate(lambda key: key[0] == "a")
+        await running
+        assert len(calls) == 3
+        await flight.run(("b", 1), fn)
+        assert len(calls) == 3
+        await flight.run(("a", 1), fn)
+        await flight.run(("a", 2), fn)
+        assert len(calls) == 5
+    asyncio.run(main())
+
+
+def test_shared_store_runs_once_across_workers(tmp_path):
+    path = str(tmp_path / "shared.db")
+    stores = [SharedStateStore(path, worker_id=f"worker-{i}") for i in range(2)]
+
+    async def main():
+        flights = [SingleFlight(ttl=60, store=store, namespace="reads") for store in stores]
+        fn, calls = counting(delay=0.1)
+        results = await asyncio.gather(*(flight.run("k", fn) for flight in flights))
+        assert results == ["result"] * 2
+        # The second worker waited on the first one's lease and read its stored result
+        assert len(calls) == 1
+        assert await flights[1].run("k", fn) == "result"
+        assert len(calls) == 1
+        # Invalidation in one worker reaches the other
+        flights[0].invalidate(lambda key: key == "k")
+        await flights[0].flush()
+        await flights[1].run("k", fn)
+        assert len(calls) == 2
+    try:
+        asyncio.run(main())
+    finally:
+        for store in stores:
+            store.close()
+
+
+def test_shared_store_skips_results_invalidated_in_flight(tmp_path):
+    store = SharedStateStore(str(tmp_path / "shared.db"))
+
+    async def main():
+        flight = SingleFlight(ttl=60, store=store, namespace="reads")
+        fn, calls = counting(delay=0.05)
+        task = asyncio.ensure_future(flight.run("k", fn))
+        await asyncio.sleep(0.02)
+        flight.invalidate()
+        await task
+        await flight.run("k", fn)
+        assert len(calls) == 2
+    try:
+        asyncio.run(main())
+    finally:
+        store.close()
@@ -0,0 +1,53 @@
+import asyncio
+
+from tools.graph_throttle import GraphThrottle
+from tools.microsoft_calendar import MicrosoftCalendarClient
+
+
+class Response:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def batching_client():
+    """A pooled-style client whose Graph requests are answered without a network; records each $batch."""
+    client = MicrosoftCalendarClient(user_id="organizer@example.com", tenant_id="tenant", credential=object())
+    client.envelopes = []
+
+    async def send_request(method, path, json=None, **kwargs):
+        assert (method, path) == ("POST", "/$batch")
+        client.envelopes.append(json["requests"])
+        return Response({"responses": [{"id": r["id"], "status": 200, "body": {"url": r["url"]}}
+                                       for r in json["requests"]]})
+    client._send_request = send_request
+    return client
+
+
+def test_concurrent_requests_fill_one_batch():
+    async def main():
+        client = batching_client()
+        paths = [f"/users/person{i % 3}@example.com/calendarView?d={i}" for i in range(20)]
+        async with client.batch():
+            responses = await asyncio.gather(*(client._graph_request("GET", path) for path in paths))
+        # More sub-requests than one mailbox's concurrency cap or burst, still one $batch
+        assert len(client.envelopes) == 1
+        assert len(client.envelopes[0]) == 20
+        assert [r.json()["url"] for r in responses] == paths
+    asyncio.run(main())
+
+
+def test_envelope_takes_a_token_per_sub_request_from_each_mailbox():
+    async def main():
+        throttle = GraphThrottle()
+        async with throttle.envelope(("t", "me"), {("t", "a"): 3, ("t", "b"): 1}):
+            pass
+        a, b = throttle.limiter(("t", "a")), throttle.limiter(("t", "b"))
+        assert b.burst - b._tokens <= 1.01
+        assert a._tokens < b._tokens
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+from tools.graph_subscriptions import RELAY_CHANNEL, SubscriptionManager
+from tools.shared_state import Leadership
+
+
+class RecordingStore:
+    def __init__(self):
+        self.relayed = []
+
+    def relay(self, channel, body):
+        self.relayed.append((channel, body))
+
+
+def follower():
+    store = RecordingStore()
+    leader = Leadership(store)
+    return SubscriptionManager("https://example.com/graph/notifications", client_state="secret",
+                               store=store, leader=leader), store
+
+
+def test_follower_relays_only_checked_notifications():
+    manager, store = follower()
+    payload = {"value": [
+        {"subscriptionId": "sub", "clientState": "secret", "changeType": "updated",
+         "resourceData": {"id": "event", "@odata.etag": "W/1"}, "extra": "x" * 100},
+        {"subscriptionId": "sub", "clientState": "guess", "changeType": "updated"},
+        {"subscriptionId": "sub", "changeType": "updated"},
+        {"subscriptionId": "sub", "clientState": "secret"},
+        {"subscriptionId": ["sub"], "clientState": "secret", "changeType": "updated"},
+        "not a notification"
+    ]}
+    assert manager.accept(payload) == 1
+    assert store.relayed == [(RELAY_CHANNEL, {"value": [
+        {"subscriptionId": "sub", "clientState": "secret", "changeType": "updated", "resourceData": {"id": "event"}}
+    ]})]
+
+
+def test_follower_relays_nothing_without_the_client_state():
+    manager, store = follower()
+    assert manager.accept({"value": [{"subscriptionId": "sub", "changeType": "deleted"}]}) == 0
+    assert store.relayed == []
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from tools import graph_throttle
+from tools.graph_throttle import GraphThrottle, RateLimiter
+from tools.graph_transport import GraphAPIError
+
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture(autouse=True)
+def quick_retries(monkeypatch):
+    monkeypatch.setattr(graph_throttle, "RETRY_BASE_DELAY", 0.001)
+
+
+def test_rate_limiter_paces_beyond_the_burst():
+    async def main():
+        loop = asyncio.get_running_loop()
+        limiter = RateLimiter(rate=100, burst=2, concurrency=0)
+        started = loop.time()
+        for _ in range(6):
+            await limiter.acquire(started + 5)
+        # Two from the burst, four more at 100/s
+        assert loop.time() - started >= 0.035
+    asyncio.run(main())
+
+
+def test_rate_limiter_refuses_waits_past_the_deadline():
+    async def main():
+        limiter = RateLimiter(rate=1, burst=1, concurrency=0)
+        now = asyncio.get_running_loop().time()
+        await limiter.acquire(now + 5)
+        with pytest.raises(GraphAPIError) as excinfo:
+            await limiter.acquire(now + 0.5)
+        assert excinfo.value.status_code == 429
+        assert excinfo.value.retry_after == pytest.approx(1, abs=0.05)
+    asyncio.run(main())
+
+
+def test_rate_limiter_aimd():
+    async def main():
+        limiter = RateLimiter(rate=10, burst=5, concurrency=0)
+        limiter.on_throttle()
+        assert limiter.rate == pytest.approx(10 * graph_throttle.RATE_DECREASE)
+        # Throttles within the cooldown count as one
+        limiter.on_throttle()
+        assert limiter.rate == pytest.approx(10 * graph_throttle.RATE_DECREASE)
+        decreased = limiter.rate
+        limiter.on_success()
+        assert limiter.rate == pytest.approx(decreased + graph_throttle.RATE_STEP / decreased)
+        limiter.rate = graph_throttle.GRAPH_RATE_MAX
+        limiter.on_success()
+        assert limiter.rate == graph_throttle.GRAPH_RATE_MAX
+    asyncio.run(main())
+
+
+def test_call_retries_throttled_responses():
+    async def main():
+        throttle = GraphThrottle()
+        statuses = [429, 503, 200]
+
+        async def send():
+            return Response(statuses.pop(0), {"Retry-After": "0"})
+        response = await throttle.call(("t", "m"), "GET", send)
+        assert response.status_code == 200
+        assert statuses == []
+    asyncio.run(main())
+
+
+def test_call_does_not_retry_writes_after_transport_errors():
+    import httpx
+
+    async def main():
+        throttle = GraphThrottle()
+        attempts = []
+
+        async def send():
+            attempts.append(1)
+            raise httpx.ConnectError("down")
+        with pytest.raises(httpx.ConnectError):
+            await throttle.call(("t", "m"), "POST", send)
+        assert len(attempts) == 1
+    asyncio.run(main())
+
+
+def test_call_caps_concurrency_per_mailbox(monkeypatch):
+    monkeypatch.setattr(graph_throttle, "GRAPH_MAILBOX_CONCURRENCY", 2)
+
+    async def main():
+        throttle = GraphThrottle()
+        limiter = throttle.limiter(("t", "m"))
+        limiter.slots = asyncio.Semaphore(2)
+        running, peak = 0, 0
+
+        async def send():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return Response(200)
+        await asyncio.gather(*(throttle.call(("t", "m"), "GET", send) for _ in range(6)))
+        assert peak == 2
+        # Unpaced calls (sub-requests riding a $batch) don't hold slots
+        running, peak = 0, 0
+        await asyncio.gather(*(throttle.call(("t", "m"), "GET", send, paced=False) for _ in range(6)))
+        assert peak == 6
+    asyncio.run(main())
+
+
+def test_rate_limiter_splits_the_budget_across_workers():
+    async def main():
+        limiter = RateLimiter(rate=15, burst=10, concurrency=4, workers=3)
+        assert limiter.rate == pytest.approx(5)
+        assert limiter.burst == pytest.approx(10 / 3)
+        # 4 // 3 concurrent requests per worker
+        await limiter.slots.acquire()
+        assert limiter.slots.locked()
+        limiter.on_success()
+        assert limiter.rate == pytest.approx(5 + graph_throttle.RATE_STEP / 3 / 5)
+        limiter.rate = graph_throttle.GRAPH_RATE_MAX
+        limiter.on_success()
+        assert limiter.rate == pytest.approx(graph_throttle.GRAPH_RATE_MAX / 3)
+        # More workers than the cap still leaves each worker one request at a time
+        assert not RateLimiter(concurrency=4, workers=8).slots.locked()
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("method,replayable,statuses,attempts", [
+    ("POST", None, [503, 201], 1),
+    ("POST", None, [429, 201], 2),
+    ("POST", True, [503, 201], 2),
+    ("GET", None, [503, 200], 2),
+])
+def test_call_only_repeats_requests_that_are_safe_to_repeat(method, replayable, statuses, attempts):
+    async def main():
+        throttle = GraphThrottle()
+        sent = []
+
+        async def send():
+            sent.append(1)
+            return Response(statuses[len(sent) - 1], {"Retry-After": "0"})
+        response = await throttle.call(("t", "m"), method, send, replayable=replayable)
+        assert len(sent) == attempts
+        assert response.status_code == statuses[attempts - 1]
+    asyncio.run(main())
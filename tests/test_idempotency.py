@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from tools.idempotency import IdempotencyCache, IdempotencyConflict
+
+
+def test_retries_replay_the_first_result():
+    async def main():
+        cache = IdempotencyCache(ttl=60)
+        calls = []
+
+        async def create():
+            calls.append(1)
+            return {"id": len(calls)}
+        params = {"subject": "Sync", "start": "2025-05-01T10:00:00Z"}
+        first = await cache.run("key", params, create)
+        assert await cache.run("key", dict(params), create) == first
+        assert len(calls) == 1
+    asyncio.run(main())
+
+
+def test_reused_key_with_other_parameters_conflicts():
+    async def main():
+        cache = IdempotencyCache(ttl=60)
+
+        async def create():
+            return {"id": 1}
+        await cache.run("key", {"subject": "Sync"}, create)
+        with pytest.raises(IdempotencyConflict):
+            await cache.run("key", {"subject": "Other"}, create)
+    asyncio.run(main())
+
+
+def test_failed_calls_run_again():
+    async def main():
+        cache = IdempotencyCache(ttl=60)
+        attempts = []
+
+        async def create():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("Graph said no")
+            return {"id": 2}
+        with pytest.raises(RuntimeError):
+            await cache.run("key", {"subject": "Sync"}, create)
+        assert await cache.run("key", {"subject": "Sync"}, create) == {"id": 2}
+    asyncio.run(main())
+
+
+def test_forget_lets_the_key_run_again():
+    async def main():
+        cache = IdempotencyCache(ttl=60)
+        calls = []
+
+        async def submit():
+            calls.append(1)
+            return {"job_id": f"job-{len(calls)}"}
+        assert await cache.run("key", {"subject": "Sync"}, submit) == {"job_id": "job-1"}
+        # The queued job failed: a retry must queue the write again rather than replay job-1
+        cache.forget("key")
+        assert await cache.run("key", {"subject": "Sync"}, submit) == {"job_id": "job-2"}
+        assert await cache.run("key", {"subject": "Sync"}, submit) == {"job_id": "job-2"}
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from tools import microsoft_calendar
+from tools.microsoft_calendar import CalendarClientPool, MicrosoftCalendarClient
+
+
+def default_client():
+    return MicrosoftCalendarClient(user_id="organizer@example.com", tenant_id="tenant", credential=object())
+
+
+def test_only_the_default_mailbox_is_allowed_by_default():
+    pool = CalendarClientPool(default_client())
+    assert pool.get("Organizer@example.com") is pool.default
+    with pytest.raises(ValueError, match="not allowed"):
+        pool.get("someone.else@example.com")
+
+
+def test_allowed_mailboxes_are_opt_in(monkeypatch):
+    monkeypatch.setattr(microsoft_calendar, "MS_ALLOWED_MAILBOXES", "*@example.com")
+    pool = CalendarClientPool(default_client())
+    assert pool.get("someone.else@example.com").user_id == "someone.else@example.com"
+    with pytest.raises(ValueError, match="not allowed"):
+        pool.get("someone@elsewhere.com")
+
+
+def test_unlisted_mailbox_is_a_bad_request():
+    tool, params = main.validate_tool_call("check_availability", {
+        "start_time": "2025-05-12T09:00:00Z",
+        "end_time": "2025-05-12T17:00:00Z",
+        "mailbox": "someone.else@example.com"
+    })
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(main.run_tool("check_availability", tool, params))
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,31 @@
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def test_writes_run_immediately_unless_asked_to_queue():
+    assert main.should_enqueue("create_meeting", {"async": True})
+    assert not main.should_enqueue("create_meeting", {})
+    assert not main.should_enqueue("check_availability", {"async": True})
+
+
+def test_queued_writes_are_refused_with_several_workers(monkeypatch):
+    monkeypatch.setattr(main, "WEB_CONCURRENCY", 3)
+    assert not main.should_enqueue("create_meeting", {})
+    with pytest.raises(HTTPException) as excinfo:
+        main.should_enqueue("create_meeting", {"async": True})
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.parametrize("flag", ["false", "0", 1, "yes"])
+def test_async_flag_must_be_a_boolean(flag):
+    with pytest.raises(HTTPException) as excinfo:
+        main.should_enqueue("create_meeting", {"async": flag})
+    assert excinfo.value.status_code == 400
+
+
+def test_async_false_opts_out_of_async_writes(monkeypatch):
+    monkeypatch.setattr(main, "ASYNC_WRITES", True)
+    assert main.should_enqueue("create_meeting", {})
+    assert not main.should_enqueue("create_meeting", {"async": False})
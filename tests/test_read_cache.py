@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from schemas.calendar_schemas import AvailabilityInput, GroupAvailabilityInput
+from tools.coalesce import SingleFlight
+from tools.microsoft_calendar import MicrosoftCalendarClient, read_affected
+
+START = datetime(2025, 5, 12, 9, tzinfo=timezone.utc)
+END = datetime(2025, 5, 12, 17, tzinfo=timezone.utc)
+
+
+def pooled_clients(*mailboxes):
+    """Clients sharing one read cache, as CalendarClientPool builds them; each answers with its own name."""
+    reads = SingleFlight(ttl=60)
+    clients = []
+    for tenant_id, user_id in mailboxes:
+        client = MicrosoftCalendarClient(user_id=user_id, tenant_id=tenant_id, credential=object(), reads=reads)
+        client.calls = 0
+
+        async def busy_times(start_dt, end_dt, tz, client=client):
+            client.calls += 1
+            return {"owner": f"{client.tenant_id}/{client.user_id}"}
+        client._busy_times = busy_times
+        clients.append(client)
+    return clients
+
+
+def availability(client):
+    return client.check_availability(AvailabilityInput(start_time=START, end_time=END, timezone="UTC"))
+
+
+def test_same_upn_in_two_tenants_is_cached_apart():
+    async def main():
+        contoso, fabrikam = pooled_clients(("contoso", "alex@example.com"), ("fabrikam", "alex@example.com"))
+        assert (await availability(contoso))["owner"] == "contoso/alex@example.com"
+        assert (await availability(fabrikam))["owner"] == "fabrikam/alex@example.com"
+    asyncio.run(main())
+
+
+def test_a_write_only_evicts_its_own_mailbox():
+    async def main():
+        alex, sam, other_alex = pooled_clients(("contoso", "Alex@example.com"), ("contoso", "sam@example.com"),
+                                               ("fabrikam", "alex@example.com"))
+        for client in (alex, sam, other_alex):
+            await availability(client)
+        await alex._invalidate_reads()
+        for client in (alex, sam, other_alex):
+            await availability(client)
+        assert (alex.calls, sam.calls, other_alex.calls) == (2, 1, 1)
+    asyncio.run(main())
+
+
+def test_read_affected_matches_tenant_mailbox_and_range():
+    key = ("availability", "contoso", "Alex@example.com", START, END, "UTC")
+    inside = [(START.timestamp() + 3600, START.timestamp() + 7200)]
+    outside = [(END.timestamp(), END.timestamp() + 3600)]
+    assert read_affected(key, "contoso", "alex@example.com", None)
+    assert read_affected(key, "contoso", "alex@example.com", inside)
+    assert not read_affected(key, "contoso", "alex@example.com", outside)
+    assert not read_affected(key, "fabrikam", "alex@example.com", None)
+    schedule = ("schedule", "contoso", "organizer@example.com", ("alex@example.com", "sam@example.com"),
+                START, END, "UTC", True)
+    assert read_affected(schedule, "contoso", "sam@example.com", inside)
+    assert not read_affected(schedule, "contoso", "organizer@example.com", None)
+
+
+def test_invalid_parameters_are_not_wrapped():
+    async def main():
+        client, = pooled_clients(("contoso", "alex@example.com"))
+        with pytest.raises(ValueError, match="At least one attendee"):
+            await client.check_group_availability(
+                GroupAvailabilityInput(attendees=[" "], start_time=START, end_time=END))
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+import glob
+import json
+import os
+
+import pytest
+
+from tools.recurrence import RecurrenceError, Series, expand
+from tools.timeutil import to_utc
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "benchmarks", "fixtures", "recurrence")
+
+
+def summary(event: dict) -> tuple:
+    return (event["start"]["dateTime"][:19], event["end"]["dateTime"][:19],
+            event.get("subject", ""), event.get("type", ""))
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(FIXTURES, "*.json"))),
+                         ids=lambda path: os.path.basename(path)[:-5])
+def test_expansion_matches_graph(path):
+    with open(path) as f:
+        fixture = json.load(f)
+    start, end = to_utc(fixture["window"]["startDateTime"]), to_utc(fixture["window"]["endDateTime"])
+    local = [summary(event) for event in expand([Series(fixture["seriesMaster"])], start, end)]
+    assert local == sorted(summary(event) for event in fixture["instances"])
+
+
+def test_unsupported_pattern_is_rejected():
+    master = {"id": "x", "recurrence": {"pattern": {"type": "hourly"}, "range": {}}}
+    with pytest.raises(RecurrenceError):
+        Series(master)
@@ -0,0 +1,121 @@
+from datetime import datetime, time
+
+import pytest
+
+from tools import slot_search
+from tools.intervals import clip_intervals, free_intervals, merge_intervals
+from tools.slot_search import find_slots, merge_busy, working_windows
+from tools.timeutil import get_zone
+
+HOUR = 3600
+
+
+def test_merge_intervals():
+    assert merge_intervals([(5, 7), (1, 3), (2, 4), (4, 4.5), (9, 8), (10, 12)]) == [(1, 4.5), (5, 7), (10, 12)]
+    assert merge_intervals([]) == []
+
+
+def test_clip_and_free_intervals():
+    busy = merge_intervals([(2, 4), (6, 8)])
+    assert clip_intervals(busy, 3, 7) == [(3, 4), (6, 7)]
+    assert free_intervals(busy, 0, 10) == [(0, 2), (4, 6), (8, 10)]
+    assert free_intervals(busy, 2, 8) == [(4, 6)]
+
+
+def test_working_windows_follow_local_days_and_dst():
+    tz = get_zone("America/New_York")
+    # Friday before the March 2025 DST change to the Tuesday after
+    start = datetime(2025, 3, 7, tzinfo=tz).timestamp()
+    end = datetime(2025, 3, 12, tzinfo=tz).timestamp()
+    windows = working_windows(start, end, tz, time(9), time(17), set(range(5)))
+    local = [datetime.fromtimestamp(ws, tz).strftime("%a %H:%M") for ws, _ in windows]
+    assert local == ["Fri 09:00", "Mon 09:00", "Tue 09:00"]
+    assert all(we - ws == 8 * HOUR for ws, we in windows)
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if slot_search._numpy() is None:
+            pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(slot_search, "_numpy", lambda: None)
+    return request.param
+
+
+def test_find_slots_ranks_by_buffer_then_start(backend):
+    day = 100 * 86400.0
+    windows = [(day + 9 * HOUR, day + 17 * HOUR)]
+    busy = merge_intervals([(day + 10 * HOUR, day + 11 * HOUR), (day + 13 * HOUR, day + 15 * HOUR)])
+    slots = find_slots(busy, windows, HOUR, HOUR / 2, 10)
+    starts = [(s - day) / HOUR for s, _, _ in slots]
+    # Slots clear of meetings by 30 minutes or more come first, earliest first; none overlap each other or busy time
+    assert starts[:2] == [11.5, 15.5]
+    for s, e, _ in slots:
+        assert all(e <= bs or s >= be for bs, be in busy)
+    for (s1, e1, _), (s2, e2, _) in zip(slots, slots[1:]):
+        assert e1 <= s2 or e2 <= s1
+    assert [score for _, _, score in slots] == sorted((score for _, _, score in slots), reverse=True)
+
+
+def test_merge_busy_matches_clip_then_merge(backend):
+    busy = [(5, 7), (1, 3), (2, 4), (4, 4.5), (9, 8), (10, 12), (-3, 0.5), (11, 30), (30, 31)]
+    assert merge_busy(busy, 0, 20) == merge_intervals(clip_intervals(busy, 0, 20)) == [
+        (0, 0.5), (1, 4.5), (5, 7), (10, 20)
+    ]
+    assert merge_busy([], 0, 20) == []
+    assert merge_busy([(25, 30)], 0, 20) == []
+
+
+def test_working_windows_resolve_times_in_a_dst_gap():
+    tz = get_zone("America/New_York")
+    start = datetime(2025, 3, 9, tzinfo=tz).timestamp()
+    # 02:30 does not exist on the day clocks spring forward; it resolves as an aware datetime's timestamp() does
+    windows = working_windows(start, start + 86400, tz, time(2, 30), time(17), {6})
+    assert windows == [
+        (datetime(2025, 3, 9, 2, 30, tzinfo=tz).timestamp(), datetime(2025, 3, 9, 17, tzinfo=tz).timestamp())
+    ]
+
+
+def test_find_slots_backends_agree(monkeypatch):
+    if slot_search._numpy() is None:
+        pytest.skip("numpy not installed")
+    tz = get_zone("America/New_York")
+    start = datetime(2025, 1, 6, tzinfo=tz).timestamp()
+    windows = working_windows(start, start + 14 * 86400, tz, time(9), time(17), set(range(5)))
+    busy = merge_intervals([(start + i * 5400 + 9 * HOUR, start + i * 5400 + 10 * HOUR) for i in range(200)])
+    with_numpy = find_slots(busy, windows, 45 * 60, 15 * 60, 20)
+    monkeypatch.setattr(slot_search, "_numpy", lambda: None)
+    assert find_slots(busy, windows, 45 * 60, 15 * 60, 20) == with_numpy
+
+
+def test_find_slots_empty_inputs():
+    assert find_slots([], [], HOUR, HOUR, 5) == []
+    assert find_slots([], [(0, HOUR)], 2 * HOUR, HOUR, 5) == []
+    assert find_slots([], [(0, HOUR)], HOUR, HOUR, 0) == []
+
+
+@pytest.mark.parametrize("zone,step_minutes", [
+    ("Asia/Kolkata", 60),
+    ("Asia/Kolkata", 45),
+    ("Asia/Kathmandu", 30),
+    ("America/St_Johns", 60),
+])
+def test_grid_follows_local_working_hours(backend, zone, step_minutes):
+    tz = get_zone(zone)
+    start = datetime(2025, 5, 5, tzinfo=tz).timestamp()
+    windows = working_windows(start, start + 86400, tz, time(9), time(17), set(range(5)))
+    slots = find_slots([], windows, HOUR, step_minutes * 60, 20)
+    opening = datetime(2025, 5, 5, 9, tzinfo=tz).timestamp()
+    starts = sorted(s for s, _, _ in slots)
+    # 09:00-10:00 local is offered, and every start sits on the grid counted from 09:00 local
+    assert starts[0] == opening
+    assert all((s - opening) % (step_minutes * 60) == 0 for s in starts)
+
+
+def test_grid_starts_at_a_clipped_request_start(backend):
+    tz = get_zone("Asia/Kolkata")
+    start = datetime(2025, 5, 5, 10, 20, tzinfo=tz).timestamp()
+    windows = working_windows(start, start + 8 * HOUR, tz, time(9), time(17), set(range(5)))
+    slots = find_slots([], windows, HOUR, HOUR, 20)
+    assert min(datetime.fromtimestamp(s, tz).strftime("%H:%M") for s, _, _ in slots) == "10:20"
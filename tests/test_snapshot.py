@@ -0,0 +1,17 @@
+import os
+import stat
+
+from tools.snapshot import SnapshotStore
+
+
+def test_snapshot_file_is_private(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    store = SnapshotStore(path)
+    try:
+        store.save_catalog("fingerprint", "[]")
+        assert store.load_catalog("fingerprint") == "[]"
+        for name in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(name):
+                assert stat.S_IMODE(os.stat(name).st_mode) == 0o600, name
+    finally:
+        store.close()
@@ -0,0 +1,43 @@
+import asyncio
+
+import main
+from tools.microsoft_calendar import calendar_client
+from tools.write_queue import WriteQueue
+
+CREATE = {
+    "title": "Sync",
+    "start_time": "2025-05-12T10:00:00Z",
+    "end_time": "2025-05-12T10:30:00Z",
+    "idempotency_key": "retry-me"
+}
+
+
+def test_omitted_and_explicit_defaults_share_a_key():
+    _, implicit = main.validate_tool_call("create_meeting", CREATE)
+    _, explicit = main.validate_tool_call("create_meeting", dict(
+        CREATE, mailbox=calendar_client.user_id.upper(), tenant_id=calendar_client.tenant_id))
+    assert main.idempotency_scope(implicit) == main.idempotency_scope(explicit)
+
+
+def test_failed_queued_write_can_be_retried(monkeypatch):
+    async def run():
+        queue = WriteQueue(workers=1)
+        monkeypatch.setattr(main, "write_queue", queue)
+        attempts = []
+
+        async def failing_tool(tool_name, tool, params):
+            attempts.append(1)
+            raise RuntimeError("Graph said no")
+        monkeypatch.setattr(main, "run_tool", failing_tool)
+        await queue.start()
+        try:
+            first = await main.enqueue_tool("create_meeting", CREATE)
+            await queue.wait(first["job_id"], timeout=5)
+            assert queue.get(first["job_id"]).status == "failed"
+            second = await main.enqueue_tool("create_meeting", CREATE)
+            assert second["job_id"] != first["job_id"]
+            await queue.wait(second["job_id"], timeout=5)
+            assert len(attempts) == 2
+        finally:
+            await queue.aclose()
+    asyncio.run(run())
@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from tools.graph_transport import GraphAPIError
+from tools.intervals import event_epoch
+from tools.invalidation import invalidation_bus
+from tools.snapshot import CALENDAR_SNAPSHOT_MAX_AGE, SnapshotStore
+from tools.shared_state import leadership
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+CALENDAR_MIRROR = os.environ.get("CALENDAR_MIRROR", "false").lower() == "true"
+MIRROR_DAYS_BACK = int(os.environ.get("CALENDAR_MIRROR_DAYS_BACK", 7))
+MIRROR_DAYS_AHEAD = int(os.environ.get("CALENDAR_MIRROR_DAYS_AHEAD", 60))
+MIRROR_SYNC_INTERVAL = int(os.environ.get("CALENDAR_MIRROR_SYNC_INTERVAL", 30))
+MIRROR_MAX_STALENESS = int(os.environ.get("CALENDAR_MIRROR_MAX_STALENESS", 120))
+MIRROR_PAGE_SIZE = 100
+# Seconds between a follower worker's checks for a newer round saved by the leader
+MIRROR_FOLLOW_INTERVAL = 1.0
+
+
+class IntervalIndex:
+    """Immutable index of (start, end, event) intervals answering overlap queries by bisection."""
+
+    def __init__(self, items: List[Tuple[float, float, dict]]):
+        self._items = sorted(items, key=lambda item: item[0])
+        self._starts = [item[0] for item in self._items]
+        # Any interval overlapping a query must start no earlier than query start minus the longest span
+        self._max_span = max((end - start for start, end, _ in self._items), default=0)
+
+    def __len__(self):
+        return len(self._items)
+
+    def overlapping(self, start: float, end: float) -> List[dict]:
+        """Events with start < end and end > start, ordered by start time."""
+        lo = bisect_left(self._starts, start - self._max_span)
+        hi = bisect_left(self._starts, end)
+        return [event for s, e, event in self._items[lo:hi] if e > start]
+
+
+class CalendarMirror:
+    """In-memory copy of a rolling calendar window, kept current with calendarView delta queries.
+
+    With a snapshot store, each round is also saved to disk and a restarted
+    process resumes from the saved events and delta link: reads are served
+    at once while the first sync catches up with what changed meanwhile.
+
+    With several worker processes only the leader runs delta queries; the
+    others follow the rounds it saves to the snapshot, and stop answering
+    from their copy as soon as a newer round has been saved: they call
+    check() before covers(), which itself never touches the snapshot.
+    """
+
+    def __init__(self, client, snapshot: Optional[SnapshotStore] = None):
+        self.client = client
+        self.snapshot = snapshot
+        self._events: Dict[str, Tuple[float, float, dict]] = {}
+        self._index = IntervalIndex([])
+        self._delta_link: Optional[str] = None
+        self._anchor: Optional[datetime] = None
+        self.window_start = 0.0
+        self.window_end = 0.0
+        self.last_sync = 0.0
+        # Serving a restored snapshot that hasn't caught up with Graph yet
+        self._restored = False
+        # Snapshot revision this copy was loaded from, when following another worker's rounds
+        self._revision: Optional[int] = None
+        # (revision, synced_at) of the saved round, as of a follower's last check()
+        self._saved: Optional[Tuple[int, float]] = None
+        # Resolved by the next lookup to start; callers arriving meanwhile share it
+        self._next_check: Optional[asyncio.Future] = None
+        self._checker: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        """Whether the mirror is fresh and the whole range lies inside the mirrored window."""
+        if not leadership.is_leader:
+            if self._saved is None or self._saved[0] != self._revision:
+                return False
+            self.last_sync = self._saved[1]
+        max_staleness = CALENDAR_SNAPSHOT_MAX_AGE if self._restored else MIRROR_MAX_STALENESS
+        return (
+            self._delta_link is not None
+            and time.time() - self.last_sync <= max_staleness
+            and self.window_start <= start.timestamp()
+            and end.timestamp() <= self.window_end
+        )
+
+    def query(self, start: datetime, end: datetime) -> List[dict]:
+        """Mirrored Graph events overlapping the range, in calendarView shape."""
+        return self._index.overlapping(start.timestamp(), end.timestamp())
+
+    def event_range(self, event_id: str) -> Optional[Tuple[float, float]]:
+        """(start, end) epoch seconds of a mirrored event, or None if it isn't in the window."""
+        span = self._events.get(event_id)
+        return span[:2] if span is not None else None
+
+    async def sync(self):
+        """Apply pending changes, re-seeding when the window has rolled over or the delta link expired."""
+        async with self._lock:
+            today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            if self._delta_link is None or self._anchor != today:
+                await self._seed(today)
+                return
+            events = dict(self._events)
+            changed: Set[str] = set()
+            delta_link = await self._run_delta(self._delta_link, None, events, changed)
+            if delta_link is None:
+                # Sync state expired on the Graph side; start over
+                await self._seed(today)
+                return
+            # Spans the changed events had before and after this round
+            ranges = [span[:2] for event_id in changed for span in (self._events.get(event_id), events.get(event_id))
+                      if span is not None]
+            self._publish(events, delta_link)
+            # Saved first, so other workers stop serving their copy before the cached reads go
+            await self._save(changed)
+            if ranges:
+                # Reads cached from the previous round would otherwise outlive it
+                invalidation_bus.publish(self.client.tenant_id, self.client.user_id, ranges)
+
+    async def _seed(self, anchor: datetime):
+        start = anchor - timedelta(days=MIRROR_DAYS_BACK)
+        end = anchor + timedelta(days=MIRROR_DAYS_AHEAD)
+        params = {
+            "startDateTime": start.isoformat(),
+            "endDateTime": end.isoformat()
+        }
+        events: Dict[str, Tuple[float, float, dict]] = {}
+        delta_link = await self._run_delta(f"/users/{self.client.user_id}/calendarView/delta", params, events)
+        if delta_link is None:
+            raise Exception("Calendar mirror seed failed: sync state rejected by Graph")
+        self._anchor = anchor
+        self.window_start = start.timestamp()
+        self.window_end = end.timestamp()
+        self._publish(events, delta_link)
+        logger.info(f"Calendar mirror seeded with {len(events)} events ({start.date()} to {end.date()})")
+        await self._save(None)
+
+    async def _run_delta(self, url: str, params: Optional[dict], events: dict,
+                         changed: Optional[Set[str]] = None) -> Optional[str]:
+        """Follow a delta round to its deltaLink, applying changes to events (and noting their ids in changed).
+        Returns None on 410 Gone."""
+        delta_link = None
+        try:
+            async for page in self.client._iter_pages(url, params, MIRROR_PAGE_SIZE):
+                for item in page.get("value", []):
+                    if changed is not None:
+                        changed.add(item["id"])
+                    if "@removed" in item:
+                        events.pop(item["id"], None)
+                    else:
+                        events[item["id"]] = (event_epoch(item["start"]), event_epoch(item["end"]), item)
+                delta_link = page.get("@odata.deltaLink")
+        except GraphAPIError as e:
+            if e.status_code == 410:
+                return None
+            raise
+        return delta_link
+
+    def _publish(self, events: dict, delta_link: str):
+        # Swap in a fresh index so concurrent readers never see a half-applied round
+        self._events = events
+        self._index = IntervalIndex(list(events.values()))
+        self._delta_link = delta_link
+        self.last_sync = time.time()
+        self._restored = False
+
+    @property
+    def _mailbox(self) -> str:
+        return f"{self.client.tenant_id}/{self.client.user_id.lower()}"
+
+    async def _save(self, changed: Optional[Set[str]]):
+        """Write the round just published to the snapshot: the changed events, or all of them after a seed."""
+        if self.snapshot is None:
+            return
+        state = {
+            "delta_link": self._delta_link,
+            "anchor": self._anchor.timestamp(),
+            "window_start": self.window_start,
+            "window_end": self.window_end,
+            "synced_at": self.last_sync
+        }
+        try:
+            await self.snapshot.save_mirror(self._mailbox, state, self._events, changed)
+        except Exception as e:
+            logger.warning(f"Calendar snapshot write failed: {str(e)}")
+
+    async def _restore(self, restored: bool = True):
+        """Load the last saved round, if any, so reads are served before the first sync completes.
+        A follower passes restored=False: what it loads is the leader's current round."""
+        try:
+            state = await self.snapshot.load_mirror(self._mailbox)
+        except Exception as e:
+            logger.warning(f"Calendar snapshot could not be read: {str(e)}")
+            return
+        if state is None:
+            return
+        self._events = state["events"]
+        self._index = IntervalIndex(list(self._events.values()))
+        self._delta_link = state["delta_link"]
+        self._anchor = datetime.fromtimestamp(state["anchor"], timezone.utc)
+        self.window_start = state["window_start"]
+        self.window_end = state["window_end"]
+        self.last_sync = state["synced_at"]
+        self._revision = state["revision"]
+        self._restored = restored
+        if restored:
+            logger.info(f"Calendar mirror restored {len(self._events)} events from a snapshot "
+                        f"{time.time() - self.last_sync:.0f}s old")
+
+    async def _sync_loop(self):
+        while True:
+            # Cleared before the round, so a change notified while it runs triggers another
+            self._wake.clear()
+            interval = MIRROR_SYNC_INTERVAL
+            try:
+                if leadership.is_leader:
+                    await self.sync()
+                else:
+                    await self._follow()
+                    interval = MIRROR_FOLLOW_INTERVAL
+            except Exception as e:
+                logger.error(f"Calendar mirror sync failed: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def check(self):
+        """On a follower, look up the leader's latest saved round for covers().
+
+        Called before each read the mirror might answer, rather than relying on
+        the follow loop alone: the leader saves a round before invalidating
+        cached reads, so a read checked after that save can't cache the old round.
+        Concurrent callers share one lookup, started after all of them arrived.
+        """
+        if leadership.is_leader or self.snapshot is None:
+            return
+        if self._next_check is None:
+            self._next_check = asyncio.get_running_loop().create_future()
+            if self._checker is None:
+                self._checker = asyncio.create_task(self._check_loop())
+        await asyncio.shield(self._next_check)
+
+    async def _check_loop(self):
+        try:
+            while self._next_check is not None:
+                waiters, self._next_check = self._next_check, None
+                try:
+                    self._saved = await self.snapshot.mirror_revision(self._mailbox)
+                except Exception as e:
+                    waiters.set_exception(e)
+                    # Retrieved here so an abandoned future doesn't log "never retrieved"
+                    waiters.exception()
+                else:
+                    waiters.set_result(None)
+        finally:
+            self._checker = None
+
+    async def _follow(self):
+        """Reload the leader's latest saved round if it is newer than this copy."""
+        if self.snapshot is None:
+            return
+        await self.check()
+        saved = self._saved
+        if saved is not None and saved[0] != self._revision:
+            async with self._lock:
+                await self._restore(restored=False)
+
+    def request_sync(self):
+        """Run the next sync round now rather than at the next interval, e.g. on a change notification."""
+        self._wake.set()
+
+    async def start(self):
+        """Restore the saved snapshot, if any, then seed or catch up in the background and keep in sync."""
+        if self._task is None:
+            if self.snapshot is not None:
+                await self._restore()
+            self._task = asyncio.create_task(self._sync_loop())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._checker is not None:
+            self._checker.cancel()
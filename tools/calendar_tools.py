@@ -0,0 +1,75 @@
+from tools.microsoft_calendar import calendar_pool
+from tools.tool_registry import ToolRegistry, tool_registry
+from tools.write_queue import write_queue
+from schemas.calendar_schemas import (
+    AvailabilityInput,
+    CheckMeetingAtTimeInput,
+    CreateMeetingInput,
+    DeleteMeetingInput,
+    FindFreeSlotsInput,
+    GroupAvailabilityInput,
+    JobStatusInput,
+    UpdateMeetingInput
+)
+
+
+def register_calendar_tools(registry: ToolRegistry = tool_registry):
+    """Register all calendar tools; called once by main at startup, not as an import side effect."""
+    registry.register(
+        name="check_availability",
+        description="Check if your calendar is free or busy during a specific time range. Returns 'available: true' if there are no events in the given period, otherwise 'available: false'. Also returns a list of busy/taken time slots (with start, end, and subject) for the given range, in the requested timezone (default: Eastern Time, America/New_York). Parameters: start_time (ISO 8601), end_time (ISO 8601), timezone (IANA name, optional).",
+        input_schema=AvailabilityInput,
+        handler=calendar_pool.handler("check_availability")
+    )
+
+    registry.register(
+        name="check_group_availability",
+        description="Check when several people are all free or busy during a specific time range, in one call. Looks up every attendee's free/busy schedule and merges them. Returns 'available: true' if nobody has anything scheduled in the range, a list of busy_times when at least one attendee is busy, and a list of free_times when everyone is free, in the requested timezone (default: Eastern Time, America/New_York). Attendees whose schedule could not be read are listed in schedule_errors. Parameters: attendees (list of email addresses, required), start_time (ISO 8601, required), end_time (ISO 8601, required), timezone (IANA name, optional), include_tentative (boolean, optional, default true).",
+        input_schema=GroupAvailabilityInput,
+        handler=calendar_pool.handler("check_group_availability")
+    )
+
+    registry.register(
+        name="find_free_slots",
+        description="Find free time slots for a meeting of a given length within a date range, inside working hours. Returns up to max_results non-overlapping slots (with start and end in the requested timezone), best first: slots with more free time around them rank higher, then earlier slots. By default searches your own calendar; pass attendees to find time when all of them are free. Parameters: start_time (ISO 8601, required), end_time (ISO 8601, required), duration_minutes (integer, required), timezone (IANA name, optional, default America/New_York), working_hours_start / working_hours_end (HH:MM, optional, default 09:00-17:00), include_weekends (boolean, optional), granularity_minutes (integer, optional, default 15), attendees (list of email addresses, optional), max_results (integer, optional, default 10).",
+        input_schema=FindFreeSlotsInput,
+        handler=calendar_pool.handler("find_free_slots")
+    )
+
+    registry.register(
+        name="create_meeting",
+        description="Create a new meeting in your Outlook calendar. Parameters: title (string, required), start_time (ISO 8601, required), end_time (ISO 8601, required), description (string, optional), location (string, optional), body (string, optional), idempotency_key (string, optional): reuse the same key when retrying so the meeting is only created once. The location will be set to 'Online' by default if not specified.",
+        input_schema=CreateMeetingInput,
+        handler=calendar_pool.handler("add_event"),
+        mutates=True
+    )
+
+    registry.register(
+        name="update_meeting",
+        description="Update an existing meeting in your Outlook calendar. Parameters: event_id (string, required), title (string, required), start_time (ISO 8601, required), end_time (ISO 8601, required), description (string, optional), location (string, optional), body (string, optional), idempotency_key (string, optional). Returns the event ID and status.",
+        input_schema=UpdateMeetingInput,
+        handler=calendar_pool.handler("update_event"),
+        mutates=True
+    )
+
+    registry.register(
+        name="delete_meeting",
+        description="Delete a meeting from your Outlook calendar. Parameters: event_id (string, required), idempotency_key (string, optional). Returns the event ID and status.",
+        input_schema=DeleteMeetingInput,
+        handler=calendar_pool.handler("delete_event"),
+        mutates=True
+    )
+
+    registry.register(
+        name="find_meetings_near_time",
+        description="Find all meetings or events in your Outlook calendar that overlap with a specific time window around a given date and time. Useful for checking if you have any meetings scheduled near a particular moment.\n\nParameters:\n- date: string, e.g. '2025-05-19' (required)\n- time: string, e.g. '12:00' (required, 24-hour format)\n- timezone: string, e.g. 'America/New_York' (optional, default: UTC)\n- window_minutes: integer, e.g. 15 (optional, default: 15). This is the number of minutes before and after the specified time to search for overlapping meetings.\n\nReturns a list of meetings (with subject, start, end, and location) that overlap with the window, and a boolean 'has_meeting'.\n\nExample usage:\n{ 'date': '2025-05-19', 'time': '12:00', 'timezone': 'America/New_York', 'window_minutes': 15 }\n\nNote: window_minutes must be an integer, not a string.",
+        input_schema=CheckMeetingAtTimeInput,
+        handler=calendar_pool.handler("find_meetings_near_time")
+    )
+
+    registry.register(
+        name="get_job_status",
+        description="Get the outcome of a calendar write (create_meeting, update_meeting or delete_meeting) that was queued instead of run immediately; such calls return a job_id with status 'queued'. Returns status 'queued', 'running', 'succeeded' (with the write's result, e.g. event_id and status) or 'failed' (with an error status and detail), or 'not_found' for unknown or expired jobs. Parameters: job_id (string, required), wait_seconds (number, optional, up to 30): wait for the job to finish before answering.",
+        input_schema=JobStatusInput,
+        handler=write_queue.status_tool
+    )
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from tools.shared_state import SHARED_LEASE_TTL, SHARED_POLL_INTERVAL, SHARED_POLL_MAX_INTERVAL, SharedStateStore
+
+
+class SingleFlight:
+    """Runs one call per key at a time; identical concurrent requests await the same result.
+
+    With a non-zero ttl, successful results are also kept for that many seconds
+    (bounded to max_entries, least recently stored evicted first).
+
+    With a shared store as well, results are kept there under namespace instead,
+    for every worker process, and a call in flight in one worker is awaited by
+    the others rather than repeated. Keys and results must then be picklable.
+
+    invalidate() and forget() detach the calls they catch in flight: those
+    return to the callers already waiting but aren't cached, and later
+    callers start a fresh call instead of joining them.
+    """
+
+    def __init__(self, ttl: float = 0.0, max_entries: int = 1024, store: Optional[SharedStateStore] = None,
+                 namespace: str = ""):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.store = store if ttl else None
+        self.namespace = namespace
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._results: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self.store is not None:
+            return await self._run_shared(key, fn)
+        if self.ttl:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self.hits += 1
+                return cached[1]
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+        else:
+            self.misses += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._complete(key, f))
+        # Shield so one caller going away doesn't cancel the call for everyone else
+        return await asyncio.shield(future)
+
+    def _complete(self, key: Hashable, future: asyncio.Future):
+        # Detached by invalidate() or forget(): a newer call may own the key now
+        if self._inflight.get(key) is not future:
+            return
+        del self._inflight[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        if self.ttl:
+            self._results[key] = (time.monotonic() + self.ttl, future.result())
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    async def _run_shared(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        name = repr(key)
+        found, value = await self.store.get_result(self.namespace, name)
+        if found:
+            self.hits += 1
+            return value
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+        else:
+            self.misses += 1
+            future = asyncio.ensure_future(self._fill_shared(key, name, fn))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._detach(key, f))
+        return await asyncio.shield(future)
+
+    async def _fill_shared(self, key: Hashable, name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn and store its result, unless another worker is already running it: then wait for theirs."""
+        lease = f"{self.namespace}:{name}"
+        deadline = time.monotonic() + SHARED_LEASE_TTL
+        interval = SHARED_POLL_INTERVAL
+        while not await self.store.try_lease(lease):
+            # Wait with backoff, reading only, until the holder stores its result or lets go
+            while True:
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, SHARED_POLL_MAX_INTERVAL)
+                found, value = await self.store.get_result(self.namespace, name)
+                if found:
+                    return value
+                if time.monotonic() > deadline or not await self.store.lease_held(lease):
+                    # Let go, or stuck or gone: its lease has expired by the deadline anyway
+                    break
+        try:
+            # The holder may have stored it between our lookup and taking the lease
+            found, value = await self.store.get_result(self.namespace, name)
+            if found:
+                return value
+            generation = await self.store.generation(self.namespace)
+            value = await fn()
+            if self._inflight.get(key) is asyncio.current_task():
+                await self.store.put_result(self.namespace, name, key, value, self.ttl, generation,
+                                            self.max_entries)
+            return value
+        finally:
+            await self.store.release(lease)
+
+    def _detach(self, key: Hashable, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def forget(self, key: Hashable):
+        """Drop one key's cached result and detach a call for it still in flight."""
+        self._results.pop(key, None)
+        self._inflight.pop(key, None)
+        if self.store is not None:
+            self.store.delete_result(self.namespace, repr(key))
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None):
+        """Drop cached results and detach calls already in flight.
+        With a predicate, only keys it accepts are affected."""
+        if self.store is not None:
+            self.store.invalidate(self.namespace, predicate)
+        if predicate is None:
+            self._results.clear()
+            self._inflight.clear()
+            return
+        for key in [key for key in self._results if predicate(key)]:
+            del self._results[key]
+        for key in [key for key in self._inflight if predicate(key)]:
+            del self._inflight[key]
+
+    async def flush(self):
+        """Wait until invalidations and forgets so far are visible to every worker."""
+        if self.store is not None:
+            await self.store.flush()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "shared": self.shared,
+            "misses": self.misses
+        }
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from tools.graph_transport import GraphAPIError, retry_after_seconds
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Graph rejects $batch payloads with more than 20 sub-requests
+GRAPH_BATCH_LIMIT = 20
+# Event-loop ticks to wait for concurrently started tool calls to reach their Graph request
+BATCH_SETTLE_TICKS = 3
+
+# Batch collecting Graph requests for the current task, if any
+current_batch: ContextVar[Optional["GraphBatch"]] = ContextVar("current_batch", default=None)
+
+
+class BatchResponse:
+    """One $batch sub-response, exposing the parts of httpx.Response the handlers use."""
+
+    def __init__(self, item: Dict[str, Any]):
+        self.status_code = item.get("status", 500)
+        self.headers = item.get("headers", {})
+        self._body = item.get("body")
+
+    def json(self) -> Any:
+        return self._body
+
+    @property
+    def text(self) -> str:
+        if self._body is None:
+            return ""
+        if isinstance(self._body, str):
+            return self._body
+        return json.dumps(self._body)
+
+
+class GraphBatch:
+    """Collects Graph requests issued by concurrent tool calls and sends them as JSON $batch requests."""
+
+    def __init__(self, client):
+        self.client = client
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    def submit(self, method: str, url: str, params: Optional[dict] = None,
+               json: Optional[dict] = None, headers: Optional[dict] = None) -> asyncio.Future:
+        """Queue a sub-request; the returned future resolves to its BatchResponse."""
+        base_url = self.client.transport.base_url
+        if url.startswith(base_url):
+            # nextLinks are absolute; $batch wants URLs relative to the version root
+            url = url[len(base_url):]
+        if params:
+            url = str(httpx.URL(url, params=params))
+        request: Dict[str, Any] = {"method": method, "url": url}
+        headers = dict(headers or {})
+        if json is not None:
+            request["body"] = json
+            headers["Content-Type"] = "application/json"
+        if headers:
+            request["headers"] = headers
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((request, future))
+        if len(self._pending) >= GRAPH_BATCH_LIMIT:
+            self._dispatch()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_soon())
+        return future
+
+    async def _flush_soon(self):
+        for _ in range(BATCH_SETTLE_TICKS):
+            await asyncio.sleep(0)
+        self._flush_task = None
+        while self._pending:
+            self._dispatch()
+
+    def _dispatch(self):
+        chunk = self._pending[:GRAPH_BATCH_LIMIT]
+        self._pending = self._pending[GRAPH_BATCH_LIMIT:]
+        task = asyncio.create_task(self._send(chunk))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, chunk: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        payload = {
+            "requests": [dict(request, id=str(i)) for i, (request, _) in enumerate(chunk)]
+        }
+        costs = Counter(self.client._throttle_key(request["url"]) for request, _ in chunk)
+        try:
+            async with self.client.throttle.envelope(self.client._throttle_key("/$batch"), costs):
+                response = await self.client._send_request("POST", "/$batch", json=payload)
+            if response.status_code != 200:
+                raise GraphAPIError(response.status_code, f"Graph $batch request failed: {response.text}",
+                                    retry_after_seconds(response.headers))
+            responses = {item["id"]: item for item in response.json().get("responses", [])}
+            for i, (_, future) in enumerate(chunk):
+                if future.done():
+                    continue
+                item = responses.get(str(i))
+                if item is None:
+                    future.set_exception(GraphAPIError(502, f"Graph $batch response is missing sub-request {i}"))
+                else:
+                    future.set_result(BatchResponse(item))
+            logger.info("Sent Graph $batch with %d requests", len(chunk))
+        except Exception as e:
+            logger.error(f"Graph $batch failed: {str(e)}")
+            for _, future in chunk:
+                if not future.done():
+                    future.set_exception(e)
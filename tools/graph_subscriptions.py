@@ -0,0 +1,367 @@
+import asyncio
+import hmac
+import logging
+import os
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from metrics import metrics
+from tools.coalesce import SingleFlight
+from tools.graph_transport import GraphAPIError, retry_after_seconds
+from tools.intervals import event_epoch
+from tools.invalidation import InvalidationBus, invalidation_bus
+from tools.shared_state import Leadership, SharedStateStore, leadership, shared_state
+from tools.timeutil import to_utc
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+# Public HTTPS URL of this server's /graph/notifications endpoint; unset disables change notifications
+GRAPH_NOTIFICATION_URL = os.environ.get("GRAPH_NOTIFICATION_URL", "")
+# Lifetime requested for each subscription; Graph caps event subscriptions at 10080 minutes
+GRAPH_SUBSCRIPTION_MINUTES = int(os.environ.get("GRAPH_SUBSCRIPTION_MINUTES", 4230))
+# Seconds before expiry a subscription is renewed
+GRAPH_SUBSCRIPTION_RENEW_MARGIN = float(os.environ.get("GRAPH_SUBSCRIPTION_RENEW_MARGIN", 3600))
+# Secret Graph echoes in every notification; a random one per process unless set
+GRAPH_NOTIFICATION_CLIENT_STATE = os.environ.get("GRAPH_NOTIFICATION_CLIENT_STATE", "") or secrets.token_urlsafe(32)
+# Seconds before a failed create or renew is retried
+SUBSCRIPTION_RETRY_DELAY = 60
+CHANGE_TYPES = "created,updated,deleted"
+# Notifications another worker received are handed to the leader through the shared store
+RELAY_CHANNEL = "graph-notifications"
+RELAY_POLL_INTERVAL = 0.1
+
+notifications_total = metrics.counter(
+    "graph_notifications_total", "Graph notifications received, by change type or lifecycle event", ["kind"])
+
+
+class Subscription:
+    __slots__ = ("id", "client", "expires")
+
+    def __init__(self, subscription_id: str, client, expires: float):
+        self.id = subscription_id
+        self.client = client
+        self.expires = expires
+
+
+class SubscriptionManager:
+    """Graph change-notification subscriptions on the events of every served mailbox.
+
+    Mailboxes are watched by the client pool as their clients are created and
+    unwatched when they are evicted. A background task creates missing
+    subscriptions, renews them GRAPH_SUBSCRIPTION_RENEW_MARGIN seconds before
+    they expire and deletes those no longer wanted. Each accepted notification
+    is turned into the time ranges it affects (from the mirror and a lookup of
+    the event) and published on the invalidation bus.
+
+    With several workers only the leader holds subscriptions (for the default
+    mailbox and the mailboxes in its own pool); the others pass the
+    notifications they receive on to it.
+    """
+
+    def __init__(self, notification_url: str, client_state: str = GRAPH_NOTIFICATION_CLIENT_STATE,
+                 bus: InvalidationBus = invalidation_bus, minutes: int = GRAPH_SUBSCRIPTION_MINUTES,
+                 renew_margin: float = GRAPH_SUBSCRIPTION_RENEW_MARGIN,
+                 store: Optional[SharedStateStore] = shared_state, leader: Leadership = leadership):
+        self.notification_url = notification_url
+        self.client_state = client_state
+        self.bus = bus
+        self.minutes = minutes
+        self.renew_margin = renew_margin
+        self.store = store
+        self.leader = leader
+        leader.on_change(self._leadership_changed)
+        # Mailboxes that should have a subscription, by (tenant, mailbox)
+        self._watched: Dict[Tuple[str, str], object] = {}
+        self._by_key: Dict[Tuple[str, str], Subscription] = {}
+        self._by_id: Dict[str, Subscription] = {}
+        # Subscriptions to delete, with the client whose tenant owns them
+        self._retired: List[Tuple[object, str]] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._relay_task: Optional[asyncio.Task] = None
+        self._handlers: Set[asyncio.Task] = set()
+        # A burst of notifications for one event looks it up once
+        self._lookups = SingleFlight()
+
+    @staticmethod
+    def _key(client) -> Tuple[str, str]:
+        return (client.tenant_id, client.user_id.lower())
+
+    def watch(self, client):
+        """Subscribe to a mailbox's events (in the background)."""
+        key = self._key(client)
+        if key not in self._watched:
+            self._watched[key] = client
+            self._wake.set()
+
+    def unwatch(self, tenant_id: str, mailbox: str):
+        """Drop a mailbox's subscription (in the background)."""
+        key = (tenant_id, mailbox.lower())
+        self._watched.pop(key, None)
+        subscription = self._by_key.pop(key, None)
+        if subscription is not None:
+            self._by_id.pop(subscription.id, None)
+            self._retired.append((subscription.client, subscription.id))
+            self._wake.set()
+
+    def _expiry(self) -> str:
+        expires = datetime.now(timezone.utc) + timedelta(minutes=self.minutes)
+        return expires.strftime("%Y-%m-%dT%H:%M:%S.0000000Z")
+
+    async def _create(self, key: Tuple[str, str], client):
+        body = {
+            "changeType": CHANGE_TYPES,
+            "notificationUrl": self.notification_url,
+            "lifecycleNotificationUrl": self.notification_url,
+            "resource": f"/users/{client.user_id}/events",
+            "expirationDateTime": self._expiry(),
+            "clientState": self.client_state
+        }
+        # Graph calls the notification URL to validate it before answering
+        response = await client._graph_request("POST", "/subscriptions", json=body)
+        if response.status_code != 201:
+            raise GraphAPIError(response.status_code, f"Failed to create subscription: {response.text}",
+                                retry_after_seconds(response.headers))
+        data = response.json()
+        subscription = Subscription(data["id"], client, to_utc(data["expirationDateTime"]).timestamp())
+        if self._watched.get(key) is not client:
+            # Unwatched while the request was out
+            self._retired.append((client, subscription.id))
+            return
+        self._by_key[key] = subscription
+        self._by_id[subscription.id] = subscription
+        logger.info(f"Graph subscription {subscription.id} created for {client.user_id}")
+
+    async def _renew(self, subscription: Subscription):
+        response = await subscription.client._graph_request(
+            "PATCH", f"/subscriptions/{subscription.id}", json={"expirationDateTime": self._expiry()})
+        if response.status_code == 404:
+            # Graph dropped it; the caller creates a new one
+            self._forget(subscription)
+            return
+        if response.status_code != 200:
+            raise GraphAPIError(response.status_code, f"Failed to renew subscription: {response.text}",
+                                retry_after_seconds(response.headers))
+        subscription.expires = to_utc(response.json()["expirationDateTime"]).timestamp()
+
+    async def _delete(self, client, subscription_id: str):
+        try:
+            response = await client._graph_request("DELETE", f"/subscriptions/{subscription_id}")
+            if response.status_code not in (204, 404):
+                logger.warning(f"Graph subscription {subscription_id} not deleted: {response.status_code}")
+        except Exception as e:
+            logger.warning(f"Graph subscription {subscription_id} not deleted: {str(e)}")
+
+    def _forget(self, subscription: Subscription):
+        key = self._key(subscription.client)
+        if self._by_key.get(key) is subscription:
+            del self._by_key[key]
+        self._by_id.pop(subscription.id, None)
+
+    async def _ensure(self, key: Tuple[str, str], client) -> float:
+        """Create or renew one mailbox's subscription; seconds until it next needs attention."""
+        subscription = self._by_key.get(key)
+        try:
+            if subscription is not None and subscription.expires - time.time() <= self.renew_margin:
+                await self._renew(subscription)
+                subscription = self._by_key.get(key)
+            if subscription is None:
+                await self._create(key, client)
+        except Exception as e:
+            logger.warning(f"Graph subscription for {client.user_id} not established: {str(e)}")
+            return SUBSCRIPTION_RETRY_DELAY
+        subscription = self._by_key.get(key)
+        if subscription is None:
+            return SUBSCRIPTION_RETRY_DELAY
+        return subscription.expires - self.renew_margin - time.time()
+
+    async def _maintain(self):
+        while True:
+            # Cleared before the round, so a watch() during it triggers another
+            self._wake.clear()
+            retired, self._retired = self._retired, []
+            await asyncio.gather(*(self._delete(client, subscription_id) for client, subscription_id in retired))
+            delay = 3600.0
+            if self.leader.is_leader:
+                delays = await asyncio.gather(*(self._ensure(key, client) for key, client in list(self._watched.items())))
+                delay = min([delay, *delays])
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(delay, 1.0))
+            except asyncio.TimeoutError:
+                pass
+
+    def _leadership_changed(self, is_leader: bool):
+        if not is_leader:
+            # The new leader subscribes afresh; these would only send duplicates
+            self._retired.extend((s.client, s.id) for s in self._by_id.values())
+            self._by_id.clear()
+            self._by_key.clear()
+        self._wake.set()
+
+    def _checked(self, item) -> Optional[dict]:
+        """The fields of a notification this server uses, or None unless it is shaped as Graph sends
+        them and carries the configured clientState."""
+        if not isinstance(item, dict):
+            return None
+        client_state, subscription_id = item.get("clientState"), item.get("subscriptionId")
+        if not isinstance(client_state, str) or not isinstance(subscription_id, str):
+            return None
+        if not hmac.compare_digest(client_state.encode(), self.client_state.encode()):
+            return None
+        checked = {"subscriptionId": subscription_id, "clientState": client_state}
+        for name in ("changeType", "lifecycleEvent"):
+            if name in item:
+                if not isinstance(item[name], str):
+                    return None
+                checked[name] = item[name]
+        if "changeType" not in checked and "lifecycleEvent" not in checked:
+            return None
+        resource_data = item.get("resourceData")
+        if resource_data is not None:
+            if not isinstance(resource_data, dict) or not isinstance(resource_data.get("id", ""), str):
+                return None
+            if "id" in resource_data:
+                checked["resourceData"] = {"id": resource_data["id"]}
+        return checked
+
+    def accept(self, payload) -> int:
+        """Check a notification POST and handle its notifications in the background; returns how many
+        were accepted. Malformed notifications, those with the wrong clientState and, on the leader,
+        those for unknown subscriptions are dropped. Other workers relay what they accept to the leader."""
+        items = payload.get("value") if isinstance(payload, dict) else None
+        if not isinstance(items, list):
+            raise ValueError("Notification payload has no value list")
+        checked = []
+        for item in items:
+            item = self._checked(item)
+            if item is None:
+                notifications_total.inc("rejected")
+            else:
+                checked.append(item)
+        if not self.leader.is_leader:
+            if checked:
+                self.store.relay(RELAY_CHANNEL, {"value": checked})
+            return len(checked)
+        accepted = 0
+        for item in checked:
+            subscription = self._by_id.get(item["subscriptionId"])
+            if subscription is None:
+                notifications_total.inc("rejected")
+                continue
+            notifications_total.inc(item.get("lifecycleEvent") or str(item.get("changeType", "unknown")))
+            task = asyncio.create_task(self._handle(subscription, item))
+            self._handlers.add(task)
+            task.add_done_callback(self._handlers.discard)
+            accepted += 1
+        return accepted
+
+    async def _handle(self, subscription: Subscription, item: dict):
+        client = subscription.client
+        try:
+            lifecycle = item.get("lifecycleEvent")
+            if lifecycle == "reauthorizationRequired":
+                # Renewing reauthorizes it
+                subscription.expires = 0
+                self._wake.set()
+            elif lifecycle == "subscriptionRemoved":
+                self._forget(subscription)
+                self._wake.set()
+                self._changed(client, None)
+            elif lifecycle == "missed":
+                self._changed(client, None)
+            else:
+                self._changed(client, await self._affected_ranges(client, item))
+        except Exception as e:
+            logger.error(f"Graph notification for {client.user_id} not handled: {str(e)}")
+            self._changed(client, None)
+
+    async def _affected_ranges(self, client, item: dict) -> Optional[List[Tuple[float, float]]]:
+        """Times the changed event occupied before and after the change, or None if they can't all be
+        known: an event the mirror hasn't seen may have moved from anywhere, and a series change moves
+        every occurrence."""
+        change_type = item.get("changeType")
+        event_id = (item.get("resourceData") or {}).get("id")
+        if not event_id:
+            return None
+        ranges = []
+        if change_type != "created":
+            before = client.mirror.event_range(event_id) if client.mirror is not None else None
+            if before is None:
+                return None
+            ranges.append(before)
+        if change_type != "deleted":
+            key = (client.tenant_id, client.user_id.lower(), event_id)
+            event = await self._lookups.run(key, lambda: self._fetch_event(client, event_id))
+            if event is None or event.get("type", "singleInstance") != "singleInstance":
+                return None
+            ranges.append((event_epoch(event["start"]), event_epoch(event["end"])))
+        return ranges
+
+    async def _fetch_event(self, client, event_id: str) -> Optional[dict]:
+        response = await client._graph_request(
+            "GET", f"/users/{client.user_id}/events/{event_id}", params={"$select": "start,end,type"})
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise GraphAPIError(response.status_code, f"Failed to get event: {response.text}",
+                                retry_after_seconds(response.headers))
+        return response.json()
+
+    def _changed(self, client, ranges: Optional[List[Tuple[float, float]]]):
+        if ranges is None and client.series is not None:
+            client.series.invalidate()
+        self.bus.publish(client.tenant_id, client.user_id, ranges)
+        if client.mirror is not None:
+            client.mirror.request_sync()
+
+    def stats(self) -> dict:
+        return {
+            "watched": len(self._watched),
+            "subscriptions": len(self._by_id)
+        }
+
+    async def _relay_loop(self):
+        while True:
+            await asyncio.sleep(RELAY_POLL_INTERVAL)
+            if self.leader.is_leader:
+                try:
+                    for payload in await self.store.take_relayed(RELAY_CHANNEL):
+                        self.accept(payload)
+                except Exception as e:
+                    logger.error(f"Relayed Graph notifications not handled: {str(e)}")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+            if self.store is not None:
+                self._relay_task = asyncio.create_task(self._relay_loop())
+
+    async def aclose(self, timeout: float = 5.0):
+        """Stop renewing and delete this process's subscriptions, waiting at most timeout seconds."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._relay_task is not None:
+            self._relay_task.cancel()
+            self._relay_task = None
+        for task in list(self._handlers):
+            task.cancel()
+        subscriptions = list(self._by_id.values())
+        self._by_id.clear()
+        self._by_key.clear()
+        deletes = [self._delete(s.client, s.id) for s in subscriptions]
+        deletes += [self._delete(client, subscription_id) for client, subscription_id in self._retired]
+        self._retired = []
+        if deletes:
+            try:
+                await asyncio.wait_for(asyncio.gather(*deletes), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Graph subscriptions not all deleted at shutdown; they expire on their own")
+
+
+# Create a singleton instance
+subscription_manager = SubscriptionManager(GRAPH_NOTIFICATION_URL) if GRAPH_NOTIFICATION_URL else None
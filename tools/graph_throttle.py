@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import os
+import random
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional
+
+import httpx
+
+from metrics import metrics
+from tools.graph_transport import GraphAPIError, retry_after_seconds
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+# Requests per second allowed per (tenant, mailbox) at start, and the bounds the adaptive rate moves within.
+# Graph's Outlook limit is 10,000 requests per 10 minutes per app and mailbox (~16/s).
+GRAPH_RATE_INITIAL = float(os.environ.get("GRAPH_RATE_INITIAL", 15))
+GRAPH_RATE_MIN = float(os.environ.get("GRAPH_RATE_MIN", 0.5))
+GRAPH_RATE_MAX = float(os.environ.get("GRAPH_RATE_MAX", 50))
+# Requests that may go out back-to-back before pacing applies
+GRAPH_RATE_BURST = float(os.environ.get("GRAPH_RATE_BURST", 10))
+# Concurrent requests per mailbox (Graph allows 4); 0 disables the cap
+GRAPH_MAILBOX_CONCURRENCY = int(os.environ.get("GRAPH_MAILBOX_CONCURRENCY", 4))
+# Worker processes serving the app (the variable uvicorn and gunicorn read too); the budgets above are
+# for the whole server, so each worker paces its mailboxes at an even share of them
+GRAPH_WORKERS = max(int(os.environ.get("WEB_CONCURRENCY", 1)), 1)
+# Give up retrying once a request has been waiting this many seconds
+GRAPH_RETRY_DEADLINE = float(os.environ.get("GRAPH_RETRY_DEADLINE", 30))
+GRAPH_MAX_RETRIES = int(os.environ.get("GRAPH_MAX_RETRIES", 5))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+# Multiplicative decrease on a throttle response, at most once per cooldown;
+# additive increase of about RATE_STEP requests/second for each second of successful traffic
+RATE_DECREASE = 0.7
+RATE_DECREASE_COOLDOWN = 1.0
+RATE_STEP = 1.0
+# Statuses Graph uses to push back; both carry Retry-After
+THROTTLE_STATUSES = {429, 503}
+# Graph refused a 429 outright; after a 503 or a transport failure the request may have been carried
+# out, so those are only retried for requests that are safe to repeat
+REFUSED_STATUS = 429
+IDEMPOTENT_METHODS = {"GET"}
+MAX_LIMITERS = 1024
+
+throttled_total = metrics.counter("graph_throttled_total", "Graph responses asking us to back off", ["status"])
+retries_total = metrics.counter("graph_retries_total", "Graph requests retried after throttling or transport errors")
+
+
+class RateLimiter:
+    """Token bucket whose refill rate adapts to Graph's pushback (AIMD).
+
+    Callers reserve a token and sleep until it is theirs, so waiting requests
+    are served in order without a polling loop.
+
+    rate, burst and concurrency are the server's budget; with several worker
+    processes each limiter keeps a 1/workers share of them (and of the AIMD
+    bounds and step), so the workers together stay within the budget. The
+    concurrency share is at least one request per worker.
+    """
+
+    def __init__(self, rate: float = GRAPH_RATE_INITIAL, burst: float = GRAPH_RATE_BURST,
+                 concurrency: int = GRAPH_MAILBOX_CONCURRENCY, workers: int = GRAPH_WORKERS):
+        self.workers = workers
+        self.rate = rate / workers
+        self.burst = max(burst / workers, 1.0)
+        self._tokens = self.burst
+        self._updated = asyncio.get_running_loop().time()
+        self._last_decrease = float("-inf")
+        # Graph also caps concurrent requests per mailbox
+        self.slots = asyncio.Semaphore(max(concurrency // workers, 1)) if concurrency > 0 else None
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, deadline: float, tokens: int = 1):
+        """Wait for tokens; raises a 429 GraphAPIError if the wait would run past the deadline."""
+        now = asyncio.get_running_loop().time()
+        self._refill(now)
+        self._tokens -= tokens
+        delay = max(-self._tokens / self.rate, 0.0)
+        if now + delay > deadline:
+            self._tokens += tokens
+            raise GraphAPIError(429, "Graph request rate for this mailbox is exhausted", retry_after=delay)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        self.rate = min(self.rate + RATE_STEP / self.workers / self.rate, GRAPH_RATE_MAX / self.workers)
+
+    def on_throttle(self):
+        now = asyncio.get_running_loop().time()
+        if now - self._last_decrease >= RATE_DECREASE_COOLDOWN:
+            self.rate = max(self.rate * RATE_DECREASE, GRAPH_RATE_MIN / self.workers)
+            self._last_decrease = now
+            logger.warning(f"Graph throttled requests; pacing this mailbox at {self.rate:.1f} req/s")
+        self._refill(now)
+        # Drop the saved-up burst so the reduced rate takes effect immediately
+        self._tokens = min(self._tokens, 0.0)
+
+
+class GraphThrottle:
+    """Paces, retries and backs off Graph calls per (tenant, mailbox)."""
+
+    def __init__(self, max_limiters: int = MAX_LIMITERS):
+        self.max_limiters = max_limiters
+        self._limiters: "OrderedDict[Hashable, RateLimiter]" = OrderedDict()
+
+    def limiter(self, key: Hashable) -> RateLimiter:
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = self._limiters[key] = RateLimiter()
+            if len(self._limiters) > self.max_limiters:
+                self._limiters.popitem(last=False)
+        else:
+            self._limiters.move_to_end(key)
+        return limiter
+
+    def rates(self) -> Dict[Hashable, float]:
+        return {key: limiter.rate for key, limiter in self._limiters.items()}
+
+    @asynccontextmanager
+    async def envelope(self, key: Hashable, costs: Dict[Hashable, int]) -> AsyncIterator[None]:
+        """Pace a $batch POST: each sub-request takes a token from its own mailbox's bucket,
+        and the envelope takes one concurrency slot of key's, as a single request would."""
+        deadline = asyncio.get_running_loop().time() + GRAPH_RETRY_DEADLINE
+        for sub_key, cost in costs.items():
+            await self.limiter(sub_key).acquire(deadline, cost)
+        slots = self.limiter(key).slots
+        if slots is None:
+            yield
+        else:
+            async with slots:
+                yield
+
+    async def call(self, key: Hashable, method: str, send: Callable[[], Awaitable[Any]], paced: bool = True,
+                   replayable: Optional[bool] = None) -> Any:
+        """Run send() under the key's rate limit, retrying throttled or failed attempts until the deadline.
+
+        With paced=False, send() isn't held to the rate limit or the concurrency cap
+        (a $batch sub-request: the envelope is paced instead), but is still retried.
+        replayable says whether send() may be repeated after a 503 or a transport
+        error; by default only idempotent methods are. 429s are always retried.
+        Returns the last response, throttled or not, once retries are exhausted;
+        callers turn non-success responses into errors as usual.
+        """
+        if replayable is None:
+            replayable = method.upper() in IDEMPOTENT_METHODS
+        limiter = self.limiter(key)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + GRAPH_RETRY_DEADLINE
+        attempt = 0
+        while True:
+            if paced:
+                await limiter.acquire(deadline)
+            error: Optional[Exception] = None
+            response = None
+            retry_after = None
+            try:
+                if not paced or limiter.slots is None:
+                    response = await send()
+                else:
+                    async with limiter.slots:
+                        response = await send()
+            except GraphAPIError as e:
+                # A whole $batch can be throttled; each sub-request then retries on its own
+                if e.status_code not in THROTTLE_STATUSES:
+                    raise
+                error, status, retry_after = e, e.status_code, e.retry_after
+            except httpx.TransportError as e:
+                if not replayable:
+                    raise
+                error, status = e, None
+            else:
+                status = response.status_code
+                if status not in THROTTLE_STATUSES:
+                    limiter.on_success()
+                    return response
+                retry_after = retry_after_seconds(response.headers)
+
+            if status is not None:
+                throttled_total.inc(str(status))
+                limiter.on_throttle()
+                if status != REFUSED_STATUS and not replayable:
+                    if error is not None:
+                        raise error
+                    return response
+            attempt += 1
+            # Retry-After applies to the throttled request; full jitter keeps requests
+            # throttled together from retrying together
+            delay = max(retry_after or 0.0, random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+            if attempt > GRAPH_MAX_RETRIES or loop.time() + delay > deadline:
+                if error is not None:
+                    raise error
+                return response
+            retries_total.inc()
+            await asyncio.sleep(delay)
+
+
+def find_throttle_error(exc: BaseException) -> Optional[GraphAPIError]:
+    """The throttling GraphAPIError behind an exception, following the raise-from/context chain."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, GraphAPIError) and exc.status_code in THROTTLE_STATUSES:
+            return exc
+        exc = exc.__cause__ or exc.__context__
+    return None
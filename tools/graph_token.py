@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from tools.shared_state import SHARED_LEASE_TTL, SHARED_POLL_INTERVAL, SHARED_POLL_MAX_INTERVAL, SharedStateStore
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+# Refresh this many seconds before expiry; tokens within EXPIRY_SKEW of expiry are never served
+TOKEN_REFRESH_MARGIN = int(os.environ.get("GRAPH_TOKEN_REFRESH_MARGIN", 300))
+TOKEN_EXPIRY_SKEW = 60
+TOKEN_RETRY_DELAY = 10
+
+
+class SharedToken(NamedTuple):
+    """An access token another worker fetched, shaped like azure-core's AccessToken."""
+
+    token: str
+    expires_on: float
+
+
+class LazyClientSecretCredential:
+    """azure-identity ClientSecretCredential created on the first get_token() call.
+
+    Importing azure.identity takes longer than the rest of startup; token
+    fetches run on a worker thread, so deferring it keeps that cost off both
+    the import path and the event loop.
+    """
+
+    def __init__(self, tenant_id: str, client_id: str, client_secret: str):
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self._client_secret = client_secret
+        self._credential = None
+        self._lock = threading.Lock()
+
+    def _get_credential(self):
+        with self._lock:
+            if self._credential is None:
+                from azure.identity import ClientSecretCredential
+                self._credential = ClientSecretCredential(
+                    tenant_id=self.tenant_id,
+                    client_id=self.client_id,
+                    client_secret=self._client_secret
+                )
+            return self._credential
+
+    def get_token(self, *scopes: str, **kwargs):
+        return self._get_credential().get_token(*scopes, **kwargs)
+
+
+class GraphTokenManager:
+    """Caches the Graph access token and refreshes it ahead of expiry.
+
+    Concurrent callers that find no usable token share a single in-flight
+    acquisition instead of each hitting the identity endpoint. With a shared
+    store, so do the server's worker processes: one fetches, the others reuse.
+    """
+
+    def __init__(self, credential, scope: str = GRAPH_SCOPE, store: Optional[SharedStateStore] = None):
+        self.credential = credential
+        self.scope = scope
+        self.store = store
+        self._token = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    async def get_token(self) -> str:
+        """Return a valid bearer token, fetching one only if the cache cannot serve it."""
+        token = self._token
+        now = time.time()
+        if token is not None and now < token.expires_on - TOKEN_EXPIRY_SKEW:
+            self.hits += 1
+            if now >= token.expires_on - TOKEN_REFRESH_MARGIN and self._refresher is None:
+                # Refresh ahead in the background; this caller keeps the cached token.
+                # Failures are logged in _fetch and retried by the next caller.
+                self._acquire().add_done_callback(lambda f: f.cancelled() or f.exception())
+            return token.token
+        self.misses += 1
+        token = await asyncio.shield(self._acquire())
+        return token.token
+
+    def _acquire(self) -> asyncio.Future:
+        """Start a token fetch, or join the one already in flight."""
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+        return self._inflight
+
+    async def _fetch(self):
+        try:
+            if self.store is not None:
+                token = await self._shared_token()
+                if token is not None:
+                    self._token = token
+                    return token
+            # azure-identity's credential is synchronous; keep it off the event loop
+            token = await asyncio.to_thread(self.credential.get_token, self.scope)
+            self._token = token
+            self.refreshes += 1
+            logger.info(f"Graph access token refreshed, expires in {int(token.expires_on - time.time())}s")
+            if self.store is not None:
+                await self.store.put_token(self._shared_name, token.token, token.expires_on)
+            return token
+        except Exception as e:
+            logger.error(f"Failed to acquire Graph access token: {str(e)}")
+            raise
+        finally:
+            if self.store is not None:
+                await self.store.release(f"token:{self._shared_name}")
+            self._inflight = None
+
+    @property
+    def _shared_name(self) -> str:
+        tenant_id = getattr(self.credential, "tenant_id", "")
+        client_id = getattr(self.credential, "client_id", "")
+        return f"{tenant_id}:{client_id}:{self.scope}"
+
+    async def _shared_token(self) -> Optional[SharedToken]:
+        """A token another worker stored, or None once this worker holds the lease to fetch one itself."""
+        deadline = time.monotonic() + SHARED_LEASE_TTL
+        interval = SHARED_POLL_INTERVAL
+        while True:
+            row = await self.store.get_token(self._shared_name)
+            remaining = row[1] - time.time() if row else 0
+            if remaining > TOKEN_REFRESH_MARGIN:
+                return SharedToken(*row)
+            if await self.store.try_lease(f"token:{self._shared_name}"):
+                # The worker that held the lease may have stored a token just before letting go
+                row = await self.store.get_token(self._shared_name)
+                if row and row[1] - time.time() > TOKEN_REFRESH_MARGIN:
+                    return SharedToken(*row)
+                return None
+            if remaining > TOKEN_EXPIRY_SKEW:
+                # Another worker is refreshing; this one is still good meanwhile
+                return SharedToken(*row)
+            if time.monotonic() > deadline:
+                return None
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, SHARED_POLL_MAX_INTERVAL)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                token = await asyncio.shield(self._acquire())
+                delay = max(token.expires_on - time.time() - TOKEN_REFRESH_MARGIN, TOKEN_RETRY_DELAY)
+            except Exception:
+                delay = TOKEN_RETRY_DELAY
+            await asyncio.sleep(delay)
+
+    async def start(self):
+        """Fetch the first token and keep refreshing it before it expires."""
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def aclose(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    def stats(self) -> dict:
+        """Cache counters; 'misses' counts calls that had to wait on the identity endpoint."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes
+        }
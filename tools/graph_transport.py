@@ -0,0 +1,144 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+
+from metrics import graph_duration
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+GRAPH_BASE_URL = os.environ.get("GRAPH_BASE_URL", "https://graph.microsoft.com/v1.0")
+GRAPH_HTTP2 = os.environ.get("GRAPH_HTTP2", "true").lower() != "false"
+GRAPH_MAX_CONNECTIONS = int(os.environ.get("GRAPH_MAX_CONNECTIONS", 100))
+GRAPH_MAX_KEEPALIVE = int(os.environ.get("GRAPH_MAX_KEEPALIVE", 20))
+GRAPH_TIMEOUT = float(os.environ.get("GRAPH_TIMEOUT", 30))
+GRAPH_PAGE_SIZE = int(os.environ.get("GRAPH_PAGE_SIZE", 50))
+
+
+class GraphAPIError(Exception):
+    """Non-success response from Microsoft Graph; retry_after is set when Graph asked us to back off."""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None if absent."""
+    value = None
+    for key, header in headers.items():
+        if key.lower() == "retry-after":
+            value = str(header).strip()
+            break
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class GraphTransport:
+    """Shared async HTTP connection pool for all Microsoft Graph calls."""
+
+    def __init__(self, base_url: str = GRAPH_BASE_URL):
+        self.base_url = base_url
+        self._client: Optional[httpx.AsyncClient] = None
+        # Pool being created on a worker thread by start()
+        self._opening: Optional[asyncio.Future] = None
+
+    def _create_client(self) -> httpx.AsyncClient:
+        # HTTP/2 needs the optional 'h2' package; fall back to HTTP/1.1 keep-alive without it
+        http2 = GRAPH_HTTP2 and importlib.util.find_spec("h2") is not None
+        client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=GRAPH_MAX_CONNECTIONS,
+                max_keepalive_connections=GRAPH_MAX_KEEPALIVE
+            ),
+            timeout=httpx.Timeout(GRAPH_TIMEOUT)
+        )
+        logger.info(f"Graph HTTP pool opened (base_url={self.base_url}, http2={http2})")
+        return client
+
+    async def start(self):
+        """Open the connection pool on a worker thread; loading TLS certificates is the slow part, so
+        startup doesn't wait for it. Called from the app startup hook."""
+        if self._client is None and self._opening is None:
+            self._opening = asyncio.ensure_future(asyncio.to_thread(self._create_client))
+
+    async def _open(self) -> httpx.AsyncClient:
+        """The pool, waiting for start() to finish opening it if needed."""
+        if self._client is None and self._opening is not None:
+            client = await asyncio.shield(self._opening)
+            if self._client is None:
+                self._client = client
+            self._opening = None
+        return self.client
+
+    async def aclose(self):
+        """Close the connection pool. Called from the app shutdown hook."""
+        if self._opening is not None:
+            opening, self._opening = self._opening, None
+            client = await opening
+            if client is not self._client:
+                await client.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Graph HTTP pool closed")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Open lazily so the client still works when used outside the app lifecycle
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the shared pool. Relative URLs resolve against GRAPH_BASE_URL."""
+        started = time.perf_counter()
+        status = "error"
+        try:
+            client = self._client or await self._open()
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            graph_duration.observe(time.perf_counter() - started, method, graph_endpoint(url, self.base_url), status)
+
+
+@lru_cache(maxsize=1024)
+def graph_endpoint(url: str, base_url: str = GRAPH_BASE_URL) -> str:
+    """Low-cardinality metrics label for a Graph URL: ids replaced by placeholders, query dropped.
+
+    '/users/a@b.com/events/AAMk...' becomes '/users/{user}/events/{id}'.
+    """
+    if url.startswith(base_url):
+        url = url[len(base_url):]
+    path = url.split("?", 1)[0]
+    segments = path.strip("/").split("/")
+    for i in range(1, len(segments)):
+        if segments[i - 1] == "users":
+            segments[i] = "{user}"
+        elif segments[i - 1] in ("events", "subscriptions"):
+            segments[i] = "{id}"
+    return "/" + "/".join(segments)
+
+
+# Create a singleton instance
+graph_transport = GraphTransport()
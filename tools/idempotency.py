@@ -0,0 +1,61 @@
+import json
+import os
+from hashlib import blake2b
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from tools.coalesce import SingleFlight
+from tools.shared_state import shared_state
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+# Seconds a completed write's result is replayed for retries carrying the same key
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", 86400))
+# Completed results kept; the least recently stored are forgotten first
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", 10000))
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused with different parameters."""
+
+
+def fingerprint(params: Dict[str, Any]) -> str:
+    """Stable digest of a call's parameters, so a reused key can be told apart from a retry."""
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+class IdempotencyCache:
+    """Runs each idempotency key's call once; retries and concurrent duplicates get the original result.
+
+    A call in flight is shared with duplicates that arrive meanwhile, and a
+    successful result is replayed for IDEMPOTENCY_TTL seconds. Failed calls
+    are not remembered, so a retry after an error runs again; a call whose
+    result only stands for work done later (a queued write's job id) is
+    forgotten with forget() if that work fails.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        # Shared across workers, so a retry landing on another worker is still recognized
+        self._calls = SingleFlight(ttl=ttl, max_entries=max_keys, store=shared_state, namespace="idempotency")
+
+    async def run(self, key: Hashable, params: Dict[str, Any], fn: Callable[[], Awaitable[Any]]) -> Any:
+        digest = fingerprint(params)
+
+        async def call():
+            return digest, await fn()
+
+        stored_digest, result = await self._calls.run(key, call)
+        if stored_digest != digest:
+            raise IdempotencyConflict("Idempotency key was already used with different parameters")
+        return result
+
+    def forget(self, key: Hashable):
+        """Let the next call with this key run again."""
+        self._calls.forget(key)
+
+    def stats(self) -> dict:
+        # hits: replayed from a completed call, shared: joined a call in flight, misses: ran the call
+        return self._calls.stats()
+
+
+# Create a singleton instance
+idempotent_writes = IdempotencyCache()
@@ -0,0 +1,47 @@
+from typing import Iterable, List, Tuple
+
+from tools.timeutil import graph_epoch
+
+Interval = Tuple[float, float]
+
+
+def event_epoch(value: dict) -> float:
+    """Convert a Graph dateTimeTimeZone value (UTC unless an offset is present) to epoch seconds."""
+    return graph_epoch(value["dateTime"])
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Union of (start, end) intervals as sorted, non-overlapping pairs, in one sort and one sweep.
+
+    Touching intervals are joined; empty or inverted intervals are dropped.
+    """
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def clip_intervals(intervals: Iterable[Interval], start: float, end: float) -> List[Interval]:
+    """Intervals cut to [start, end); those entirely outside are dropped."""
+    return [(max(s, start), min(e, end)) for s, e in intervals if s < end and e > start]
+
+
+def free_intervals(busy: List[Interval], start: float, end: float) -> List[Interval]:
+    """Gaps in [start, end) not covered by busy, which must already be merged."""
+    free: List[Interval] = []
+    cursor = start
+    for s, e in busy:
+        if s > cursor:
+            free.append((cursor, min(s, end)))
+        cursor = max(cursor, e)
+        if cursor >= end:
+            break
+    if cursor < end:
+        free.append((cursor, end))
+    return free
@@ -0,0 +1,40 @@
+import logging
+from typing import Callable, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# (start, end) in epoch seconds
+Range = Tuple[float, float]
+Subscriber = Callable[[str, str, Optional[List[Range]]], None]
+
+
+class InvalidationBus:
+    """In-process fan-out of "this mailbox's calendar changed" signals to whatever caches its reads.
+
+    Publishers (the Graph notification receiver, the calendar mirror) don't know
+    what is cached; subscribers don't know where changes come from. Delivery is
+    synchronous, so cached data is gone by the time publish() returns.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+        self.published = 0
+
+    def subscribe(self, callback: Subscriber):
+        """Call callback(tenant_id, mailbox, ranges) on every publish; mailbox is lower-cased."""
+        self._subscribers.append(callback)
+
+    def publish(self, tenant_id: str, mailbox: str, ranges: Optional[List[Range]] = None):
+        """Announce that a tenant's mailbox's events changed within ranges; None means anywhere in the calendar."""
+        self.published += 1
+        mailbox = mailbox.lower()
+        for callback in self._subscribers:
+            try:
+                callback(tenant_id, mailbox, ranges)
+            except Exception as e:
+                logger.error(f"Invalidation subscriber failed for {mailbox}: {str(e)}")
+
+
+# Create a singleton instance
+invalidation_bus = InvalidationBus()
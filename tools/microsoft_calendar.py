@@ -1,154 +1,341 @@
+from contextlib import asynccontextmanager
+import asyncio
+import heapq
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-import requests
-from azure.identity import ClientSecretCredential
+from time import monotonic, perf_counter
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable, Tuple
 import os
+import re
+from collections import OrderedDict
+from fnmatch import fnmatch
 # Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
 import logging
+from fastapi import HTTPException
 from schemas.calendar_schemas import (
-    TimeRange,
-    AvailabilityResponse,
-    EventCreate,
-    EventUpdate,
-    EventDelete,
-    EventResponse,
+    AvailabilityInput,
     CheckMeetingAtTimeInput,
     CheckMeetingAtTimeResponse,
-    MeetingEvent
+    CreateMeetingInput,
+    DeleteMeetingInput,
+    EventResponse,
+    FindFreeSlotsInput,
+    GroupAvailabilityInput,
+    MailboxSelection,
+    MeetingEvent,
+    UpdateMeetingInput
 )
-import pytz
-import dateutil.parser
+from tools.graph_transport import graph_transport, GraphAPIError, GRAPH_PAGE_SIZE, retry_after_seconds
+from tools.graph_throttle import GraphThrottle
+from tools.graph_token import GraphTokenManager, LazyClientSecretCredential
+from tools.graph_batch import GraphBatch, current_batch
+from tools.coalesce import SingleFlight
+from tools.intervals import event_epoch, merge_intervals, clip_intervals, free_intervals
+from tools.slot_search import merge_busy, working_windows, find_slots
+from tools.calendar_mirror import CalendarMirror, CALENDAR_MIRROR
+from tools.snapshot import snapshot_store
+from tools.invalidation import invalidation_bus
+from tools.graph_subscriptions import SubscriptionManager, subscription_manager
+from tools.shared_state import shared_state
+from tools.recurrence import RecurrenceError, Series, expand
+from tools.timeutil import UTC, get_zone, to_utc, parse_iso, format_graph_utc, local_iso, localize_events
+from log_config import LazyJSON, sampled
+from metrics import token_wait
+from config import get_settings
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Get environment variables
-MS_CLIENT_ID = os.environ.get("MS_CLIENT_ID")
-MS_CLIENT_SECRET = os.environ.get("MS_CLIENT_SECRET")
-MS_TENANT_ID = os.environ.get("MS_TENANT_ID")
-MS_USER_ID = os.environ.get("MS_USER_ID")
+# Get environment variables (credentials come from config.get_settings())
+# Seconds to reuse an availability result; 0 only shares calls that are in flight together
+GRAPH_READ_CACHE_TTL = float(os.environ.get("GRAPH_READ_CACHE_TTL", 0))
+# Expand recurring series locally from their masters instead of having calendarView expand them on every read
+CALENDAR_LOCAL_RECURRENCE = os.environ.get("CALENDAR_LOCAL_RECURRENCE", "false").lower() == "true"
+# Seconds loaded series masters are reused; this server's own writes reload them sooner
+RECURRENCE_SERIES_TTL = float(os.environ.get("RECURRENCE_SERIES_TTL", 300))
+# Master properties fetched for local expansion; cancelledOccurrences is only returned when selected
+SERIES_MASTER_FIELDS = ("id,subject,start,end,location,showAs,isAllDay,isCancelled,type,"
+                        "recurrence,originalStartTimeZone,cancelledOccurrences")
+# getSchedule accepts at most 20 schedules per request
+GRAPH_SCHEDULE_CHUNK = 20
+# Mailbox clients kept by the pool, and seconds an unused one is kept
+MAILBOX_POOL_SIZE = int(os.environ.get("MAILBOX_POOL_SIZE", 500))
+MAILBOX_IDLE_TTL = float(os.environ.get("MAILBOX_IDLE_TTL", 900))
+# Comma-separated mailbox patterns tool calls may target besides MS_USER_ID (fnmatch, e.g. "*@contoso.com");
+# unset allows MS_USER_ID only, "*" any mailbox the app registration can reach
+MS_ALLOWED_MAILBOXES = os.environ.get("MS_ALLOWED_MAILBOXES", "")
+# Extra tenants a multi-tenant app registration may be used in, besides MS_TENANT_ID
+MS_ALLOWED_TENANTS = os.environ.get("MS_ALLOWED_TENANTS", "")
+
+# A Graph user id: object id (GUID) or user principal name; anything else could reshape the request path
+MAILBOX_PATTERN = re.compile(r"^[A-Za-z0-9._%+'-]+(@[A-Za-z0-9.-]+)?$")
+
+def read_affected(key: tuple, tenant_id: str, mailbox: str, ranges: Optional[List[Tuple[float, float]]]) -> bool:
+    """Whether a cached read (keyed as in the client's read methods) could include a change to the
+    tenant's mailbox's events within ranges (epoch seconds; None for anywhere). mailbox is lower-case."""
+    if key[1] != tenant_id:
+        return False
+    if key[0] == "schedule":
+        mailboxes, start_dt, end_dt = key[3], key[4], key[5]
+    else:
+        mailboxes, start_dt, end_dt = (key[2],), key[3], key[4]
+    if not any(m.lower() == mailbox for m in mailboxes):
+        return False
+    if ranges is None:
+        return True
+    start, end = start_dt.timestamp(), end_dt.timestamp()
+    return any(range_start < end and range_end > start for range_start, range_end in ranges)
 
 class MicrosoftCalendarClient:
-    def __init__(self):
-        self.credential = None
-        self.user_id = None
-        self._initialize_client()
+    def __init__(self, user_id: Optional[str] = None, tenant_id: Optional[str] = None, credential=None,
+                 token_manager: Optional[GraphTokenManager] = None, reads: Optional[SingleFlight] = None,
+                 throttle: Optional[GraphThrottle] = None):
+        """Client for one mailbox. Without arguments, credentials and mailbox come from the environment;
+        CalendarClientPool passes them in to share them across mailboxes."""
+        self.transport = graph_transport
+        if credential is None:
+            self.credential = None
+            self.user_id = None
+            self.token_manager = None
+            self._initialize_client()
+            self.mirror = CalendarMirror(self, snapshot_store) if CALENDAR_MIRROR else None
+        else:
+            self.credential = credential
+            self.tenant_id = tenant_id
+            self.user_id = user_id
+            self.token_manager = token_manager
+            self.mirror = None
+        # Identical concurrent availability lookups share one Graph call, across workers too
+        self.reads = reads or SingleFlight(ttl=GRAPH_READ_CACHE_TTL, store=shared_state, namespace="reads")
+        # Per-mailbox pacing and retries for every Graph request
+        self.throttle = throttle or GraphThrottle()
+        # This mailbox's recurring series, loaded once and shared by concurrent reads
+        self.series = SingleFlight(ttl=RECURRENCE_SERIES_TTL, max_entries=1) if CALENDAR_LOCAL_RECURRENCE else None
 
     def _initialize_client(self):
-        """Initialize the Microsoft Graph client with credentials from Replit Secrets."""
+        """Initialize the Microsoft Graph client with credentials from Replit Secrets.
+        The credential itself is only created when the first token is requested."""
         try:
+            settings = get_settings()
             # Check for missing environment variables
-            missing_vars = []
-            for var_name, var_value in [
-                ("MS_CLIENT_ID", MS_CLIENT_ID),
-                ("MS_CLIENT_SECRET", MS_CLIENT_SECRET),
-                ("MS_TENANT_ID", MS_TENANT_ID),
-                ("MS_USER_ID", MS_USER_ID)
-            ]:
-                if not var_value:
-                    missing_vars.append(var_name)
-
+            missing_vars = [name for name in settings.missing if name.startswith("MS_")]
             if missing_vars:
                 env_keys = [k for k in os.environ.keys() if k.startswith('MS_') or k == 'API_KEY']
                 error_msg = f"Missing required Microsoft Graph API credentials: {', '.join(missing_vars)}\nCurrent env: {env_keys}"
                 logger.error(error_msg)
                 raise EnvironmentError(error_msg)
 
-            self.client_id = MS_CLIENT_ID
-            self.client_secret = MS_CLIENT_SECRET
-            self.tenant_id = MS_TENANT_ID
-            self.user_id = MS_USER_ID
-            self.credential = ClientSecretCredential(
+            self.client_id = settings.client_id
+            self.client_secret = settings.client_secret
+            self.tenant_id = settings.tenant_id
+            self.user_id = settings.user_id
+            self.credential = LazyClientSecretCredential(
                 tenant_id=self.tenant_id,
                 client_id=self.client_id,
                 client_secret=self.client_secret
             )
+            self.token_manager = GraphTokenManager(self.credential, store=shared_state)
             logger.info("Microsoft Graph client initialized successfully")
         except Exception as e:
             error_msg = f"Failed to initialize Microsoft Graph client: {str(e)}"
             logger.error(error_msg)
             raise EnvironmentError(error_msg)
 
+    async def start(self):
+        """Open the shared Graph connection pool and start background token refresh."""
+        await self.transport.start()
+        await self.token_manager.start()
+        if self.mirror is not None:
+            await self.mirror.start()
+
+    async def aclose(self):
+        """Stop background tasks and close the Graph connection pool."""
+        if self.mirror is not None:
+            await self.mirror.aclose()
+        await self.token_manager.aclose()
+        await self.transport.aclose()
+
+    async def _invalidate_reads(self):
+        """Forget cached reads of this mailbox, and its loaded series, after a write to its calendar.
+        The read cache is shared by every pooled mailbox, so the others' reads are kept. Returns once
+        every worker would miss them, so a read following the write's response sees the write."""
+        mailbox = self.user_id.lower()
+        self.reads.invalidate(lambda key: read_affected(key, self.tenant_id, mailbox, None))
+        if self.series is not None:
+            self.series.invalidate()
+        await self.reads.flush()
+
     def _check_client(self):
         """Check if the client is properly initialized."""
         if not self.credential:
             raise EnvironmentError("Microsoft Graph client not initialized. Please check your credentials.")
 
-    async def check_availability(self, data: dict) -> dict:
+    @asynccontextmanager
+    async def batch(self):
+        """Pack Graph requests made by tool calls started inside this block into $batch requests."""
+        batch = GraphBatch(self)
+        reset_token = current_batch.set(batch)
+        try:
+            yield batch
+        finally:
+            current_batch.reset(reset_token)
+
+    def _throttle_key(self, path: str):
+        """Graph throttles per app and mailbox; requests outside /users/{id} count against our own."""
+        segments = path.split("?", 1)[0].split("/")
+        for i, segment in enumerate(segments[:-1]):
+            if segment == "users":
+                return (self.tenant_id, segments[i + 1].lower())
+        return (self.tenant_id, self.user_id.lower())
+
+    async def _graph_request(self, method: str, path: str, replayable: Optional[bool] = None, **kwargs):
+        """Send a Graph request, or queue it on the active batch if there is one, paced and retried per mailbox.
+        replayable marks a non-GET request as safe to repeat after a 503 (see GraphThrottle.call)."""
+        batch = current_batch.get()
+        # A $batch is sent with one tenant's token, so other tenants' requests go out on their own
+        if batch is not None and batch.client.tenant_id == self.tenant_id:
+            # The $batch POST is paced when it goes out; holding a slot here would keep the batch from filling
+            return await self.throttle.call(self._throttle_key(path), method,
+                                            lambda: batch.submit(method, path, **kwargs), paced=False,
+                                            replayable=replayable)
+        send = lambda: self._send_request(method, path, **kwargs)
+        return await self.throttle.call(self._throttle_key(path), method, send, replayable=replayable)
+
+    async def _send_request(self, method: str, path: str, **kwargs):
+        """Send an authenticated request to Microsoft Graph through the shared async pool."""
+        started = perf_counter()
+        token = await self.token_manager.get_token()
+        token_wait.observe(perf_counter() - started)
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        headers.update(kwargs.pop("headers", None) or {})
+        return await self.transport.request(method, path, headers=headers, **kwargs)
+
+    async def _iter_pages(self, path: str, params: Optional[dict] = None, page_size: int = GRAPH_PAGE_SIZE) -> AsyncIterator[dict]:
+        """Yield each page of a Graph collection, requesting the next one only when asked for it."""
+        headers = {"Prefer": f"odata.maxpagesize={page_size}"}
+        url = path
+        while url:
+            response = await self._graph_request("GET", url, params=params, headers=headers)
+            if response.status_code != 200:
+                logger.error(f"Graph API error: {response.status_code} {response.text}")
+                logger.error(f"Troubleshooting info: user_id={self.user_id}, url={url}, params={params}")
+                raise GraphAPIError(response.status_code, f"Graph request failed: {response.text}",
+                                    retry_after_seconds(response.headers))
+            page = response.json()
+            yield page
+            # nextLink already carries the original query
+            url = page.get('@odata.nextLink')
+            params = None
+
+    async def _calendar_view(self, start_dt: datetime, end_dt: datetime, page_size: int = GRAPH_PAGE_SIZE) -> AsyncIterator[List[dict]]:
+        """Yield pages of events overlapping a UTC range, from the mirror when it covers the range."""
+        if self.mirror is not None:
+            await self.mirror.check()
+            if self.mirror.covers(start_dt, end_dt):
+                yield self.mirror.query(start_dt, end_dt)
+                return
+        if self.series is not None:
+            async for page in self._expanded_view(start_dt, end_dt, page_size):
+                yield page
+            return
+        params = {
+            "startDateTime": start_dt.isoformat(),
+            "endDateTime": end_dt.isoformat()
+        }
+        async for page in self._iter_pages(f"/users/{self.user_id}/calendarView", params, page_size):
+            yield page.get('value', [])
+
+    async def _load_series(self) -> Tuple[List[Series], List[str]]:
+        """Fetch every series master with its exceptions; returns the compiled series and the ids left to Graph."""
+        params = {
+            "$filter": "type eq 'seriesMaster'",
+            "$select": SERIES_MASTER_FIELDS,
+            "$expand": "exceptionOccurrences"
+        }
+        series, unsupported = [], []
+        async for page in self._iter_pages(f"/users/{self.user_id}/events", params):
+            for master in page.get('value', []):
+                try:
+                    series.append(Series(master))
+                except RecurrenceError as e:
+                    logger.warning(f"Series {master.get('id')} will be expanded by Graph: {str(e)}")
+                    unsupported.append(master['id'])
+        logger.info(f"Loaded {len(series)} recurring series for {self.user_id}")
+        return series, unsupported
+
+    async def _expanded_view(self, start_dt: datetime, end_dt: datetime, page_size: int) -> AsyncIterator[List[dict]]:
+        """calendarView assembled locally: single events from Graph merged with series expanded in-process."""
+        series, unsupported = await self.series.run("series", self._load_series)
+        start, end = start_dt.strftime("%Y-%m-%dT%H:%M:%S"), end_dt.strftime("%Y-%m-%dT%H:%M:%S")
+        params = {
+            "$filter": f"type eq 'singleInstance' and start/dateTime lt '{end}' and end/dateTime gt '{start}'",
+            "$orderby": "start/dateTime"
+        }
+        singles = []
+        async for page in self._iter_pages(f"/users/{self.user_id}/events", params, page_size):
+            singles.extend(page.get('value', []))
+        window = {"startDateTime": start_dt.isoformat(), "endDateTime": end_dt.isoformat()}
+        for master_id in unsupported:
+            async for page in self._iter_pages(f"/users/{self.user_id}/events/{master_id}/instances", window, page_size):
+                singles.extend(page.get('value', []))
+        singles.sort(key=lambda event: event_epoch(event['start']))
+        page = []
+        for event in heapq.merge(singles, expand(series, start_dt, end_dt), key=lambda event: event_epoch(event['start'])):
+            page.append(event)
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    async def check_availability(self, data: AvailabilityInput) -> dict:
         """Check if there are any calendar conflicts for a given time range.
         Returns both 'available' and a list of busy/taken time slots in the requested timezone.
         """
         try:
             self._check_client()
-            # Extract time range from input data
-            start_time = data.get("start_time")
-            end_time = data.get("end_time")
-            timezone = data.get("timezone") or "America/New_York"
-            tz = pytz.timezone(timezone)
-            if not start_time or not end_time:
-                raise ValueError("start_time and end_time are required")
-            token = self.credential.get_token("https://graph.microsoft.com/.default").token
-            url = f"https://graph.microsoft.com/v1.0/users/{self.user_id}/calendarView"
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            params = {
-                "startDateTime": start_time,
-                "endDateTime": end_time
-            }
-            response = requests.get(url, headers=headers, params=params)
-            if response.status_code == 200:
-                events = response.json().get('value', [])
-                busy_times = []
-                for event in events:
-                    # Convert UTC or offset time to requested timezone
-                    start_dt_utc = dateutil.parser.isoparse(event['start']['dateTime'])
-                    end_dt_utc = dateutil.parser.isoparse(event['end']['dateTime'])
-                    if start_dt_utc.tzinfo is None:
-                        start_dt_utc = pytz.UTC.localize(start_dt_utc)
-                    if end_dt_utc.tzinfo is None:
-                        end_dt_utc = pytz.UTC.localize(end_dt_utc)
-                    start_local = start_dt_utc.astimezone(tz).replace(tzinfo=None)
-                    end_local = end_dt_utc.astimezone(tz).replace(tzinfo=None)
-                    busy_times.append({
-                        "start": start_local.isoformat(),
-                        "end": end_local.isoformat(),
-                        "subject": event.get('subject', '')
-                    })
-                return {
-                    "available": len(events) == 0,
-                    "busy_times": busy_times
-                }
-            else:
-                logger.error(f"Graph API error: {response.status_code} {response.text}")
-                logger.error(f"Troubleshooting info: user_id={self.user_id}, url={url}, params={params}, token_present={bool(token)}")
-                raise Exception(f"Failed to check availability: {response.text}")
+            timezone = data.timezone
+            tz = get_zone(timezone)
+            start_dt = self.ensure_utc(data.start_time)
+            end_dt = self.ensure_utc(data.end_time)
+            # Pooled clients share the cache; the same UPN in two tenants is two calendars
+            key = ("availability", self.tenant_id, self.user_id, start_dt, end_dt, timezone)
+            return await self.reads.run(key, lambda: self._busy_times(start_dt, end_dt, tz))
+        except (ValueError, HTTPException):
+            # Bad parameters keep their 400 (and HTTP errors their status) in run_tool
+            raise
         except Exception as e:
             logger.exception("Failed to check availability")
-            from fastapi import HTTPException
-            raise HTTPException(status_code=500, detail=f"Error checking availability: {str(e)}")
+            raise Exception(f"Error checking availability: {str(e)}")
+
+    async def _busy_times(self, start_dt: datetime, end_dt: datetime, tz) -> dict:
+        busy_times = []
+        # Convert each page as it arrives rather than collecting the whole view first
+        async for events in self._calendar_view(start_dt, end_dt):
+            # Convert UTC or offset times to the requested timezone, a page at a time
+            busy_times.extend(localize_events(events, tz))
+        return {
+            "available": len(busy_times) == 0,
+            "busy_times": busy_times
+        }
 
     def ensure_datetime(self, dt):
-        if isinstance(dt, datetime):
-            return dt
-        return dateutil.parser.isoparse(dt)
+        return parse_iso(dt)
 
-    async def add_event(self, event: dict) -> EventResponse:
+    def ensure_utc(self, dt):
+        """Parse to an aware UTC datetime; naive values are taken as UTC, as Graph does."""
+        return to_utc(dt)
+
+    async def add_event(self, event: CreateMeetingInput) -> EventResponse:
         try:
             self._check_client()
-            # Ensure start_time and end_time are datetime objects
-            start_time = self.ensure_datetime(event['start_time'])
-            end_time = self.ensure_datetime(event['end_time'])
-            # Convert to UTC for the API
-            start_time_utc = start_time.astimezone(pytz.UTC)
-            end_time_utc = end_time.astimezone(pytz.UTC)
-            # Use standard ISO8601 format with 'Z' for UTC
-            start_time_str = start_time_utc.isoformat().replace('+00:00', 'Z')
-            end_time_str = end_time_utc.isoformat().replace('+00:00', 'Z')
+            # Convert to UTC in standard ISO8601 format with 'Z' for the API
+            start_time_str = format_graph_utc(event.start_time)
+            end_time_str = format_graph_utc(event.end_time)
             event_data = {
-                "subject": event['title'],
+                "subject": event.title,
                 "start": {
                     "dateTime": start_time_str,
                     "timeZone": "UTC"
@@ -159,7 +346,7 @@ class MicrosoftCalendarClient:
                 },
                 "body": {
                     "contentType": "text",
-                    "content": event.get('body') or event.get('description') or ""
+                    "content": event.body or event.description or ""
                 },
                 "location": {
                     "displayName": "Online"
@@ -167,22 +354,21 @@ class MicrosoftCalendarClient:
                 "isOnlineMeeting": True,
                 "onlineMeetingProvider": "teamsForBusiness"
             }
-            # Log the event data for debugging
-            logger.info(f"Creating event with data: {event_data}")
-            endpoint = f'https://graph.microsoft.com/v1.0/users/{self.user_id}/calendar/events'
-            token = self.credential.get_token("https://graph.microsoft.com/.default").token
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            # Log the request details
-            logger.info(f"Making request to: {endpoint}")
-            logger.info(f"Headers: {headers}")
-            response = requests.post(endpoint, headers=headers, json=event_data)
-            # Log the response for debugging
-            logger.info(f"Response status: {response.status_code}")
-            logger.info(f"Response body: {response.text}")
+            if event.idempotency_key:
+                # Lets Graph recognize a create it already performed, even across server restarts
+                event_data["transactionId"] = event.idempotency_key
+            endpoint = f'/users/{self.user_id}/calendar/events'
+            # Log the request and response of a sampled fraction of calls for debugging
+            trace = sampled("graph", logger)
+            if trace:
+                logger.info("Creating event via %s with data: %s", endpoint, LazyJSON(event_data))
+            # Graph recognizes a repeated transactionId, so only a create carrying one is retried after a 503
+            response = await self._graph_request("POST", endpoint, replayable=bool(event.idempotency_key),
+                                                 json=event_data)
+            if trace:
+                logger.info("Create event response: %s %s", response.status_code, response.text)
             if response.status_code == 201:
+                await self._invalidate_reads()
                 data = response.json()
                 join_url = None
                 if 'onlineMeeting' in data and data['onlineMeeting'] and 'joinUrl' in data['onlineMeeting']:
@@ -193,22 +379,17 @@ class MicrosoftCalendarClient:
                     virtual_meeting_link=join_url
                 )
             else:
-                raise Exception(f"Failed to create event: {response.text}")
+                raise GraphAPIError(response.status_code, f"Failed to create event: {response.text}",
+                                    retry_after_seconds(response.headers))
         except Exception as e:
             logger.error(f"Error creating event: {str(e)}")
             raise Exception(f"Error creating event: {str(e)}")
 
-    async def update_event(self, event: dict) -> EventResponse:
+    async def update_event(self, event_obj: UpdateMeetingInput) -> EventResponse:
         try:
             self._check_client()
-            event_obj = EventUpdate(**event)
-            # Ensure start_time and end_time are datetime objects
-            start_time = self.ensure_datetime(event_obj.start_time)
-            end_time = self.ensure_datetime(event_obj.end_time)
-            start_time_utc = start_time.astimezone(pytz.UTC)
-            end_time_utc = end_time.astimezone(pytz.UTC)
-            start_time_str = start_time_utc.isoformat().replace('+00:00', 'Z')
-            end_time_str = end_time_utc.isoformat().replace('+00:00', 'Z')
+            start_time_str = format_graph_utc(event_obj.start_time)
+            end_time_str = format_graph_utc(event_obj.end_time)
             event_data = {
                 "subject": event_obj.title,
                 "start": {
@@ -221,98 +402,315 @@ class MicrosoftCalendarClient:
                 },
                 "body": {
                     "contentType": "text",
-                    "content": getattr(event_obj, 'body', None) or getattr(event_obj, 'description', None) or ""
+                    "content": event_obj.body or event_obj.description or ""
                 }
             }
             # Only add location if present
-            location = getattr(event_obj, 'location', None)
+            location = event_obj.location
             if location:
                 event_data["location"] = {"displayName": location}
-            endpoint = f'https://graph.microsoft.com/v1.0/users/{self.user_id}/calendar/events/{event_obj.event_id}'
-            token = self.credential.get_token("https://graph.microsoft.com/.default").token
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            response = requests.patch(endpoint, headers=headers, json=event_data)
+            endpoint = f'/users/{self.user_id}/calendar/events/{event_obj.event_id}'
+            response = await self._graph_request("PATCH", endpoint, json=event_data)
             if response.status_code == 200:
+                await self._invalidate_reads()
                 return EventResponse(
                     event_id=event_obj.event_id,
                     status="updated"
                 )
             else:
-                raise Exception(f"Failed to update event: {response.text}")
+                raise GraphAPIError(response.status_code, f"Failed to update event: {response.text}",
+                                    retry_after_seconds(response.headers))
         except Exception as e:
             logger.error(f"Error updating event: {str(e)}")
             raise Exception(f"Error updating event: {str(e)}")
 
-    async def delete_event(self, event: EventDelete) -> EventResponse:
+    async def delete_event(self, event: DeleteMeetingInput) -> EventResponse:
         """Delete a calendar event."""
         try:
             self._check_client()
             
             # Create and send the request
-            endpoint = f'https://graph.microsoft.com/v1.0/users/{self.user_id}/calendar/events/{event.event_id}'
-            token = self.credential.get_token("https://graph.microsoft.com/.default").token
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            response = requests.delete(endpoint, headers=headers)
+            endpoint = f'/users/{self.user_id}/calendar/events/{event.event_id}'
+            response = await self._graph_request("DELETE", endpoint)
             
             if response.status_code == 204:
+                await self._invalidate_reads()
                 return EventResponse(
                     event_id=event.event_id,
                     status="deleted"
                 )
             else:
-                raise Exception(f"Failed to delete event: {response.text}")
+                raise GraphAPIError(response.status_code, f"Failed to delete event: {response.text}",
+                                    retry_after_seconds(response.headers))
                 
         except Exception as e:
             logger.error(f"Error deleting event: {str(e)}")
             raise Exception(f"Error deleting event: {str(e)}")
 
-    async def find_meetings_near_time(self, data: dict) -> dict:
+    async def find_meetings_near_time(self, input_data: CheckMeetingAtTimeInput) -> dict:
         try:
             self._check_client()
-            input_data = CheckMeetingAtTimeInput(**data)
-            # Parse date and time
-            # Combine date and time
-            dt_str = f"{input_data.date}T{input_data.time}:00"
-            tz = pytz.timezone(input_data.timezone) if input_data.timezone else pytz.UTC
-            dt = tz.localize(datetime.strptime(dt_str, "%Y-%m-%dT%H:%M:%S"))
+            # Combine date and time in the caller's timezone
+            tz = get_zone(input_data.timezone) if input_data.timezone else UTC
+            dt = datetime.combine(input_data.date, input_data.time.replace(tzinfo=None), tzinfo=tz)
             window = timedelta(minutes=input_data.window_minutes or 15)
-            start_dt = (dt - window).astimezone(pytz.UTC)
-            end_dt = (dt + window).astimezone(pytz.UTC)
-            # Query Microsoft Graph API
-            token = self.credential.get_token("https://graph.microsoft.com/.default").token
-            url = f"https://graph.microsoft.com/v1.0/users/{self.user_id}/calendarView"
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            params = {
-                "startDateTime": start_dt.isoformat(),
-                "endDateTime": end_dt.isoformat()
-            }
-            response = requests.get(url, headers=headers, params=params)
-            events = []
-            has_meeting = False
-            if response.status_code == 200:
-                for event in response.json().get('value', []):
-                    has_meeting = True
-                    events.append(MeetingEvent(
-                        subject=event.get('subject', ''),
-                        start=event['start']['dateTime'],
-                        end=event['end']['dateTime'],
-                        location=event.get('location', {}).get('displayName', '')
-                    ))
-                return CheckMeetingAtTimeResponse(has_meeting=has_meeting, events=events)
-            else:
-                raise Exception(f"Failed to check meetings: {response.text}")
+            start_dt = (dt - window).astimezone(UTC)
+            end_dt = (dt + window).astimezone(UTC)
+            # The result doesn't depend on the caller's timezone, only on the UTC window
+            key = ("meetings", self.tenant_id, self.user_id, start_dt, end_dt)
+            return await self.reads.run(key, lambda: self._meetings_in_window(start_dt, end_dt))
+        except (ValueError, HTTPException):
+            raise
         except Exception as e:
             logger.error(f"Error in find_meetings_near_time: {str(e)}")
             raise Exception(f"Error in find_meetings_near_time: {str(e)}")
 
+    async def _meetings_in_window(self, start_dt: datetime, end_dt: datetime) -> CheckMeetingAtTimeResponse:
+        # Query Microsoft Graph API (or the local mirror)
+        events = []
+        has_meeting = False
+        async for page in self._calendar_view(start_dt, end_dt):
+            for event in page:
+                has_meeting = True
+                events.append(MeetingEvent(
+                    subject=event.get('subject', ''),
+                    start=event['start']['dateTime'],
+                    end=event['end']['dateTime'],
+                    location=event.get('location', {}).get('displayName', '')
+                ))
+        return CheckMeetingAtTimeResponse(has_meeting=has_meeting, events=events)
+
+    async def check_group_availability(self, data: GroupAvailabilityInput) -> dict:
+        """Find shared busy and free blocks for several attendees over a time range."""
+        try:
+            self._check_client()
+            # Drop duplicates but keep the caller's order for chunking
+            attendees = list(dict.fromkeys(a.strip() for a in data.attendees if a and a.strip()))
+            if not attendees:
+                raise ValueError("At least one attendee is required")
+            timezone = data.timezone
+            tz = get_zone(timezone)
+            start_dt = self.ensure_utc(data.start_time)
+            end_dt = self.ensure_utc(data.end_time)
+            include_tentative = data.include_tentative
+            key = ("schedule", self.tenant_id, self.user_id, tuple(sorted(attendees)), start_dt, end_dt, timezone,
+                   include_tentative)
+            return await self.reads.run(
+                key, lambda: self._group_availability(attendees, start_dt, end_dt, tz, include_tentative)
+            )
+        except (ValueError, HTTPException):
+            raise
+        except Exception as e:
+            logger.error(f"Error checking group availability: {str(e)}")
+            raise Exception(f"Error checking group availability: {str(e)}")
+
+    async def _get_schedule_chunk(self, attendees: List[str], start_dt: datetime, end_dt: datetime) -> List[dict]:
+        body = {
+            "schedules": attendees,
+            "startTime": {
+                "dateTime": start_dt.strftime("%Y-%m-%dT%H:%M:%S"),
+                "timeZone": "UTC"
+            },
+            "endTime": {
+                "dateTime": end_dt.strftime("%Y-%m-%dT%H:%M:%S"),
+                "timeZone": "UTC"
+            },
+            "availabilityViewInterval": 15
+        }
+        # getSchedule only reads, so it is safe to repeat
+        response = await self._graph_request("POST", f"/users/{self.user_id}/calendar/getSchedule",
+                                             replayable=True, json=body)
+        if response.status_code != 200:
+            raise GraphAPIError(response.status_code, f"Failed to get schedules: {response.text}",
+                                retry_after_seconds(response.headers))
+        return response.json().get('value', [])
+
+    async def _schedule_busy(self, attendees: List[str], start_dt: datetime, end_dt: datetime, include_tentative: bool = True):
+        """Busy intervals (epoch seconds, unmerged) across attendees, plus per-attendee lookup errors."""
+        chunks = [attendees[i:i + GRAPH_SCHEDULE_CHUNK] for i in range(0, len(attendees), GRAPH_SCHEDULE_CHUNK)]
+        results = await asyncio.gather(*(self._get_schedule_chunk(chunk, start_dt, end_dt) for chunk in chunks))
+        busy_statuses = {"busy", "oof", "tentative"} if include_tentative else {"busy", "oof"}
+        busy = []
+        schedule_errors = {}
+        for schedules in results:
+            for schedule in schedules:
+                if schedule.get('error'):
+                    schedule_errors[schedule.get('scheduleId', '')] = schedule['error'].get('message', 'Schedule unavailable')
+                    continue
+                for item in schedule.get('scheduleItems', []):
+                    if item.get('status') in busy_statuses:
+                        busy.append((event_epoch(item['start']), event_epoch(item['end'])))
+        return busy, schedule_errors
+
+    async def _group_availability(self, attendees: List[str], start_dt: datetime, end_dt: datetime, tz, include_tentative: bool) -> dict:
+        busy, schedule_errors = await self._schedule_busy(attendees, start_dt, end_dt, include_tentative)
+        window_start = start_dt.timestamp()
+        window_end = end_dt.timestamp()
+        merged = merge_intervals(clip_intervals(busy, window_start, window_end))
+        free = free_intervals(merged, window_start, window_end)
+
+        return {
+            "available": len(merged) == 0,
+            "busy_times": [{"start": local_iso(s, tz), "end": local_iso(e, tz)} for s, e in merged],
+            "free_times": [{"start": local_iso(s, tz), "end": local_iso(e, tz)} for s, e in free],
+            "schedule_errors": schedule_errors
+        }
+
+    async def find_free_slots(self, data: FindFreeSlotsInput) -> dict:
+        """Suggest free meeting slots of a given length inside working hours."""
+        try:
+            self._check_client()
+            tz = get_zone(data.timezone)
+            start_dt = self.ensure_utc(data.start_time)
+            end_dt = self.ensure_utc(data.end_time)
+            duration = data.duration_minutes * 60
+            step = data.granularity_minutes * 60
+            day_start = data.working_hours_start
+            day_end = data.working_hours_end
+            weekdays = set(range(7)) if data.include_weekends else set(range(5))
+            attendees = list(dict.fromkeys(a.strip() for a in data.attendees if a and a.strip()))
+
+            window_start = start_dt.timestamp()
+            window_end = end_dt.timestamp()
+            schedule_errors = {}
+            if attendees:
+                busy, schedule_errors = await self._schedule_busy(attendees, start_dt, end_dt)
+            else:
+                busy = []
+                async for events in self._calendar_view(start_dt, end_dt):
+                    for event in events:
+                        # Events marked free or working elsewhere don't block a slot
+                        if event.get('showAs') in ("free", "workingElsewhere"):
+                            continue
+                        busy.append((event_epoch(event['start']), event_epoch(event['end'])))
+            merged = merge_busy(busy, window_start, window_end)
+            windows = working_windows(window_start, window_end, tz, day_start, day_end, weekdays)
+            slots = find_slots(merged, windows, duration, step, data.max_results)
+
+            return {
+                "slots": [{"start": local_iso(s, tz), "end": local_iso(e, tz)} for s, e, _ in slots],
+                "schedule_errors": schedule_errors
+            }
+        except (ValueError, HTTPException):
+            raise
+        except Exception as e:
+            logger.error(f"Error finding free slots: {str(e)}")
+            raise Exception(f"Error finding free slots: {str(e)}")
+
+class CalendarClientPool:
+    """Calendar clients keyed by (tenant, mailbox), so one process serves many calendars.
+
+    Clients in a tenant share its credential and token cache; all of them share
+    the Graph connection pool, read cache and throttle. Clients are cheap, so
+    the least recently used are dropped beyond MAILBOX_POOL_SIZE or after
+    MAILBOX_IDLE_TTL seconds unused. Only the default mailbox is mirrored.
+    With a subscription manager, every client's mailbox is subscribed to
+    change notifications while the client is held.
+    """
+
+    def __init__(self, default: MicrosoftCalendarClient, max_clients: int = MAILBOX_POOL_SIZE,
+                 idle_ttl: float = MAILBOX_IDLE_TTL, subscriptions: Optional[SubscriptionManager] = None):
+        self.default = default
+        self.subscriptions = subscriptions
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self._tenants = {default.tenant_id: (default.credential, default.token_manager)}
+        self._clients: "OrderedDict[tuple, Tuple[MicrosoftCalendarClient, float]]" = OrderedDict()
+        self._allowed_mailboxes = [p.strip().lower() for p in MS_ALLOWED_MAILBOXES.split(",") if p.strip()]
+        self._allowed_tenants = {default.tenant_id} | {t.strip() for t in MS_ALLOWED_TENANTS.split(",") if t.strip()}
+        self.evicted = 0
+
+    def _tenant_auth(self, tenant_id: str):
+        auth = self._tenants.get(tenant_id)
+        if auth is None:
+            if tenant_id not in self._allowed_tenants:
+                raise ValueError(f"Tenant '{tenant_id}' is not allowed")
+            credential = LazyClientSecretCredential(
+                tenant_id=tenant_id,
+                client_id=self.default.client_id,
+                client_secret=self.default.client_secret
+            )
+            auth = self._tenants[tenant_id] = (credential, GraphTokenManager(credential, store=shared_state))
+            logger.info(f"Microsoft Graph credential created for tenant {tenant_id}")
+        return auth
+
+    def _evict(self, now: float):
+        while self._clients:
+            _, last_used = next(iter(self._clients.values()))
+            if len(self._clients) <= self.max_clients and now - last_used < self.idle_ttl:
+                break
+            (tenant_id, mailbox), _ = self._clients.popitem(last=False)
+            self.evicted += 1
+            if self.subscriptions is not None:
+                self.subscriptions.unwatch(tenant_id, mailbox)
+
+    def get(self, mailbox: Optional[str] = None, tenant_id: Optional[str] = None) -> MicrosoftCalendarClient:
+        """Client for a mailbox (user id or UPN); the default mailbox and tenant when not given."""
+        tenant_id = tenant_id or self.default.tenant_id
+        mailbox = mailbox or self.default.user_id
+        if tenant_id == self.default.tenant_id and mailbox.lower() == self.default.user_id.lower():
+            return self.default
+        if not MAILBOX_PATTERN.match(mailbox):
+            raise ValueError(f"Invalid mailbox '{mailbox}': expected a user principal name or object id")
+        if not any(fnmatch(mailbox.lower(), pattern) for pattern in self._allowed_mailboxes):
+            raise ValueError(f"Mailbox '{mailbox}' is not allowed")
+
+        now = monotonic()
+        key = (tenant_id, mailbox.lower())
+        entry = self._clients.get(key)
+        if entry is None:
+            credential, token_manager = self._tenant_auth(tenant_id)
+            client = MicrosoftCalendarClient(
+                user_id=mailbox, tenant_id=tenant_id, credential=credential, token_manager=token_manager,
+                reads=self.default.reads, throttle=self.default.throttle
+            )
+            if self.subscriptions is not None:
+                self.subscriptions.watch(client)
+        else:
+            client = entry[0]
+        self._clients[key] = (client, now)
+        self._clients.move_to_end(key)
+        self._evict(now)
+        return client
+
+    def handler(self, method_name: str) -> Callable[[MailboxSelection], Awaitable[Any]]:
+        """Tool handler that runs a MicrosoftCalendarClient method on the client for the call's mailbox."""
+        async def handle(data: MailboxSelection):
+            client = self.get(data.mailbox, data.tenant_id)
+            return await getattr(client, method_name)(data)
+        handle.__name__ = method_name
+        return handle
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "tenants": len(self._tenants),
+            "evicted": self.evicted
+        }
+
+    async def start(self):
+        await self.default.start()
+        if self.subscriptions is not None:
+            self.subscriptions.watch(self.default)
+            await self.subscriptions.start()
+
+    async def aclose(self):
+        """Delete change subscriptions, stop extra tenants' token refresh, then close the default client
+        and the shared HTTP pool."""
+        if self.subscriptions is not None:
+            await self.subscriptions.aclose()
+        for _, token_manager in self._tenants.values():
+            if token_manager is not self.default.token_manager:
+                await token_manager.aclose()
+        self._clients.clear()
+        await self.default.aclose()
+
 # Create a singleton instance
 calendar_client = MicrosoftCalendarClient()
+calendar_pool = CalendarClientPool(calendar_client, subscriptions=subscription_manager)
+
+# Cached reads of a calendar are dropped as soon as it is known to have changed
+invalidation_bus.subscribe(
+    lambda tenant_id, mailbox, ranges: calendar_client.reads.invalidate(
+        lambda key: read_affected(key, tenant_id, mailbox, ranges))
+)
@@ -0,0 +1,200 @@
+import heapq
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from tools.timeutil import UTC, graph_epoch, resolve_zone
+
+# calendarView renders event times in UTC with seven fractional digits
+GRAPH_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.0000000"
+
+WEEKDAYS = {name: i for i, name in enumerate(
+    ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"])}
+INDEXES = {"first": 0, "second": 1, "third": 2, "fourth": 3, "last": -1}
+PATTERNS = {"daily", "weekly", "absoluteMonthly", "relativeMonthly", "absoluteYearly", "relativeYearly"}
+# Master properties describing the series rather than one occurrence
+_SERIES_ONLY = {"recurrence", "exceptionOccurrences", "cancelledOccurrences", "@odata.etag"}
+
+
+class RecurrenceError(ValueError):
+    """Raised for a series whose pattern or time zone can't be expanded locally."""
+
+
+def _aware(value: dict) -> datetime:
+    """Aware datetime for a Graph dateTimeTimeZone."""
+    dt = datetime.fromisoformat(value["dateTime"])
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=resolve_zone(value.get("timeZone") or "UTC"))
+    return dt
+
+
+def _graph_time(dt: datetime) -> dict:
+    return {"dateTime": dt.strftime(GRAPH_DATETIME_FORMAT), "timeZone": "UTC"}
+
+
+class Series:
+    """A recurring series compiled from its Graph seriesMaster, expanded on demand.
+
+    Occurrences follow the pattern in the recurrence time zone, so the wall-clock
+    start stays put across DST changes, and keep the master's duration.
+    Cancelled occurrences are skipped and modified ones replaced by their
+    exception, as calendarView does.
+    """
+
+    def __init__(self, master: dict):
+        recurrence = master.get("recurrence") or {}
+        pattern = recurrence.get("pattern") or {}
+        series_range = recurrence.get("range") or {}
+        self.id = master.get("id")
+        self.kind = pattern.get("type")
+        if self.kind not in PATTERNS:
+            raise RecurrenceError(f"Unsupported recurrence pattern '{self.kind}'")
+        try:
+            self.interval = max(int(pattern.get("interval") or 1), 1)
+            self.days = {WEEKDAYS[day.lower()] for day in pattern.get("daysOfWeek") or []}
+            self.first_day = WEEKDAYS[(pattern.get("firstDayOfWeek") or "sunday").lower()]
+            self.index = INDEXES[(pattern.get("index") or "first").lower()]
+            self.day_of_month = int(pattern.get("dayOfMonth") or 0)
+            self.month = int(pattern.get("month") or 0)
+            # All-day events span floating midnights, which Graph renders as UTC midnights
+            self.zone = UTC if master.get("isAllDay") else resolve_zone(
+                series_range.get("recurrenceTimeZone") or master.get("originalStartTimeZone")
+                or master["start"].get("timeZone") or "UTC")
+            start = _aware(master["start"])
+            self.duration = _aware(master["end"]) - start
+        except (KeyError, ValueError) as e:
+            raise RecurrenceError(f"Invalid recurrence for series {self.id}: {str(e)}")
+        if self.kind in ("weekly", "relativeMonthly", "relativeYearly") and not self.days:
+            raise RecurrenceError(f"{self.kind} recurrence without daysOfWeek")
+        if self.kind in ("absoluteMonthly", "absoluteYearly") and not 1 <= self.day_of_month <= 31:
+            raise RecurrenceError(f"{self.kind} recurrence without a valid dayOfMonth")
+        if self.kind.endswith("Yearly") and not 1 <= self.month <= 12:
+            raise RecurrenceError(f"{self.kind} recurrence without a valid month")
+
+        local_start = start.astimezone(self.zone)
+        self.time_of_day = local_start.time()
+        self.start_date = date.fromisoformat(series_range["startDate"]) if series_range.get("startDate") \
+            else local_start.date()
+        range_type = series_range.get("type") or "noEnd"
+        self.end_date = date.fromisoformat(series_range["endDate"]) if range_type == "endDate" else None
+        self.count = int(series_range.get("numberOfOccurrences") or 0) if range_type == "numbered" else None
+
+        self.template = {k: v for k, v in master.items() if k not in _SERIES_ONLY}
+        self.template["type"] = "occurrence"
+        self.template["seriesMasterId"] = self.id
+        # cancelledOccurrences entries look like "OID.<id>.2025-05-20"
+        self.cancelled = {date.fromisoformat(entry.rsplit(".", 1)[-1])
+                          for entry in master.get("cancelledOccurrences") or []}
+        # Occurrences moved or edited are served from their exception instead
+        self.replaced = set()
+        self.exceptions: List[Tuple[float, float, dict]] = []
+        for exception in master.get("exceptionOccurrences") or []:
+            if exception.get("originalStart"):
+                self.replaced.add(graph_epoch(exception["originalStart"]))
+            if exception.get("isCancelled"):
+                continue
+            exc_start = _aware(exception["start"]).astimezone(UTC)
+            exc_end = _aware(exception["end"]).astimezone(UTC)
+            event = dict(exception, start=_graph_time(exc_start), end=_graph_time(exc_end))
+            event.setdefault("type", "exception")
+            event.setdefault("seriesMasterId", self.id)
+            self.exceptions.append((exc_start.timestamp(), exc_end.timestamp(), event))
+        self.exceptions.sort(key=itemgetter(0))
+
+    def _day_in_month(self, year: int, month: int) -> Optional[date]:
+        """The pattern's day in a month: the dayOfMonth (clamped to short months) or the index-th matching weekday."""
+        first_weekday, days = monthrange(year, month)
+        if self.kind in ("absoluteMonthly", "absoluteYearly"):
+            return date(year, month, min(self.day_of_month, days))
+        matches = [day for day in range(1, days + 1) if (first_weekday + day - 1) % 7 in self.days]
+        if self.index >= len(matches):
+            return None
+        return date(year, month, matches[self.index])
+
+    def _dates(self, skip_to: Optional[date] = None) -> Iterator[date]:
+        """Local dates the pattern yields from the range start on, ignoring the range end.
+
+        With skip_to, whole intervals ending before it are skipped arithmetically
+        instead of being generated.
+        """
+        start = self.start_date
+        interval = self.interval
+        if self.kind == "daily":
+            skip = max((skip_to - start).days // interval, 0) if skip_to else 0
+            day = start + timedelta(days=skip * interval)
+            step = timedelta(days=interval)
+            while True:
+                yield day
+                day += step
+        elif self.kind == "weekly":
+            week = start - timedelta(days=(start.weekday() - self.first_day) % 7)
+            if skip_to:
+                week += timedelta(weeks=max((skip_to - week).days // (7 * interval), 0) * interval)
+            offsets = sorted((day - self.first_day) % 7 for day in self.days)
+            step = timedelta(weeks=interval)
+            while True:
+                for offset in offsets:
+                    day = week + timedelta(days=offset)
+                    if day >= start:
+                        yield day
+                week += step
+        elif self.kind.endswith("Monthly"):
+            months = start.year * 12 + start.month - 1
+            if skip_to:
+                months += max((skip_to.year * 12 + skip_to.month - 1 - months) // interval, 0) * interval
+            while True:
+                year, month = divmod(months, 12)
+                day = self._day_in_month(year, month + 1)
+                if day is not None and day >= start:
+                    yield day
+                months += interval
+        else:
+            year = start.year
+            if skip_to:
+                year += max((skip_to.year - year) // interval, 0) * interval
+            while True:
+                day = self._day_in_month(year, self.month)
+                if day is not None and day >= start:
+                    yield day
+                year += interval
+
+    def _regular(self, window_start: float, window_end: float) -> Iterator[Tuple[float, dict]]:
+        duration = self.duration.total_seconds()
+        skip_to = None
+        if self.count is None:
+            # Numbered series must count from the first occurrence; others can jump near the window
+            earliest = datetime.fromtimestamp(window_start - duration, self.zone).date()
+            skip_to = earliest - timedelta(days=1)
+        seen = 0
+        for day in self._dates(skip_to):
+            if self.end_date is not None and day > self.end_date:
+                return
+            seen += 1
+            if self.count is not None and seen > self.count:
+                return
+            start = datetime.combine(day, self.time_of_day, tzinfo=self.zone).astimezone(UTC)
+            epoch = start.timestamp()
+            if epoch >= window_end:
+                return
+            if epoch + duration <= window_start or day in self.cancelled or epoch in self.replaced:
+                continue
+            event = dict(self.template)
+            event["id"] = f"{self.id}.{day.isoformat()}"
+            event["start"] = _graph_time(start)
+            event["end"] = _graph_time(start + self.duration)
+            yield epoch, event
+
+    def occurrences(self, window_start: float, window_end: float) -> Iterator[Tuple[float, dict]]:
+        """(start epoch, event) for each occurrence overlapping [window_start, window_end), by start time."""
+        exceptions = ((start, event) for start, end, event in self.exceptions
+                      if start < window_end and end > window_start)
+        return heapq.merge(self._regular(window_start, window_end), exceptions, key=itemgetter(0))
+
+
+def expand(series: Iterable[Series], start_dt: datetime, end_dt: datetime) -> Iterator[dict]:
+    """Lazily yield every series' occurrences overlapping a UTC range, in calendarView's shape and start order."""
+    window_start, window_end = start_dt.timestamp(), end_dt.timestamp()
+    streams = [s.occurrences(window_start, window_end) for s in series]
+    for _, event in heapq.merge(*streams, key=itemgetter(0)):
+        yield event
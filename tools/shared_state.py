@@ -0,0 +1,297 @@
+import asyncio
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+# SQLite file the worker processes of one server share tokens, cached reads and leases through;
+# set by main when WEB_CONCURRENCY > 1 (set it yourself for gunicorn-style pre-fork workers)
+SHARED_STATE_PATH = os.environ.get("SHARED_STATE_PATH", "")
+# Seconds a lease (leadership, a token refresh, a read in flight) is held before another worker may take over
+SHARED_LEASE_TTL = float(os.environ.get("SHARED_LEASE_TTL", 15))
+# Seconds between checks while waiting on another worker's lease, doubling up to the maximum
+SHARED_POLL_INTERVAL = 0.01
+SHARED_POLL_MAX_INTERVAL = 0.25
+# Expired results are swept after this many writes
+SHARED_PRUNE_EVERY = 64
+
+# Identifies this process in leases and relayed messages
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    name TEXT PRIMARY KEY,
+    token TEXT NOT NULL,
+    expires_on REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    key_blob BLOB NOT NULL,
+    value BLOB NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS generations (
+    namespace TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    until REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS relayed (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    body BLOB NOT NULL
+);
+"""
+
+
+class SharedStateStore:
+    """State the worker processes of one server share, in one SQLite file.
+
+    Holds access tokens, cached results (pickled, so only this server's own
+    processes may write the file), leases that let one worker do a job the
+    others wait for, and a queue for messages relayed to the leader.
+
+    Every operation runs on one thread per process, so the event loop never
+    waits on the file or on another worker's transaction, and operations run
+    in the order they were issued: an invalidate() queued without waiting is
+    still seen by every read issued after it.
+    """
+
+    def __init__(self, path: str, worker_id: str = WORKER_ID):
+        self.path = path
+        self.worker_id = worker_id
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _queue(self, fn: Callable, *args):
+        """Run fn on the store's thread without waiting for it; failures are logged."""
+        def done(future: Future):
+            if not future.cancelled() and future.exception() is not None:
+                logger.error(f"Shared state update failed: {str(future.exception())}")
+        self._executor.submit(fn, *args).add_done_callback(done)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Tokens and cached calendar data: readable by this user only
+            os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run fn in a write transaction; IMMEDIATE so concurrent writers queue instead of failing."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _read(self, sql: str, params: tuple = ()) -> Optional[tuple]:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchone()
+
+    # Tokens
+
+    async def get_token(self, name: str) -> Optional[Tuple[str, float]]:
+        return await self._run(self._read, "SELECT token, expires_on FROM tokens WHERE name = ?", (name,))
+
+    async def put_token(self, name: str, token: str, expires_on: float):
+        await self._run(self._write, lambda conn: conn.execute("INSERT OR REPLACE INTO tokens VALUES (?, ?, ?)",
+                                                               (name, token, expires_on)))
+
+    # Leases
+
+    async def try_lease(self, name: str, ttl: float = SHARED_LEASE_TTL) -> bool:
+        """Take or extend a lease; False while another worker holds it."""
+        def take(conn):
+            now = time.time()
+            conn.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE "
+                "SET owner = excluded.owner, until = excluded.until "
+                "WHERE leases.until < ? OR leases.owner = excluded.owner",
+                (name, self.worker_id, now + ttl, now))
+            return conn.execute("SELECT changes()").fetchone()[0] == 1
+        return await self._run(self._write, take)
+
+    async def lease_held(self, name: str) -> bool:
+        """Whether another worker holds the lease; a read, cheaper than try_lease() while waiting on it."""
+        row = await self._run(self._read, "SELECT owner, until FROM leases WHERE name = ?", (name,))
+        return row is not None and row[0] != self.worker_id and row[1] >= time.time()
+
+    async def release(self, name: str):
+        await self._run(self._write, lambda conn: conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?",
+                                                               (name, self.worker_id)))
+
+    # Results
+
+    async def get_result(self, namespace: str, key: str) -> Tuple[bool, Any]:
+        def get():
+            row = self._read("SELECT value, expires FROM results WHERE namespace = ? AND key = ?", (namespace, key))
+            if row is None or row[1] <= time.time():
+                return False, None
+            return True, pickle.loads(row[0])
+        return await self._run(get)
+
+    async def generation(self, namespace: str) -> int:
+        row = await self._run(self._read, "SELECT value FROM generations WHERE namespace = ?", (namespace,))
+        return row[0] if row else 0
+
+    async def put_result(self, namespace: str, key: str, key_obj: Hashable, value: Any, ttl: float,
+                         generation: int, max_entries: int) -> bool:
+        """Store a result unless the namespace was invalidated since generation was read."""
+        key_blob, value_blob = pickle.dumps(key_obj), pickle.dumps(value)
+        self._writes += 1
+        prune = self._writes % SHARED_PRUNE_EVERY == 0
+
+        def put(conn):
+            now = time.time()
+            row = conn.execute("SELECT value FROM generations WHERE namespace = ?", (namespace,)).fetchone()
+            if (row[0] if row else 0) != generation:
+                return False
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                         (namespace, key, key_blob, value_blob, now + ttl))
+            if prune:
+                conn.execute("DELETE FROM results WHERE namespace = ? AND expires <= ?", (namespace, now))
+                conn.execute(
+                    "DELETE FROM results WHERE namespace = ? AND key IN (SELECT key FROM results "
+                    "WHERE namespace = ? ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                    (namespace, namespace, max_entries))
+            return True
+        return await self._run(self._write, put)
+
+    def delete_result(self, namespace: str, key: str):
+        """Queue the removal of one result."""
+        self._queue(self._write, lambda conn: conn.execute(
+            "DELETE FROM results WHERE namespace = ? AND key = ?", (namespace, key)))
+
+    def invalidate(self, namespace: str, predicate: Optional[Callable[[Hashable], bool]] = None):
+        """Queue dropping a namespace's results (those whose key predicate accepts, if given) and bumping
+        its generation, so results of calls already in flight in any worker aren't stored."""
+        def drop(conn):
+            if predicate is None:
+                conn.execute("DELETE FROM results WHERE namespace = ?", (namespace,))
+            else:
+                rows = conn.execute("SELECT key, key_blob FROM results WHERE namespace = ?", (namespace,)).fetchall()
+                conn.executemany("DELETE FROM results WHERE namespace = ? AND key = ?",
+                                 [(namespace, key) for key, blob in rows if predicate(pickle.loads(blob))])
+            conn.execute("INSERT INTO generations VALUES (?, 1) ON CONFLICT(namespace) DO UPDATE SET value = value + 1",
+                         (namespace,))
+        self._queue(self._write, drop)
+
+    # Relayed messages
+
+    def relay(self, channel: str, body: Any):
+        """Queue a message for whichever worker takes the channel's messages."""
+        blob = pickle.dumps(body)
+        self._queue(self._write, lambda conn: conn.execute("INSERT INTO relayed (channel, body) VALUES (?, ?)",
+                                                           (channel, blob)))
+
+    async def take_relayed(self, channel: str) -> List[Any]:
+        def take(conn):
+            rows = conn.execute("SELECT seq, body FROM relayed WHERE channel = ? ORDER BY seq", (channel,)).fetchall()
+            if rows:
+                conn.execute("DELETE FROM relayed WHERE channel = ? AND seq <= ?", (channel, rows[-1][0]))
+            return [pickle.loads(body) for _, body in rows]
+        return await self._run(self._write, take)
+
+    async def flush(self):
+        """Wait until every operation queued so far has been applied."""
+        await self._run(lambda: None)
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def close(self):
+        """Finish queued operations and close the connection."""
+        self._queue(self._close)
+        self._executor.shutdown(wait=True)
+        # A later call (e.g. another app lifespan in the same process) starts a fresh thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+
+
+class Leadership:
+    """Elects one worker to run the jobs that must not be multiplied: the mirror's delta sync and
+    Graph subscriptions. The lease is renewed every third of SHARED_LEASE_TTL; if the leader dies
+    another worker takes over within SHARED_LEASE_TTL seconds."""
+
+    LEASE = "leader"
+
+    def __init__(self, store: Optional[SharedStateStore]):
+        self.store = store
+        # A single process is always its own leader
+        self.is_leader = store is None
+        self._listeners: List[Callable[[bool], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def on_change(self, callback: Callable[[bool], None]):
+        """Call callback(is_leader) whenever this worker gains or loses leadership."""
+        self._listeners.append(callback)
+
+    def _set(self, is_leader: bool):
+        if is_leader == self.is_leader:
+            return
+        self.is_leader = is_leader
+        logger.info(f"Worker {WORKER_ID} {'is now the leader' if is_leader else 'is no longer the leader'}")
+        for callback in self._listeners:
+            callback(is_leader)
+
+    async def _renew(self):
+        try:
+            self._set(await self.store.try_lease(self.LEASE))
+        except Exception as e:
+            logger.error(f"Leader lease not renewed: {str(e)}")
+            self._set(False)
+
+    async def _renew_loop(self):
+        while True:
+            await asyncio.sleep(SHARED_LEASE_TTL / 3)
+            await self._renew()
+
+    async def start(self):
+        """Try for the lease at once, so the first worker up leads from its first request."""
+        if self.store is not None and self._task is None:
+            await self._renew()
+            self._task = asyncio.create_task(self._renew_loop())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            if self.is_leader:
+                await self.store.release(self.LEASE)
+            self._set(False)
+
+
+# Create a singleton instance
+shared_state = SharedStateStore(SHARED_STATE_PATH) if SHARED_STATE_PATH else None
+leadership = Leadership(shared_state)
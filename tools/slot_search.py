@@ -0,0 +1,167 @@
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from itertools import chain
+from typing import Iterable, List, Set, Tuple
+
+from tools.intervals import Interval, clip_intervals, merge_intervals
+
+# Buffer around a slot beyond this many seconds no longer improves its rank
+BUFFER_CAP = 30 * 60
+
+Slot = Tuple[float, float, float]
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_DAY = timedelta(days=1)
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    """numpy, imported on the first search rather than at startup; None falls back to the bisect search."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def merge_busy(busy: Iterable[Interval], start: float, end: float) -> List[Interval]:
+    """Busy intervals clipped to [start, end) and merged, as merge_intervals(clip_intervals(...)) returns them.
+
+    With NumPy the sort and sweep run over arrays: a running maximum of the ends
+    marks where one merged block stops and the next begins.
+    """
+    np = _numpy()
+    if np is None:
+        return merge_intervals(clip_intervals(busy, start, end))
+    flat = np.fromiter(chain.from_iterable(busy), dtype=np.float64)
+    starts = np.maximum(flat[0::2], start)
+    ends = np.minimum(flat[1::2], end)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return []
+    order = np.argsort(starts)
+    starts = starts[order]
+    reach = np.maximum.accumulate(ends[order])
+    # A block starts wherever an interval begins after everything before it has ended
+    breaks = np.flatnonzero(starts[1:] > reach[:-1]) + 1
+    firsts = np.concatenate(([0], breaks))
+    lasts = np.concatenate((breaks - 1, [len(starts) - 1]))
+    return list(zip(starts[firsts].tolist(), reach[lasts].tolist()))
+
+
+def working_windows(start: float, end: float, tz, day_start: time, day_end: time,
+                    weekdays: Set[int]) -> List[Interval]:
+    """Working-hour intervals (epoch seconds) for each local day touching [start, end).
+
+    weekdays uses datetime.weekday() numbering (Monday is 0).
+    """
+    windows: List[Interval] = []
+    day = datetime.fromtimestamp(start, tz).date()
+    last_day = datetime.fromtimestamp(end, tz).date()
+    while day <= last_day:
+        if day.weekday() in weekdays:
+            # Each day resolves its own UTC offset, so DST changes are handled
+            ws = _local_epoch(day, day_start, tz)
+            we = _local_epoch(day, day_end, tz)
+            ws, we = max(ws, start), min(we, end)
+            if we > ws:
+                windows.append((ws, we))
+        day += _ONE_DAY
+    return windows
+
+
+def _local_epoch(day, at: time, tz) -> float:
+    """Epoch seconds of a local wall time; the value an aware timestamp() gives, for a fraction of the cost."""
+    local = datetime.combine(day, at)
+    return (local - tz.utcoffset(local) - _EPOCH).total_seconds()
+
+
+def find_slots(busy: Iterable[Interval], windows: List[Interval], duration: float, step: float,
+               limit: int) -> List[Slot]:
+    """Rank free slots of the given duration that fit inside the working windows.
+
+    busy must be merged (sorted, non-overlapping). Candidate starts lie on a grid
+    of step seconds from the start of each window. Slots are ranked by how much free time surrounds them (up
+    to BUFFER_CAP on each side), then by start time, and the result holds at most
+    limit non-overlapping (start, end, score) tuples.
+    """
+    busy = list(busy)
+    if not windows or duration <= 0 or step <= 0 or limit <= 0:
+        return []
+    if _numpy() is not None:
+        ranked = _rank_numpy(busy, windows, duration, step)
+    else:
+        ranked = _rank_python(busy, windows, duration, step)
+    chosen: List[Slot] = []
+    for start, score in ranked:
+        end = start + duration
+        if all(end <= s or start >= e for s, e, _ in chosen):
+            chosen.append((start, end, score))
+            if len(chosen) >= limit:
+                break
+    return chosen
+
+
+def _window_grid(ws: float, we: float, duration: float) -> Tuple[float, float]:
+    """First and last start for slots that fit inside one working window.
+
+    The grid runs from the window's own start, so it follows local working hours
+    in every zone (an epoch-aligned grid is off by the zone's offset in UTC+5:30).
+    """
+    return ws, we - duration
+
+
+def _rank_numpy(busy, windows, duration, step) -> List[Tuple[float, float]]:
+    np = _numpy()
+    # Candidate starts only inside working windows, so every candidate already fits working hours
+    grids = []
+    for ws, we in windows:
+        first, last = _window_grid(ws, we, duration)
+        if last >= first:
+            grids.append(np.arange(first, last + 1, step, dtype=np.float64))
+    if not grids:
+        return []
+    candidates = np.concatenate(grids)
+    slot_ends = candidates + duration
+
+    if busy:
+        busy_starts = np.array([b[0] for b in busy])
+        busy_ends = np.array([b[1] for b in busy])
+        last_busy = len(busy) - 1
+        # The last busy block starting before the slot ends is the only one that can overlap it;
+        # the block after it is the next one the slot runs into
+        m = np.searchsorted(busy_starts, slot_ends, side="left")
+        i = m - 1
+        ok = ~((i >= 0) & (busy_ends[np.maximum(i, 0)] > candidates))
+        before = np.where(i >= 0, candidates - busy_ends[np.maximum(i, 0)], BUFFER_CAP)
+        after = np.where(m <= last_busy, busy_starts[np.minimum(m, last_busy)] - slot_ends, BUFFER_CAP)
+        scores = np.minimum(np.minimum(before, after), BUFFER_CAP)
+        candidates = candidates[ok]
+        scores = scores[ok]
+    else:
+        scores = np.full(candidates.shape, float(BUFFER_CAP))
+
+    # Highest score first, earliest start breaking ties
+    order = np.lexsort((candidates, -scores))
+    return list(zip(candidates[order].tolist(), scores[order].tolist()))
+
+
+def _rank_python(busy, windows, duration, step) -> List[Tuple[float, float]]:
+    busy_starts = [b[0] for b in busy]
+    busy_ends = [b[1] for b in busy]
+    ranked = []
+    for ws, we in windows:
+        start, last = _window_grid(ws, we, duration)
+        while start <= last:
+            end = start + duration
+            m = bisect_left(busy_starts, end)
+            i = m - 1
+            if i < 0 or busy_ends[i] <= start:
+                before = start - busy_ends[i] if i >= 0 else BUFFER_CAP
+                after = busy_starts[m] - end if m < len(busy_starts) else BUFFER_CAP
+                ranked.append((start, float(min(before, after, BUFFER_CAP))))
+            start += step
+    ranked.sort(key=lambda item: (-item[1], item[0]))
+    return ranked
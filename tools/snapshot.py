@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from fast_json import dumps, loads
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+# SQLite file keeping the mirrored calendar and the tool catalog across restarts; unset disables it
+CALENDAR_SNAPSHOT_PATH = os.environ.get("CALENDAR_SNAPSHOT_PATH", "")
+# A restored mirror serves reads until its first catch-up sync only if it was saved within this many seconds
+CALENDAR_SNAPSHOT_MAX_AGE = float(os.environ.get("CALENDAR_SNAPSHOT_MAX_AGE", 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mirror_state (
+    mailbox TEXT PRIMARY KEY,
+    delta_link TEXT NOT NULL,
+    anchor REAL NOT NULL,
+    window_start REAL NOT NULL,
+    window_end REAL NOT NULL,
+    synced_at REAL NOT NULL,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS mirror_events (
+    mailbox TEXT NOT NULL,
+    id TEXT NOT NULL,
+    start_epoch REAL NOT NULL,
+    end_epoch REAL NOT NULL,
+    body BLOB NOT NULL,
+    PRIMARY KEY (mailbox, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tool_catalog (
+    fingerprint TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    saved_at REAL NOT NULL
+);
+"""
+
+Interval = Tuple[float, float, dict]
+
+
+class SnapshotStore:
+    """Calendar mirror state and the compiled tool catalog, persisted in one SQLite file.
+
+    Mirror rounds are written incrementally: a delta sync only touches the rows
+    of events it changed. Writes run on a worker thread so the event loop never
+    waits on the disk; one connection is shared under a lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Calendar data: readable by this user only (SQLite gives the WAL files the same mode)
+            os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            # WAL keeps each round to an append; a crash loses at most the last round, never the file
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(mirror_state)")]
+            if "revision" not in columns:
+                # Files written before revisions were tracked
+                conn.execute("ALTER TABLE mirror_state ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            self._conn = conn
+        return self._conn
+
+    def _load_mirror(self, mailbox: str) -> Optional[dict]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT delta_link, anchor, window_start, window_end, synced_at, revision "
+                "FROM mirror_state WHERE mailbox = ?",
+                (mailbox,)
+            ).fetchone()
+            if row is None:
+                return None
+            events: Dict[str, Interval] = {
+                event_id: (start, end, loads(body))
+                for event_id, start, end, body in conn.execute(
+                    "SELECT id, start_epoch, end_epoch, body FROM mirror_events WHERE mailbox = ?", (mailbox,))
+            }
+        delta_link, anchor, window_start, window_end, synced_at, revision = row
+        return {
+            "delta_link": delta_link,
+            "anchor": anchor,
+            "window_start": window_start,
+            "window_end": window_end,
+            "synced_at": synced_at,
+            "revision": revision,
+            "events": events
+        }
+
+    def _save_mirror(self, mailbox: str, state: dict, events: Dict[str, Interval], changed: Optional[Iterable[str]]):
+        if changed is None:
+            upserts, removed = events.keys(), ()
+        else:
+            changed = set(changed)
+            upserts = [event_id for event_id in changed if event_id in events]
+            removed = [(mailbox, event_id) for event_id in changed if event_id not in events]
+        rows = [(mailbox, event_id, events[event_id][0], events[event_id][1], dumps(events[event_id][2]))
+                for event_id in upserts]
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                if changed is None:
+                    conn.execute("DELETE FROM mirror_events WHERE mailbox = ?", (mailbox,))
+                conn.executemany("INSERT OR REPLACE INTO mirror_events VALUES (?, ?, ?, ?, ?)", rows)
+                conn.executemany("DELETE FROM mirror_events WHERE mailbox = ? AND id = ?", removed)
+                # The revision only moves when events did, so readers of the file know when to reload
+                conn.execute(
+                    "INSERT INTO mirror_state VALUES (?, ?, ?, ?, ?, ?, 1) ON CONFLICT(mailbox) DO UPDATE SET "
+                    "delta_link = excluded.delta_link, anchor = excluded.anchor, window_start = excluded.window_start, "
+                    "window_end = excluded.window_end, synced_at = excluded.synced_at, revision = revision + ?",
+                    (mailbox, state["delta_link"], state["anchor"], state["window_start"],
+                     state["window_end"], state["synced_at"], 1 if rows or removed or changed is None else 0)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def load_mirror(self, mailbox: str) -> Optional[dict]:
+        """A mailbox's saved mirror state and events, or None if none was saved."""
+        return await asyncio.to_thread(self._load_mirror, mailbox)
+
+    async def save_mirror(self, mailbox: str, state: dict, events: Dict[str, Interval],
+                          changed: Optional[Iterable[str]] = None):
+        """Persist a mirror round: only the changed event ids, or every event when changed is None."""
+        await asyncio.to_thread(self._save_mirror, mailbox, state, events, changed)
+
+    def _mirror_revision(self, mailbox: str) -> Optional[Tuple[int, float]]:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT revision, synced_at FROM mirror_state WHERE mailbox = ?", (mailbox,)).fetchone()
+
+    async def mirror_revision(self, mailbox: str) -> Optional[Tuple[int, float]]:
+        """(revision, synced_at) of a mailbox's saved mirror; a cheap check before reloading it."""
+        return await asyncio.to_thread(self._mirror_revision, mailbox)
+
+    def load_catalog(self, fingerprint: str) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT body FROM tool_catalog WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        return row[0] if row else None
+
+    def save_catalog(self, fingerprint: str, catalog_json: str):
+        """Keep only this catalog; older fingerprints belong to code that is no longer running."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM tool_catalog")
+            conn.execute("INSERT INTO tool_catalog VALUES (?, ?, ?)", (fingerprint, catalog_json, time.time()))
+            conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Create a singleton instance
+snapshot_store = SnapshotStore(CALENDAR_SNAPSHOT_PATH) if CALENDAR_SNAPSHOT_PATH else None
@@ -1,77 +1,109 @@
-from typing import Dict, Any, Callable, Awaitable
-from pydantic import BaseModel, Field
-from datetime import datetime
-from schemas.calendar_schemas import CheckMeetingAtTimeInput
-
-class AvailabilityInput(BaseModel):
-    start_time: str = Field(..., description="Start time in ISO format (e.g., 2025-05-10T14:00:00Z)")
-    end_time: str = Field(..., description="End time in ISO format (e.g., 2025-05-10T15:00:00Z)")
-    timezone: str = Field("America/New_York", description="Timezone for the returned busy times (IANA name, e.g., 'America/New_York'). Default is Eastern Time.")
-
-    def validate_times(self):
-        try:
-            datetime.fromisoformat(self.start_time.replace('Z', '+00:00'))
-            datetime.fromisoformat(self.end_time.replace('Z', '+00:00'))
-        except ValueError as e:
-            raise ValueError(f"Invalid datetime format: {str(e)}")
-
-class CreateMeetingInput(BaseModel):
-    title: str = Field(..., description="Title of the meeting")
-    start_time: str = Field(..., description="Start time in ISO format (e.g., 2025-05-10T14:00:00Z)")
-    end_time: str = Field(..., description="End time in ISO format (e.g., 2025-05-10T15:00:00Z)")
-    description: str = Field("", description="Optional description of the meeting")
-    location: str = Field("", description="Optional location of the meeting")
-    body: str = Field("", description="Optional additional message or invitation content")
-
-    def validate_times(self):
-        try:
-            datetime.fromisoformat(self.start_time.replace('Z', '+00:00'))
-            datetime.fromisoformat(self.end_time.replace('Z', '+00:00'))
-        except ValueError as e:
-            raise ValueError(f"Invalid datetime format: {str(e)}")
-
-class UpdateMeetingInput(BaseModel):
-    event_id: str = Field(..., description="ID of the event to update")
-    title: str = Field(..., description="New title of the meeting")
-    start_time: str = Field(..., description="New start time in ISO format")
-    end_time: str = Field(..., description="New end time in ISO format")
-    description: str = Field("", description="New description of the meeting")
-    location: str = Field("", description="New location of the meeting")
-    body: str = Field("", description="New additional message or invitation content")
-
-    def validate_times(self):
-        try:
-            datetime.fromisoformat(self.start_time.replace('Z', '+00:00'))
-            datetime.fromisoformat(self.end_time.replace('Z', '+00:00'))
-        except ValueError as e:
-            raise ValueError(f"Invalid datetime format: {str(e)}")
-
-class DeleteMeetingInput(BaseModel):
-    event_id: str = Field(..., description="ID of the event to delete")
-
-    def validate_times(self):
-        # No-op since DeleteMeetingInput doesn't have time fields to validate
-        pass
+import inspect
+import os
+from hashlib import blake2b
+from typing import Dict, Any, Callable, Awaitable, List, Optional
+import pydantic
+from pydantic import BaseModel
+from fast_json import dumps
 
 class ToolRegistry:
     def __init__(self):
         self._tools: Dict[str, Dict[str, Any]] = {}
-
-    def register(self, name: str, description: str, input_schema: type, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]):
-        """Register a new tool in the registry."""
+        # Discovery catalog, compiled on first use and dropped whenever a tool is registered
+        self._catalog_version = 0
+        self._catalog: Optional[List[Dict[str, Any]]] = None
+        self._catalog_json: Optional[str] = None
+
+    def register(self, name: str, description: str, input_schema: type, handler: Callable[[BaseModel], Awaitable[Any]],
+                 mutates: bool = False):
+        """Register a new tool in the registry; mutates marks calendar writes, which may be queued.
+
+        The handler receives the validated input_schema instance, with times already parsed,
+        and returns either a response model or JSON-ready data.
+        """
         self._tools[name] = {
             "name": name,
             "description": description,
             "input_schema": input_schema,
-            "handler": handler
+            # Bound once here so each call is a single pass through the schema's compiled validator
+            "validate": input_schema.model_validate,
+            "handler": handler,
+            "mutates": mutates
+        }
+        self._catalog_version += 1
+        self._catalog = None
+        self._catalog_json = None
+
+    @staticmethod
+    def _compile_tool_info(tool: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the discovery entry for a tool from its Pydantic input schema."""
+        schema = tool["input_schema"].model_json_schema()
+        required = schema.get("required", [])
+        # Build a complete parameters dict with all schema information
+        params = {}
+        for prop, prop_info in schema.get("properties", {}).items():
+            param_info = {
+                "type": prop_info.get("type", "string"),
+                "description": prop_info.get("description", ""),
+                "required": prop in required,
+            }
+            # Add format if specified (e.g., for datetime fields)
+            if "format" in prop_info:
+                param_info["format"] = prop_info["format"]
+            # Add enum values if present
+            if "enum" in prop_info:
+                param_info["enum"] = prop_info["enum"]
+            # Add default value if present
+            if "default" in prop_info:
+                param_info["default"] = prop_info["default"]
+            params[prop] = param_info
+        return {
+            "name": tool["name"],
+            "description": tool.get("description", ""),
+            "parameters": params
         }
 
+    @property
+    def catalog_version(self) -> int:
+        """Incremented on every registration."""
+        return self._catalog_version
+
+    def get_catalog(self) -> List[Dict[str, Any]]:
+        """Tool discovery entries with full parameter info, compiled once per catalog version."""
+        if self._catalog is None:
+            self._catalog = [self._compile_tool_info(tool) for tool in self._tools.values()]
+        return self._catalog
+
+    def get_catalog_json(self) -> str:
+        """Pre-serialized tools event payload in the format n8n-nodes-mcp expects."""
+        if self._catalog_json is None:
+            self._catalog_json = dumps({"tools": self.get_catalog()}).decode("utf-8")
+        return self._catalog_json
+
+    def catalog_fingerprint(self) -> str:
+        """Digest of what the catalog is compiled from, without compiling it: each tool's name,
+        description and schema class, plus the stat of the file defining the class."""
+        parts = [pydantic.VERSION]
+        for tool in self._tools.values():
+            schema = tool["input_schema"]
+            stat = os.stat(inspect.getfile(schema))
+            parts.append(f"{tool['name']}|{tool['description']}|{schema.__module__}.{schema.__qualname__}"
+                         f"|{stat.st_mtime_ns}|{stat.st_size}")
+        return blake2b("\n".join(parts).encode(), digest_size=16).hexdigest()
+
+    def restore_catalog_json(self, catalog_json: str):
+        """Use a catalog payload compiled by an earlier run with the same catalog_fingerprint()."""
+        self._catalog_json = catalog_json
+
     def get_tool(self, name: str) -> Dict[str, Any]:
         """Get a tool by name."""
         if name not in self._tools:
             raise KeyError(f"Tool '{name}' not found")
         return self._tools[name]
 
+    def has_tool(self, name: str) -> bool:
+        return name in self._tools
+
     def get_all_tools(self) -> Dict[str, Dict[str, Any]]:
         """Get all registered tools."""
         # Return only the name and description for tool discovery
@@ -85,42 +117,3 @@ class ToolRegistry:
 
 # Create a singleton instance
 tool_registry = ToolRegistry()
-
-# Import and register tools
-from tools.microsoft_calendar import calendar_client
-
-# Register all calendar tools
-tool_registry.register(
-    name="check_availability",
-    description="Check if your calendar is free or busy during a specific time range. Returns 'available: true' if there are no events in the given period, otherwise 'available: false'. Also returns a list of busy/taken time slots (with start, end, and subject) for the given range, in the requested timezone (default: Eastern Time, America/New_York). Parameters: start_time (ISO 8601), end_time (ISO 8601), timezone (IANA name, optional).",
-    input_schema=AvailabilityInput,
-    handler=calendar_client.check_availability
-)
-
-tool_registry.register(
-    name="create_meeting",
-    description="Create a new meeting in your Outlook calendar. Parameters: title (string, required), start_time (ISO 8601, required), end_time (ISO 8601, required), description (string, optional), location (string, optional), body (string, optional). The location will be set to 'Online' by default if not specified.",
-    input_schema=CreateMeetingInput,
-    handler=calendar_client.add_event
-)
-
-tool_registry.register(
-    name="update_meeting",
-    description="Update an existing meeting in your Outlook calendar. Parameters: event_id (string, required), title (string, required), start_time (ISO 8601, required), end_time (ISO 8601, required), description (string, optional), location (string, optional), body (string, optional). Returns the event ID and status.",
-    input_schema=UpdateMeetingInput,
-    handler=calendar_client.update_event
-)
-
-tool_registry.register(
-    name="delete_meeting",
-    description="Delete a meeting from your Outlook calendar. Parameters: event_id (string, required). Returns the event ID and status.",
-    input_schema=DeleteMeetingInput,
-    handler=calendar_client.delete_event
-)
-
-tool_registry.register(
-    name="find_meetings_near_time",
-    description="Find all meetings or events in your Outlook calendar that overlap with a specific time window around a given date and time. Useful for checking if you have any meetings scheduled near a particular moment.\n\nParameters:\n- date: string, e.g. '2025-05-19' (required)\n- time: string, e.g. '12:00' (required, 24-hour format)\n- timezone: string, e.g. 'America/New_York' (optional, default: UTC)\n- window_minutes: integer, e.g. 15 (optional, default: 15). This is the number of minutes before and after the specified time to search for overlapping meetings.\n\nReturns a list of meetings (with subject, start, end, and location) that overlap with the window, and a boolean 'has_meeting'.\n\nExample usage:\n{ 'date': '2025-05-19', 'time': '12:00', 'timezone': 'America/New_York', 'window_minutes': 15 }\n\nNote: window_minutes must be an integer, not a string.",
-    input_schema=CheckMeetingAtTimeInput,
-    handler=calendar_client.find_meetings_near_time
-) 
\ No newline at end of file
@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+from metrics import metrics
+from schemas.calendar_schemas import JobStatusInput
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Environment variables are managed by Replit Secrets Manager. Do not use .env or load_dotenv().
+# Writes run concurrently by this many workers
+WRITE_QUEUE_WORKERS = int(os.environ.get("WRITE_QUEUE_WORKERS", 8))
+# Queued and running jobs accepted before new writes are refused with 503
+WRITE_QUEUE_MAX_PENDING = int(os.environ.get("WRITE_QUEUE_MAX_PENDING", 1000))
+# Finished jobs stay queryable for this many seconds, up to WRITE_JOB_HISTORY jobs
+WRITE_JOB_TTL = float(os.environ.get("WRITE_JOB_TTL", 3600))
+WRITE_JOB_HISTORY = int(os.environ.get("WRITE_JOB_HISTORY", 10000))
+# Seconds shutdown waits for queued writes to finish
+WRITE_QUEUE_DRAIN_TIMEOUT = float(os.environ.get("WRITE_QUEUE_DRAIN_TIMEOUT", 10))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+jobs_total = metrics.counter("mcp_write_jobs_total", "Queued write jobs finished, by outcome", ["tool", "outcome"])
+job_wait = metrics.histogram("mcp_write_job_wait_seconds", "Time a write job waited before a worker ran it")
+job_duration = metrics.histogram("mcp_write_job_duration_seconds", "Time a worker spent running a write job", ["tool"])
+
+
+class WriteQueueFull(Exception):
+    """Raised when WRITE_QUEUE_MAX_PENDING jobs are already queued or running."""
+
+
+def _iso(epoch: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat() if epoch is not None else None
+
+
+class WriteJob:
+    """One queued tool call and, once finished, its result or error."""
+
+    __slots__ = ("job_id", "tool", "key", "run", "status", "result", "error",
+                 "submitted", "started", "finished", "done")
+
+    def __init__(self, tool: str, run: Callable[[], Awaitable[Any]], key: Optional[Hashable]):
+        self.job_id = uuid.uuid4().hex
+        self.tool = tool
+        self.key = key
+        self.run: Optional[Callable[[], Awaitable[Any]]] = run
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[Dict[str, Any]] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        info = {
+            "job_id": self.job_id,
+            "tool": self.tool,
+            "status": self.status,
+            "submitted_at": _iso(self.submitted),
+            "finished_at": _iso(self.finished)
+        }
+        if self.status == SUCCEEDED:
+            info["result"] = self.result
+        elif self.status == FAILED:
+            info["error"] = self.error
+        return info
+
+
+class WriteQueue:
+    """Runs write tool calls on a bounded worker pool and keeps their outcome for polling.
+
+    Jobs sharing an ordering key (the same event) form a lane and run one at a
+    time in submission order; only the head of each lane is ever on the ready
+    queue, so workers never block on each other.
+    """
+
+    def __init__(self, workers: int = WRITE_QUEUE_WORKERS, max_pending: int = WRITE_QUEUE_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._ready: Optional[asyncio.Queue] = None
+        self._lanes: Dict[Hashable, Deque[WriteJob]] = {}
+        self._jobs: "OrderedDict[str, WriteJob]" = OrderedDict()
+        self._tasks = []
+        self._pending = 0
+        self._running = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._pending - self._running,
+            "running": self._running,
+            "retained": len(self._jobs)
+        }
+
+    def _prune(self):
+        """Forget the oldest finished jobs once they expire or history is full."""
+        cutoff = time.time() - WRITE_JOB_TTL
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job.finished is None or (job.finished > cutoff and len(self._jobs) <= WRITE_JOB_HISTORY):
+                break
+            self._jobs.popitem(last=False)
+
+    def submit(self, tool: str, run: Callable[[], Awaitable[Any]], key: Optional[Hashable] = None) -> WriteJob:
+        """Queue run() and return its job; raises WriteQueueFull when the queue is at capacity."""
+        if self._ready is None:
+            raise RuntimeError("Write queue is not running")
+        if self._pending >= self.max_pending:
+            raise WriteQueueFull(f"{self._pending} writes are already pending")
+        self._prune()
+        job = WriteJob(tool, run, key)
+        self._jobs[job.job_id] = job
+        self._pending += 1
+        if key is not None:
+            lane = self._lanes.get(key)
+            if lane is not None:
+                # An earlier write to the same event is queued or running; this one waits its turn
+                lane.append(job)
+                return job
+            self._lanes[key] = deque()
+        self._ready.put_nowait(job)
+        return job
+
+    def _advance(self, key: Optional[Hashable]):
+        """Release the next job in a finished job's lane, or drop the lane when it is empty."""
+        if key is None:
+            return
+        lane = self._lanes.get(key)
+        if lane:
+            self._ready.put_nowait(lane.popleft())
+        else:
+            self._lanes.pop(key, None)
+
+    async def _execute(self, job: WriteJob):
+        job.status = RUNNING
+        job.started = time.time()
+        job_wait.observe(job.started - job.submitted)
+        self._running += 1
+        started = time.perf_counter()
+        try:
+            job.result = await job.run()
+            job.status = SUCCEEDED
+        except asyncio.CancelledError:
+            job.status = FAILED
+            job.error = {"status": 503, "detail": "Server shut down before the write finished"}
+            raise
+        except Exception as e:
+            job.status = FAILED
+            # HTTPException-style errors keep their status, detail and Retry-After
+            job.error = {"status": getattr(e, "status_code", 500), "detail": getattr(e, "detail", str(e))}
+            retry_after = (getattr(e, "headers", None) or {}).get("Retry-After")
+            if retry_after:
+                job.error["retry_after"] = retry_after
+            logger.warning(f"Write job {job.job_id} ({job.tool}) failed: {job.error['detail']}")
+        finally:
+            job.finished = time.time()
+            job.run = None
+            job_duration.observe(time.perf_counter() - started, job.tool)
+            jobs_total.inc(job.tool, job.status)
+            self._running -= 1
+            self._pending -= 1
+            job.done.set()
+            self._advance(job.key)
+
+    async def _worker(self):
+        while True:
+            job = await self._ready.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._ready.task_done()
+
+    def get(self, job_id: str) -> Optional[WriteJob]:
+        return self._jobs.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float = 0) -> Optional[WriteJob]:
+        """The job, after waiting up to timeout seconds for it to finish; None if unknown or expired."""
+        job = self._jobs.get(job_id)
+        if job is not None and timeout > 0 and not job.done.is_set():
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def status_tool(self, data: JobStatusInput) -> Dict[str, Any]:
+        """Tool handler reporting a job's state and, once finished, its result or error."""
+        job = await self.wait(data.job_id, data.wait_seconds)
+        if job is None:
+            return {"job_id": data.job_id, "status": "not_found"}
+        return job.to_dict()
+
+    async def start(self):
+        if self._ready is None:
+            self._ready = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def aclose(self):
+        """Let queued writes finish for up to WRITE_QUEUE_DRAIN_TIMEOUT seconds, then stop the workers."""
+        if self._ready is None:
+            return
+        if self._pending:
+            logger.info(f"Waiting for {self._pending} queued writes to finish")
+            try:
+                await asyncio.wait_for(self._drain(), WRITE_QUEUE_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"Shutting down with {self._pending} writes unfinished")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._ready = None
+
+    async def _drain(self):
+        while self._pending:
+            await self._ready.join()
+
+
+# Create a singleton instance
+write_queue = WriteQueue()
+
+metrics.callback(
+    "mcp_write_jobs", "Write jobs waiting or running",
+    lambda: {(state,): count for state, count in write_queue.stats().items() if state != "retained"},
+    labelnames=["state"]
+)